@@ -2,19 +2,28 @@
 from rest_framework import filters, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from datetime import timedelta
 
-from .models import ProductionCard
+from .models import OPEN_CARD_STATUSES, ProductionCard, ProductionCardEvent
 from .serializers import (
     ProductionCardInputSerializer,
     ProductionCardOutputSerializer,
     ProductionCardLiteSerializer,
     ProductionCardStatusUpdateSerializer,
     ProductionCardProgressUpdateSerializer,
+    ProductionCardEventSerializer,
+    ProductionCardBulkStatusSerializer,
+    ProductionCardBulkProgressSerializer,
 )
 from backend.utils.apis import BaseCRUDViewSet
+from product.utls import requirements_products_prefetches
+
+from .queues import overdue_pagination, overdue_queue, upcoming_pagination, upcoming_queue
+from .search import ProductionCardSearchFilter
+from .stats import annotate_qc_status, get_production_stats
+from . import transitions
 
 from .permissions import IsQualityControlExpert
 
@@ -29,15 +38,13 @@ class ProductionCardViewSet(BaseCRUDViewSet):
     
     queryset = ProductionCard.objects.select_related( 
         'requirements_product__product__category',
-        'created_by__user',
-        'approved_by_qa__user',
+        'created_by',
     ).prefetch_related(
-        'requirements_product__requirements',
-        'requirements_product__product_timeline',
-        'requirements_product__operators',
+        'approved_by_qa__user',
+        *requirements_products_prefetches('requirements_product__'),
     ).filter(is_active=True)
     
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductionCardSearchFilter, filters.OrderingFilter]
     filterset_fields = [
         'status',
         'priority',
@@ -62,6 +69,15 @@ class ProductionCardViewSet(BaseCRUDViewSet):
         'current_progress',
     ]
     
+    # پارامترهایی از get_queryset که روی آمار اثر دارند (بخشی از کلید کش)
+    STATS_FILTER_PARAMS = [
+        'is_overdue',
+        'min_progress',
+        'max_progress',
+        'start_date_from',
+        'start_date_to',
+    ]
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -70,7 +86,7 @@ class ProductionCardViewSet(BaseCRUDViewSet):
         if is_overdue is not None:
             if is_overdue.lower() == 'true':
                 queryset = queryset.filter(
-                    status__in=['draft', 'pending_approval', 'approved', 'in_production', 'paused'],
+                    status__in=OPEN_CARD_STATUSES,
                     scheduled_end_date__lt=timezone.now()
                 )
         
@@ -103,6 +119,11 @@ class ProductionCardViewSet(BaseCRUDViewSet):
             except ValueError:
                 pass
         
+        # شمارش بازرسی‌های QC برای لیست با یک کوئری (به جای چند کوئری به ازای هر کارت)؛
+        # سریالایزر لیست به prefetch های جزئیات نیازی ندارد
+        if self.action in ['list', 'overdue_cards', 'upcoming_cards']:
+            queryset = annotate_qc_status(queryset.prefetch_related(None))
+        
         return queryset
     
     # def get_serializer_context(self):
@@ -123,85 +144,45 @@ class ProductionCardViewSet(BaseCRUDViewSet):
     
     def perform_create(self, serializer):
         # تنظیم کاربر ایجاد کننده
-        request = self.context.get('request')
-        if request and request.user:
-            try:
-                serializer.save(created_by=request.user)
-            except:
-                serializer.save()
-        else:
-            serializer.save()
+        user = self.request.user if self.request.user.is_authenticated else None
+        card = serializer.save(created_by=user)
+        ProductionCardEvent.objects.create(
+            production_card=card,
+            event_type='created',
+            new_status=card.status,
+            new_progress=card.current_progress,
+            actor=user,
+        )
 
 
 
     
     @action(detail=False, methods=['get'], url_path='stats')
     def production_stats(self, request):
-        """آمار تولید"""
-        total = self.get_queryset().count()
-        by_status = self.get_queryset().values('status').annotate(
-            count=models.Count('id')
-        ).order_by('status')
-        
-        by_priority = self.get_queryset().values('priority').annotate(
-            count=models.Count('id')
-        ).order_by('priority')
-        
-        # کارت‌های تأخیری
-        overdue_cards = self.get_queryset().filter(
-            status__in=['draft', 'pending_approval', 'approved', 'in_production', 'paused'],
-            scheduled_end_date__lt=timezone.now()
-        ).count()
-        
-        # میانگین پیشرفت
-        avg_progress = self.get_queryset().aggregate(
-            avg_progress=models.Avg('current_progress')
-        )['avg_progress'] or 0
-        
-        # مجموع تولید
-        total_quantity = self.get_queryset().aggregate(
-            total=models.Sum('quantity_to_produce')
-        )['total'] or 0
-        
-        return Response({
-            'total_cards': total,
-            'overdue_cards': overdue_cards,
-            'average_progress': round(avg_progress, 2),
-            'total_quantity_to_produce': total_quantity,
-            'cards_by_status': list(by_status),
-            'cards_by_priority': list(by_priority),
-        })
+        """آمار تولید (از اسنپ‌شات کش‌شده؛ با ?fresh=1 مستقیم محاسبه می‌شود)"""
+        params = {name: request.query_params.get(name) for name in self.STATS_FILTER_PARAMS}
+        fresh = request.query_params.get('fresh', '').lower() in ('1', 'true')
+        return Response(get_production_stats(self.get_queryset(), params, fresh=fresh))
     
 
     @action(detail=False, methods=['get'], url_path='overdue')
     def overdue_cards(self, request):
-        """لیست کارت‌های تأخیری"""
-        overdue = self.get_queryset().filter(
-            status__in=['draft', 'pending_approval', 'approved', 'in_production', 'paused'],
-            scheduled_end_date__lt=timezone.now()
-        )
-        
-        serializer = ProductionCardLiteSerializer(overdue, many=True)
-        return Response({
-            'count': overdue.count(),
-            'cards': serializer.data
-        })
+        """
+        صف کارت‌های تأخیری (فوری‌ترها اول، سپس قدیمی‌ترین موعد)
+
+        صفحه‌بندی cursor با ?cursor= و ?page_size=؛ به جای count فیلد has_more برمی‌گردد
+        """
+        return self._queue_response(request, overdue_queue(self.get_queryset()), overdue_pagination())
     
     @action(detail=False, methods=['get'], url_path='upcoming')
     def upcoming_cards(self, request):
-        """کارت‌های پیش‌رو (در 7 روز آینده)"""
-        next_week = timezone.now() + timedelta(days=7)
-        upcoming = self.get_queryset().filter(
-            scheduled_start_date__gte=timezone.now(),
-            scheduled_start_date__lte=next_week,
-            status__in=['draft', 'pending_approval', 'approved']
-        )
-        
-        serializer = ProductionCardLiteSerializer(upcoming, many=True)
-        return Response({
-            'count': upcoming.count(),
-            'cards': serializer.data
-        })
+        """صف کارت‌های پیش‌رو (در 7 روز آینده)، با همان صفحه‌بندی صف تأخیری"""
+        return self._queue_response(request, upcoming_queue(self.get_queryset()), upcoming_pagination())
+    
+    def _queue_response(self, request, queryset, paginator):
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ProductionCardLiteSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'], url_path='change-status')
     def change_status(self, request, pk=None):
@@ -216,25 +197,30 @@ class ProductionCardViewSet(BaseCRUDViewSet):
         if serializer.is_valid():
             old_status = card.status
             new_status = serializer.validated_data['status']
+            update_fields = ['status', 'updated_at']
             
             # تاریخ‌های شروع و پایان را بر اساس وضعیت تنظیم کن
             if new_status == 'in_production' and not card.actual_start_date:
                 card.actual_start_date = timezone.now()
+                update_fields.append('actual_start_date')
             elif new_status in ['completed', 'archived'] and not card.actual_end_date:
                 card.actual_end_date = timezone.now()
+                update_fields.append('actual_end_date')
             elif new_status == 'approved' and not card.approval_date:
                 card.approval_date = timezone.now()
+                update_fields.append('approval_date')
             
             card.status = new_status
-            if 'notes' in serializer.validated_data:
-                if card.notes:
-                    card.notes += f"\n--- تغییر وضعیت ({timezone.now().strftime('%Y-%m-%d %H:%M')}) ---\n"
-                    card.notes += f"تغییر از {old_status} به {new_status}\n"
-                    card.notes += f"یادداشت: {serializer.validated_data['notes']}\n"
-                else:
-                    card.notes = f"تغییر وضعیت از {old_status} به {new_status}\nیادداشت: {serializer.validated_data['notes']}"
-            
-            card.save()
+            with transaction.atomic():
+                card.save(update_fields=update_fields)
+                ProductionCardEvent.objects.create(
+                    production_card=card,
+                    event_type='status_changed',
+                    old_status=old_status,
+                    new_status=new_status,
+                    actor=self._actor(request),
+                    note=serializer.validated_data.get('notes', ''),
+                )
             
             return Response({
                 'message': 'وضعیت با موفقیت تغییر کرد',
@@ -254,25 +240,32 @@ class ProductionCardViewSet(BaseCRUDViewSet):
         
         if serializer.is_valid():
             old_progress = card.current_progress
+            old_status = card.status
             new_progress = serializer.validated_data['progress']
+            update_fields = ['current_progress', 'updated_at']
             
             card.current_progress = new_progress
             
             # اگر پیشرفت 100% شد و هنوز کامل نشده، وضعیت را تغییر بده
             if new_progress >= 100 and card.status != 'completed':
                 card.status = 'completed'
+                update_fields.append('status')
                 if not card.actual_end_date:
                     card.actual_end_date = timezone.now()
+                    update_fields.append('actual_end_date')
             
-            if 'notes' in serializer.validated_data:
-                if card.notes:
-                    card.notes += f"\n--- به‌روزرسانی پیشرفت ({timezone.now().strftime('%Y-%m-%d %H:%M')}) ---\n"
-                    card.notes += f"تغییر پیشرفت از {old_progress}% به {new_progress}%\n"
-                    card.notes += f"یادداشت: {serializer.validated_data['notes']}\n"
-                else:
-                    card.notes = f"تغییر پیشرفت از {old_progress}% به {new_progress}%\nیادداشت: {serializer.validated_data['notes']}"
-            
-            card.save()
+            with transaction.atomic():
+                card.save(update_fields=update_fields)
+                ProductionCardEvent.objects.create(
+                    production_card=card,
+                    event_type='progress_updated',
+                    old_status=old_status,
+                    new_status=card.status,
+                    old_progress=old_progress,
+                    new_progress=new_progress,
+                    actor=self._actor(request),
+                    note=serializer.validated_data.get('notes', ''),
+                )
             
             return Response({
                 'message': 'پیشرفت با موفقیت به‌روزرسانی شد',
@@ -284,6 +277,60 @@ class ProductionCardViewSet(BaseCRUDViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], url_path='bulk-change-status')
+    def bulk_change_status(self, request):
+        """تغییر وضعیت گروهی کارت‌های تولید؛ نتیجه به تفکیک هر کارت"""
+        serializer = ProductionCardBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = transitions.bulk_change_status(
+            serializer.validated_data['card_ids'],
+            serializer.validated_data['status'],
+            actor=self._actor(request),
+            note=serializer.validated_data.get('notes', ''),
+        )
+        return Response({
+            'updated': sum(result['success'] for result in results),
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['post'], url_path='bulk-update-progress')
+    def bulk_update_progress(self, request):
+        """به‌روزرسانی گروهی درصد پیشرفت؛ نتیجه به تفکیک هر کارت"""
+        serializer = ProductionCardBulkProgressSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = transitions.bulk_update_progress(
+            serializer.validated_data['card_ids'],
+            serializer.validated_data['progress'],
+            actor=self._actor(request),
+            note=serializer.validated_data.get('notes', ''),
+        )
+        return Response({
+            'updated': sum(result['success'] for result in results),
+            'results': results,
+        })
+    
+    @action(detail=True, methods=['get'], url_path='history')
+    def history(self, request, pk=None):
+        """تاریخچه رویدادهای کارت تولید (صفحه‌بندی شده، جدیدترین اول)"""
+        if not ProductionCard.objects.filter(pk=pk, is_active=True).exists():
+            return Response(
+                {'error': 'کارت تولید یافت نشد'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        events = ProductionCardEvent.objects.filter(
+            production_card_id=pk
+        ).select_related('actor')
+        page = self.paginate_queryset(events)
+        serializer = ProductionCardEventSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @staticmethod
+    def _actor(request):
+        return request.user if request.user.is_authenticated else None
+    
     @action(detail=True, methods=['get'], url_path='details')
     def detailed_view(self, request, pk=None):
         """نمایش جزئیات کامل کارت تولید"""
@@ -302,28 +349,21 @@ class ProductionCardViewSet(BaseCRUDViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # پیدا کردن کاربر کنترل کیفیت
-        try:
-            from .models import QualityControlExpert
-            qc_expert = QualityControlExpert.objects.get(user=request.user)
-        except QualityControlExpert.DoesNotExist:
-            return Response(
-                {'error': 'فقط کارشناسان کنترل کیفیت می‌توانند کارت‌ها را تأیید کنند'},
-                status=status.HTTP_403_FORBIDDEN
-            )
+        # کارشناس کنترل کیفیت توسط IsQualityControlExpert روی request قرار گرفته است
+        qc_expert = request.qc_profile
         
-        card.status = 'approved'
-        card.approved_by_qa = qc_expert
-        card.approval_date = timezone.now()
-        
-        if card.notes:
-            card.notes += f"\n--- تأیید شده توسط کنترل کیفیت ({timezone.now().strftime('%Y-%m-%d %H:%M')}) ---\n"
-            card.notes += f"تأیید کننده: {qc_expert.user.get_full_name() or qc_expert.user.username}\n"
-        else:
-            card.notes = f"تأیید شده توسط کنترل کیفیت در {timezone.now().strftime('%Y-%m-%d %H:%M')}\n"
-            card.notes += f"تأیید کننده: {qc_expert.user.get_full_name() or qc_expert.user.username}\n"
-        
-        card.save()
+        with transaction.atomic():
+            card.status = 'approved'
+            card.approval_date = timezone.now()
+            card.save(update_fields=['status', 'approval_date', 'updated_at'])
+            card.approved_by_qa.add(qc_expert)
+            ProductionCardEvent.objects.create(
+                production_card=card,
+                event_type='approved',
+                old_status='pending_approval',
+                new_status='approved',
+                actor=request.user,
+            )
         
         return Response({
             'message': 'کارت تولید با موفقیت تأیید شد',
@@ -344,7 +384,7 @@ class ProductionCardViewSet(BaseCRUDViewSet):
             )
         
         try:
-            card = ProductionCard.objects.get(card_code=card_code, is_active=True)
+            card = self.queryset.get(card_code=card_code)
             serializer = ProductionCardOutputSerializer(card)
             return Response(serializer.data)
         except ProductionCard.DoesNotExist:
@@ -1,14 +1,21 @@
 # views.py
+from django.db.models import Count, Max
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 
 from backend.utils.apis import BaseCRUDViewSet
+from order.serializers import OrderOutputSerializer
 
 from .permissions import (
     IsQualityControlExpert,
 )
+from .serializers import ProductionCardLiteSerializer
+from .metrics import annotate_rolling_stats
 from .serializers2 import *
+from .spc import get_spc
+from .stats import annotate_qc_status, compute_expert_stats, get_inspection_stats
 
 
 
@@ -41,6 +48,10 @@ class QualityControlExpertViewSet(BaseCRUDViewSet):
         ) and request.qc_profile.qualification_level not in ["manager", "supervisor"]:
             qs = qs.filter(user=request.user)
 
+        # نرخ تایید پنجره‌های زمانی برای performance_stats سریالایزر خروجی
+        if self.action in ["list", "retrieve"]:
+            qs = annotate_rolling_stats(qs)
+
         return qs
 
     @action(detail=False, methods=["get"], url_path="stats")
@@ -49,33 +60,30 @@ class QualityControlExpertViewSet(BaseCRUDViewSet):
         آمار کارشناسان QC
         GET /api/qc-experts/stats/
         """
-        total_experts = self.get_queryset().count()
-
-        stats = {
-            "total_experts": total_experts,
-            "by_level": {
-                "basic": self.get_queryset()
-                .filter(qualification_level="basic")
-                .count(),
-                "senior": self.get_queryset()
-                .filter(qualification_level="senior")
-                .count(),
-                "supervisor": self.get_queryset()
-                .filter(qualification_level="supervisor")
-                .count(),
-                "manager": self.get_queryset()
-                .filter(qualification_level="manager")
-                .count(),
-            },
-            "active_count": self.get_queryset().filter(is_active=True).count(),
-            "average_approval_rate": self.get_queryset().aggregate(
-                avg=models.Avg("approval_rate")
-            )["avg"]
-            or 0,
-        }
+        stats = compute_expert_stats(self.get_queryset())
 
         return Response(stats)
 
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="stats/extended",
+        permission_classes=[IsQualityControlExpert],
+    )
+    def get_extended_statistics(self, request):
+        """
+        آمار تفصیلی بازرسی‌ها: تعداد بازرسی و نرخ تأیید هر کارشناس و تعداد بازرسی در هر روز
+        GET /api/qc-experts/stats/extended/?fresh=1
+        """
+        if request.qc_profile.qualification_level not in ["manager", "supervisor"]:
+            return Response(
+                {"error": "فقط مدیر یا سرپرست QC به آمار تفصیلی دسترسی دارد"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        fresh = request.query_params.get("fresh", "").lower() in ("1", "true")
+        return Response(get_inspection_stats(fresh=fresh))
+
     @action(detail=True, methods=["post"], url_path="deactivate")
     def deactivate_expert(self, request, pk=None):
         """
@@ -99,6 +107,59 @@ class QualityControlExpertViewSet(BaseCRUDViewSet):
 
         return Response({"status": "کارشناس غیرفعال شد"})
 
+    @action(detail=True, methods=["get"], url_path="history")
+    def history(self, request, pk=None):
+        """
+        خلاصه تاریخچه بازرسی کارشناس (شمارنده‌ها و موارد اخیر)
+        GET /api/qc-experts/{id}/history/
+        """
+        return Response(QCHistoryCreatorOutputSerializer(self._get_history()).data)
+
+    @action(detail=True, methods=["get"], url_path="history/logs")
+    def history_logs(self, request, pk=None):
+        """لاگ‌های بازرسی تاریخچه (صفحه‌بندی شده، جدیدترین اول)"""
+        logs = InspectionLog.objects.filter(
+            qc_expert_logs=self._get_history()
+        ).select_related("order", "inspector__user").order_by("-inspection_date", "-id")
+        page = self.paginate_queryset(logs)
+        return self.get_paginated_response(InspectionLogOutputSerializer(page, many=True).data)
+
+    @action(detail=True, methods=["get"], url_path="history/orders")
+    def history_orders(self, request, pk=None):
+        """سفارش‌های بازرسی شده (صفحه‌بندی شده، آخرین افزوده شده اول)"""
+        rows = QCHistoryCreator.inspected_orders.through.objects.filter(
+            qchistorycreator=self._get_history()
+        ).select_related("order__saler__user", "order__product").order_by("-id")
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(
+            OrderOutputSerializer([row.order for row in page], many=True).data
+        )
+
+    @action(detail=True, methods=["get"], url_path="history/cards")
+    def history_cards(self, request, pk=None):
+        """کارت‌های تولید بازرسی شده (صفحه‌بندی شده، آخرین افزوده شده اول)"""
+        rows = QCHistoryCreator.inspected_cart.through.objects.filter(
+            qchistorycreator=self._get_history()
+        ).order_by("-id")
+        page = self.paginate_queryset(rows)
+        cards = annotate_qc_status(
+            ProductionCard.objects.filter(id__in=[row.productioncard_id for row in page])
+            .select_related("requirements_product__product")
+        ).in_bulk()
+        return self.get_paginated_response(
+            ProductionCardLiteSerializer(
+                [cards[row.productioncard_id] for row in page], many=True
+            ).data
+        )
+
+    def _get_history(self):
+        history = QCHistoryCreator.objects.select_related("qc_expert__user").filter(
+            qc_expert=self.get_object()
+        ).first()
+        if history is None:
+            raise NotFound("تاریخچه‌ای برای این کارشناس ثبت نشده است")
+        return history
+
 
 def getQCInspectionByCardId(production_card_id):  # TODO use related name
     return ProductionCardQCInspection.objects.filter(
@@ -113,7 +174,7 @@ class ProductionCardQCInspectionViewSet(BaseCRUDViewSet):
     permission_classes = [IsQualityControlExpert]
     queryset = ProductionCardQCInspection.objects.all().select_related(
         "production_card", "inspector", "approved_by_qc_manager"
-    )
+    ).prefetch_related("checklist_rows", "test_rows", "measurement_rows")
     input_serializer_class = ProductionCardQCInspectionInputSerializer
     output_serializer_class = ProductionCardQCInspectionOutputSerializer
 
@@ -151,7 +212,46 @@ class ProductionCardQCInspectionViewSet(BaseCRUDViewSet):
 
         return context
 
+    @action(detail=True, methods=["post"], url_path="details")
+    def add_details(self, request, pk=None):
+        """
+        ثبت گروهی چک لیست، نتایج آزمون و اندازه‌گیری‌های بازرسی
+        (هر بخش با یک INSERT؛ آمار چک لیست با یک UPDATE به‌روز می‌شود)
+        """
+        inspection = self.get_object()
+        serializer = InspectionDetailsBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(inspection)
+
+        inspection = self.get_queryset().get(pk=inspection.pk)
+        return Response(
+            self.output_serializer_class(inspection, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
 
+    @action(detail=False, methods=["get"], url_path="spc/series")
+    def spc_series(self, request):
+        """سری‌های اندازه‌گیری موجود برای SPC (محصول و مشخصه) با تعداد نقاط"""
+        series = InspectionMeasurement.objects.filter(product__isnull=False)
+        product = request.query_params.get("product")
+        if product:
+            series = series.filter(product_id=product)
+        series = series.values("product_id", "product__name", "characteristic").annotate(
+            count=Count("id"), last_measured_at=Max("measured_at")
+        ).order_by("product_id", "characteristic")
+
+        page = self.paginate_queryset(series)
+        return self.get_paginated_response(list(page))
+
+    @action(detail=False, methods=["get"], url_path="spc")
+    def spc_chart(self, request):
+        """
+        نمودارهای کنترل X-bar/R و I-MR، شاخص‌های Cp/Cpk و نقض قواعد Western Electric
+        یک مشخصه محصول (سری در کش به‌صورت افزایشی به‌روز می‌شود؛ ?fresh=1 بازسازی کامل)
+        """
+        serializer = SPCQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(get_spc(**serializer.validated_data))
     
     
     # Here Get the each by cart 
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class QcConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'QC'
+
+    def ready(self):
+        import QC.signals  # noqa
+        from QC.permissions import qc_profile_resolver
+        qc_profile_resolver.connect()
+        from QC import history
+        history.connect()
+        from QC import metrics
+        metrics.connect()
+        from QC import spc
+        spc.connect()
@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import (
+    InspectionChecklistItem,
+    InspectionMeasurement,
+    InspectionTestResult,
+    ProductionCard,
+    ProductionCardQCInspection,
+)
+
+INSPECTION_TOTAL_FIELDS = ['passed_items', 'failed_items', 'total_items_checked', 'overall_score']
+
+INSPECTION_DETAIL_FIELDS = ['checklist_items', 'test_results', 'measurements']
+
+
+def ingest_inspection_details(inspection, details, replace=False):
+    """ثبت بخش‌های داده شده جزئیات بازرسی (فقط بخش‌های موجود در details)"""
+    if 'checklist_items' in details:
+        ingest_checklist(inspection, details['checklist_items'], replace=replace)
+    if 'test_results' in details:
+        ingest_test_results(inspection, details['test_results'], replace=replace)
+    if 'measurements' in details:
+        ingest_measurements(inspection, details['measurements'], replace=replace)
+    return inspection
+
+
+def ingest_checklist(inspection, items, replace=False):
+    """
+    ثبت گروهی موارد چک لیست بازرسی با یک INSERT و به‌روزرسانی آمار بازرسی
+    (passed_items، failed_items، total_items_checked و overall_score) با یک UPDATE
+
+    items فهرست dict با کلیدهای item_name، standard_value، actual_value، passed و
+    در صورت نیاز notes و checked_at است. با replace=True چک لیست قبلی حذف می‌شود.
+    """
+    with transaction.atomic():
+        if replace:
+            inspection.checklist_rows.all().delete()
+            start = 0
+        else:
+            start = inspection.checklist_rows.aggregate(last=Max('position'))['last'] or 0
+
+        rows = InspectionChecklistItem.objects.bulk_create([
+            InspectionChecklistItem(inspection=inspection, position=start + index, **item)
+            for index, item in enumerate(items, start=1)
+        ])
+        refresh_inspection_totals(inspection)
+    return rows
+
+
+def ingest_test_results(inspection, results, replace=False):
+    """ثبت گروهی نتایج آزمون بازرسی با یک INSERT"""
+    with transaction.atomic():
+        if replace:
+            inspection.test_rows.all().delete()
+        return InspectionTestResult.objects.bulk_create([
+            InspectionTestResult(inspection=inspection, **result) for result in results
+        ])
+
+
+def ingest_measurements(inspection, measurements, replace=False):
+    """
+    ثبت گروهی اندازه‌گیری‌های بازرسی با یک INSERT؛ اگر passed داده نشده باشد
+    از حدود مجاز (lower_limit/upper_limit) تعیین می‌شود. محصول کارت تولید برای
+    سری‌های SPC روی هر ردیف ثبت می‌شود.
+    """
+    product_id = ProductionCard.objects.filter(
+        pk=inspection.production_card_id
+    ).values_list('requirements_product__product_id', flat=True).first()
+
+    rows = []
+    for measurement in measurements:
+        row = InspectionMeasurement(inspection=inspection, product_id=product_id, **measurement)
+        if row.passed is None:
+            row.passed = within_limits(row.value, row.lower_limit, row.upper_limit)
+        rows.append(row)
+
+    with transaction.atomic():
+        if replace:
+            # کش سری‌های SPC ردیف‌های حذف‌شده را سیگنال post_delete باطل می‌کند
+            inspection.measurement_rows.all().delete()
+        return InspectionMeasurement.objects.bulk_create(rows)
+
+
+def within_limits(value, lower_limit, upper_limit):
+    """قرار داشتن مقدار در حدود مجاز؛ بدون هیچ حدی None"""
+    if lower_limit is None and upper_limit is None:
+        return None
+    if lower_limit is not None and value < lower_limit:
+        return False
+    if upper_limit is not None and value > upper_limit:
+        return False
+    return True
+
+
+def refresh_inspection_totals(inspection):
+    """
+    محاسبه آمار چک لیست بازرسی از ردیف‌های آن با یک UPDATE تجمیعی
+    (امتیاز کلی بدون مورد بررسی‌شده تغییر نمی‌کند) و به‌روزرسانی نمونه
+    """
+    passed = _count_rows(passed=True)
+    failed = _count_rows(passed=False)
+    total = passed + failed
+    ProductionCardQCInspection.objects.filter(pk=inspection.pk).update(
+        passed_items=passed,
+        failed_items=failed,
+        total_items_checked=total,
+        overall_score=Coalesce(
+            Cast(passed, FloatField()) * Value(100.0) / NullIf(total, Value(0)),
+            Cast(F('overall_score'), FloatField()),
+        ),
+    )
+    inspection.refresh_from_db(fields=INSPECTION_TOTAL_FIELDS)
+    return inspection
+
+
+def _count_rows(**filters):
+    rows = InspectionChecklistItem.objects.filter(
+        inspection_id=OuterRef('pk'), **filters
+    ).order_by().values('inspection_id').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
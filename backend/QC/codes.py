@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class CodeGenerator:
+    """
+    تولید کد یکتا (کارت تولید، بازرسی، ایستگاه و گزارش) از شمارنده پایدار پایگاه داده
+
+    شماره‌ها به‌صورت بلوک‌های CODE_BLOCK_SIZE تایی برای هر پروسه رزرو می‌شوند، پس
+    تولید کد نه جدول را می‌شمارد و نه جستجو می‌کند و هیچ دو پروسه‌ای شماره تکراری
+    نمی‌گیرند (شماره‌های استفاده‌نشده یک بلوک فقط فاصله ایجاد می‌کنند).
+
+    روی PostgreSQL از SEQUENCE استفاده می‌شود که با rollback برنمی‌گردد. در سایر
+    پایگاه‌ها جدول CodeSequence به‌روزرسانی می‌شود؛ داخل یک تراکنش باز، چون
+    rollback شمارنده را برمی‌گرداند، فقط به همان تعداد لازم رزرو و چیزی کش نمی‌شود.
+    """
+
+    def __init__(self, name, formatter, block_size=None):
+        self.name = name
+        self.formatter = formatter
+        self.block_size = block_size
+        self._numbers = deque()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def sequence_name(self):
+        return f'qc_code_{self.name}'
+
+    def take(self, count):
+        """رزرو count شماره یکتا"""
+        if count <= 0:
+            return []
+
+        if not self._uses_sequence() and connection.in_atomic_block:
+            return self._increment_table(count)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # بلوک پروسه والد بعد از fork نباید دوباره استفاده شود
+                self._numbers.clear()
+                self._pid = os.getpid()
+
+            missing = count - len(self._numbers)
+            if missing > 0:
+                block = max(missing, self.block_size or settings.CODE_BLOCK_SIZE)
+                self._numbers.extend(self._allocate(block))
+            return [self._numbers.popleft() for _ in range(count)]
+
+    def assign(self, instances, field):
+        """
+        مقداردهی فیلد کد نمونه‌هایی که کد ندارند؛ مناسب bulk_create
+        (کل شماره‌ها با یک رزرو گرفته می‌شوند)
+        """
+        pending = [instance for instance in instances if not getattr(instance, field)]
+        for instance, number in zip(pending, self.take(len(pending))):
+            setattr(instance, field, self.formatter(number, instance))
+        return instances
+
+    def _allocate(self, count):
+        if self._uses_sequence():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT nextval(%s) FROM generate_series(1, %s)',
+                    [self.sequence_name, count]
+                )
+                return sorted(row[0] for row in cursor.fetchall())
+        return self._increment_table(count)
+
+    def _increment_table(self, count):
+        from .models import CodeSequence
+
+        with transaction.atomic():
+            updated = CodeSequence.objects.filter(name=self.name).update(value=F('value') + count)
+            if not updated:
+                CodeSequence.objects.get_or_create(name=self.name)
+                CodeSequence.objects.filter(name=self.name).update(value=F('value') + count)
+            value = CodeSequence.objects.values_list('value', flat=True).get(name=self.name)
+        return list(range(value - count + 1, value + 1))
+
+    @staticmethod
+    def _uses_sequence():
+        return connection.vendor == 'postgresql'
+
+
+def _card_code(number, card):
+    return f"PC-{timezone.now():%y%m}-{number:06d}"
+
+
+def _inspection_code(number, inspection):
+    return f"QC-{inspection.production_card.card_code[:5]}-{number:08d}"
+
+
+def _station_code(number, station):
+    dept_code = station.department[:3].upper() if station.department else "GEN"
+    return f"WS-{dept_code}-{timezone.now():%y%m}-{number:05d}"
+
+
+def _report_code(number, report):
+    ws_code = report.workstation.station_code[:5] if report.workstation_id else "GEN"
+    return f"WSR-{ws_code}-{timezone.now():%y%m%d}-{number:06d}"
+
+
+production_card_codes = CodeGenerator('production_card', _card_code)
+inspection_codes = CodeGenerator('inspection', _inspection_code)
+workstation_codes = CodeGenerator('workstation', _station_code)
+workstation_report_codes = CodeGenerator('workstation_report', _report_code)
+
+CODE_GENERATORS = [
+    production_card_codes,
+    inspection_codes,
+    workstation_codes,
+    workstation_report_codes,
+]
@@ -0,0 +1,245 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from .models import InspectionLog, QCHistoryCreator
+
+LOG_OUTCOMES = {
+    'approved': 'approved_inspections',
+    'rejected': 'rejected_inspections',
+}
+
+
+def logs_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    به‌روزرسانی شمارنده‌های بازرسی تاریخچه هنگام افزودن/حذف لاگ بازرسی
+    (با F() و بدون شمارش دوباره کل لاگ‌ها)
+    """
+    if action == 'pre_clear':
+        _remember_cleared(sender, instance, reverse)
+        return
+    if action == 'post_clear':
+        refresh_history(_cleared(instance), ['inspection_logs'])
+        return
+    pairs, sign = _changed_pairs(sender, instance, action, reverse, pk_set)
+    if pairs:
+        statuses = InspectionLog.objects.filter(pk__in={log_id for _, log_id in pairs}).values_list('pk', 'status')
+        _update_log_counters(pairs, dict(statuses), sign)
+
+
+def log_status_changing(sender, instance, **kwargs):
+    """
+    نگه داشتن وضعیت قبلی لاگ تا post_save تغییر نتیجه را اعمال کند (بازرس و روز
+    ثبت نتیجه قبلی برای آمار کارشناس در QC.metrics)
+    """
+    if instance.pk:
+        previous = InspectionLog.objects.filter(pk=instance.pk).values_list(
+            'status', 'inspector_id', 'outcome_date'
+        ).first() or (None, None, None)
+        instance._previous_status, instance._previous_inspector_id, instance._previous_outcome_date = previous
+
+
+def log_status_changed(sender, instance, created, **kwargs):
+    """جابه‌جایی شمارنده تأیید/رد تاریخچه‌های شامل لاگ وقتی وضعیت لاگ تغییر می‌کند"""
+    previous = getattr(instance, '_previous_status', None)
+    if created or previous == instance.status:
+        return
+    changes = {}
+    if previous in LOG_OUTCOMES:
+        changes[LOG_OUTCOMES[previous]] = F(LOG_OUTCOMES[previous]) - 1
+    if instance.status in LOG_OUTCOMES:
+        changes[LOG_OUTCOMES[instance.status]] = F(LOG_OUTCOMES[instance.status]) + 1
+    if changes:
+        QCHistoryCreator.objects.filter(inspection_logs=instance).update(**changes)
+
+
+def items_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """به‌روزرسانی تعداد و فهرست اخیر سفارش‌ها/کارت‌های بازرسی شده"""
+    relation = _relation_for(sender)
+    if action == 'pre_clear':
+        _remember_cleared(sender, instance, reverse)
+        return
+    if action == 'post_clear':
+        refresh_history(_cleared(instance), [relation])
+        return
+    pairs, sign = _changed_pairs(sender, instance, action, reverse, pk_set)
+    if pairs:
+        _update_item_counters(relation, pairs, sign)
+
+
+def item_deleting(sender, instance, **kwargs):
+    """
+    نگه داشتن تاریخچه‌های شامل لاگ/سفارش/کارت در حال حذف؛ حذف (و حذف آبشاری)
+    ردیف‌های جدول واسط m2m_changed نمی‌فرستد
+    """
+    through = getattr(QCHistoryCreator, _relation_for_model(sender)).through
+    instance._history_pairs = _history_pairs(through, **{_item_column(through): instance.pk})
+
+
+def item_deleted(sender, instance, **kwargs):
+    """کم کردن شمارنده‌ها و به‌روزرسانی فهرست اخیر تاریخچه‌های شامل مورد حذف‌شده"""
+    pairs = instance.__dict__.pop('_history_pairs', [])
+    if not pairs:
+        return
+    relation = _relation_for_model(sender)
+    if relation == 'inspection_logs':
+        _update_log_counters(pairs, {instance.pk: instance.status}, -1)
+    else:
+        _update_item_counters(relation, pairs, -1)
+
+
+def refresh_history(history_ids, relations=None):
+    """محاسبه کامل شمارنده‌ها و فهرست‌های اخیر (برای clear یا اصلاح داده)"""
+    relations = relations or ['inspection_logs', *HISTORY_RELATIONS]
+    for history in QCHistoryCreator.objects.filter(pk__in=history_ids):
+        changes = {}
+        if 'inspection_logs' in relations:
+            counts = history.inspection_logs.aggregate(
+                total=Count('id'),
+                **{field: Count('id', filter=Q(status=status)) for status, field in LOG_OUTCOMES.items()},
+            )
+            changes['total_inspections'] = counts.pop('total')
+            changes.update(counts)
+        for relation in HISTORY_RELATIONS:
+            if relation in relations:
+                changes[HISTORY_RELATIONS[relation][0]] = getattr(history, relation).count()
+        QCHistoryCreator.objects.filter(pk=history.pk).update(**changes)
+    for relation in HISTORY_RELATIONS:
+        if relation in relations:
+            _refresh_recent(history_ids, relation)
+
+
+def connect():
+    """اتصال سیگنال‌های نگهداری شمارنده‌ها؛ در AppConfig.ready صدا زده می‌شود"""
+    m2m_changed.connect(
+        logs_changed, sender=QCHistoryCreator.inspection_logs.through, dispatch_uid='qc_history_logs'
+    )
+    pre_save.connect(log_status_changing, sender=InspectionLog, dispatch_uid='qc_history_log_status_pre')
+    post_save.connect(log_status_changed, sender=InspectionLog, dispatch_uid='qc_history_log_status')
+    for relation in HISTORY_RELATIONS:
+        m2m_changed.connect(
+            items_changed,
+            sender=getattr(QCHistoryCreator, relation).through,
+            dispatch_uid=f'qc_history_{relation}',
+        )
+    for relation in ['inspection_logs', *HISTORY_RELATIONS]:
+        model = getattr(QCHistoryCreator, relation).field.related_model
+        pre_delete.connect(item_deleting, sender=model, dispatch_uid=f'qc_history_{relation}_deleting')
+        post_delete.connect(item_deleted, sender=model, dispatch_uid=f'qc_history_{relation}_deleted')
+
+
+def _recent_orders(rows):
+    return [row['order_id'] for row in rows]
+
+
+def _recent_cards(rows):
+    return [row['productioncard_id'] for row in rows]
+
+
+# رابطه M2M: (فیلد شمارنده، فیلد فهرست اخیر، ستون‌های لازم از جدول واسط، سازنده فهرست)
+HISTORY_RELATIONS = {
+    'inspected_orders': ('inspected_orders_count', 'recent_order_ids', ['order_id'], _recent_orders),
+    'inspected_cart': ('inspected_cards_count', 'recent_card_ids', ['productioncard_id'], _recent_cards),
+}
+
+
+def _relation_for(through):
+    for relation in HISTORY_RELATIONS:
+        if getattr(QCHistoryCreator, relation).through is through:
+            return relation
+    raise LookupError(through)
+
+
+def _relation_for_model(model):
+    for relation in ['inspection_logs', *HISTORY_RELATIONS]:
+        if getattr(QCHistoryCreator, relation).field.related_model is model:
+            return relation
+    raise LookupError(model)
+
+
+def _item_column(through):
+    """ستون جدول واسط که به لاگ/سفارش/کارت اشاره می‌کند"""
+    return next(
+        field.attname for field in through._meta.fields
+        if field.is_relation and field.related_model is not QCHistoryCreator
+    )
+
+
+def _history_pairs(through, **filters):
+    return list(through.objects.filter(**filters).values_list('qchistorycreator_id', _item_column(through)))
+
+
+def _changed_pairs(through, instance, action, reverse, pk_set):
+    """
+    ردیف‌های (تاریخچه، مورد) جدول واسط که افزوده یا حذف شده‌اند، با علامت تغییر
+
+    post_add فقط شناسه‌های واقعاً افزوده‌شده را دارد ولی pk_set حذف همان شناسه‌های
+    درخواستی است؛ پس ردیف‌های موجود در pre_remove خوانده و در post_remove اعمال می‌شوند.
+    """
+    if action == 'pre_remove' and pk_set:
+        column = _item_column(through)
+        if reverse:
+            filters = {column: instance.pk, 'qchistorycreator_id__in': pk_set}
+        else:
+            filters = {'qchistorycreator_id': instance.pk, f'{column}__in': pk_set}
+        instance._removed_pairs = _history_pairs(through, **filters)
+    elif action == 'post_remove':
+        return instance.__dict__.pop('_removed_pairs', []), -1
+    elif action == 'post_add' and pk_set:
+        return [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set], 1
+    return [], 0
+
+
+def _update_log_counters(pairs, statuses, sign):
+    deltas = defaultdict(Counter)
+    for history_id, log_id in pairs:
+        deltas[history_id]['total_inspections'] += 1
+        if statuses.get(log_id) in LOG_OUTCOMES:
+            deltas[history_id][LOG_OUTCOMES[statuses[log_id]]] += 1
+    _apply_deltas(deltas, sign)
+
+
+def _update_item_counters(relation, pairs, sign):
+    deltas = defaultdict(Counter)
+    for history_id, _ in pairs:
+        deltas[history_id][HISTORY_RELATIONS[relation][0]] += 1
+    _apply_deltas(deltas, sign)
+    _refresh_recent(list(deltas), relation)
+
+
+def _apply_deltas(deltas, sign):
+    """یک UPDATE با F() برای هر گروه تاریخچه با تغییرات یکسان"""
+    groups = defaultdict(list)
+    for history_id, delta in deltas.items():
+        groups[tuple(sorted(delta.items()))].append(history_id)
+    for delta, history_ids in groups.items():
+        QCHistoryCreator.objects.filter(pk__in=history_ids).update(
+            **{field: F(field) + sign * count for field, count in delta}
+        )
+
+
+def _refresh_recent(history_ids, relation):
+    """فهرست اخیر = آخرین ردیف‌های جدول واسط (به ترتیب افزوده شدن)؛ یک کوئری محدود برای هر تاریخچه"""
+    _, recent_field, columns, build = HISTORY_RELATIONS[relation]
+    through = getattr(QCHistoryCreator, relation).through
+    for history_id in history_ids:
+        rows = through.objects.filter(qchistorycreator_id=history_id).order_by('-id').values(
+            *columns
+        )[:settings.QC_HISTORY_RECENT_SIZE]
+        QCHistoryCreator.objects.filter(pk=history_id).update(**{recent_field: build(rows)})
+
+
+def _remember_cleared(through, instance, reverse):
+    # در clear معکوس (از سمت لاگ/سفارش/کارت) تاریخچه‌های درگیر بعد از حذف قابل یافتن نیستند
+    if reverse:
+        instance._cleared_histories = list(
+            through.objects.filter(**{_item_column(through): instance.pk}).values_list('qchistorycreator_id', flat=True)
+        )
+    else:
+        instance._cleared_histories = [instance.pk]
+
+
+def _cleared(instance):
+    return instance.__dict__.pop('_cleared_histories', [])
@@ -0,0 +1,115 @@
+"""
+Management command for measuring production card serialization cost
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+from product.models import Operator, Product, ProductionLine, Requirements, RequirementsProducts
+from QC.api1 import ProductionCardViewSet
+from QC.models import ProductionCard, ProductionCardQCInspection, QualityControlExpert
+from QC.serializers import ProductionCardLiteSerializer, ProductionCardOutputSerializer
+from QC.stats import annotate_qc_status
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Report query count and latency of production card list/detail serialization"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 1000], help="Card counts to measure")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+
+    def handle(self, *args, **options):
+        # داده‌های آزمایشی در یک تراکنش ساخته و در پایان rollback می‌شوند
+        try:
+            with db_transaction.atomic():
+                cards = self._create_fixture(max(options['sizes']))
+                self.stdout.write(f"{'cards':>6} {'serializer':>8} {'queries':>8} {'ms':>10}")
+                for size in options['sizes']:
+                    ids = cards[:size]
+                    for name, queryset, serializer_class in self._cases(ids):
+                        queries, elapsed = self._measure(queryset, serializer_class, options['repeat'])
+                        self.stdout.write(f"{size:>6} {name:>8} {queries:>8} {elapsed:>10.1f}")
+                raise Rollback
+        except Rollback:
+            pass
+
+    @staticmethod
+    def _cases(ids):
+        detail = ProductionCardViewSet.queryset.filter(id__in=ids)
+        lite = annotate_qc_status(ProductionCardViewSet.queryset.prefetch_related(None).filter(id__in=ids))
+        return [
+            ('list', lite, ProductionCardLiteSerializer),
+            ('detail', detail, ProductionCardOutputSerializer),
+        ]
+
+    @staticmethod
+    def _measure(queryset, serializer_class, repeat):
+        best = None
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                serializer_class(queryset.all(), many=True).data
+                elapsed = (time.perf_counter() - started) * 1000
+            queries = len(context)
+            best = elapsed if best is None else min(best, elapsed)
+        return queries, best
+
+    @staticmethod
+    def _create_fixture(count):
+        from django.contrib.auth import get_user_model
+
+        user = get_user_model().objects.create(username='benchmark-production-cards')
+        experts = [
+            QualityControlExpert.objects.create(
+                user=get_user_model().objects.create(username=f'benchmark-qc-{index}'),
+                employee_code=f'BENCH-QC-{index}',
+                department='benchmark',
+            )
+            for index in range(2)
+        ]
+        product = Product.objects.create(name='benchmark', slug='benchmark-production-cards', price=1)
+        requirements_product = RequirementsProducts.objects.create(
+            name='benchmark', slug='benchmark-production-cards', product=product
+        )
+        requirements_product.requirements.set([
+            Requirements.objects.create(name=f'req {index}', slug=f'benchmark-req-{index}')
+            for index in range(3)
+        ])
+        requirements_product.product_timeline.set([
+            ProductionLine.objects.create(name=f'line {index}') for index in range(2)
+        ])
+        requirements_product.orpertors.set([
+            Operator.objects.create(name=f'op {index}', family='benchmark', slug=f'benchmark-op-{index}')
+            for index in range(2)
+        ])
+
+        cards = ProductionCard.objects.bulk_create([
+            ProductionCard(
+                card_code=f'BENCH-{index}',
+                title=f'benchmark {index}',
+                requirements_product=requirements_product,
+                created_by=user,
+            )
+            for index in range(count)
+        ])
+        ProductionCard.approved_by_qa.through.objects.bulk_create([
+            ProductionCard.approved_by_qa.through(productioncard_id=card.id, qualitycontrolexpert_id=expert.id)
+            for card in cards
+            for expert in experts
+        ])
+        ProductionCardQCInspection.objects.bulk_create([
+            ProductionCardQCInspection(
+                production_card=card,
+                inspection_code=f'BENCH-{card.id}-{status}',
+                status=status,
+            )
+            for card in cards
+            for status in ('approved', 'pending')
+        ])
+        return [card.id for card in cards]
@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.signals import post_save, pre_save
+from django.utils import timezone
+
+from .history import log_status_changing
+from .models import InspectionLog, InspectorDailyStats, ProductionCardQCInspection, QualityControlExpert
+
+# پنجره‌های نرخ تایید (روز)
+METRIC_WINDOWS = (7, 30, 90)
+
+# وضعیت‌هایی که در آمار کارشناس شمرده می‌شوند
+OUTCOMES = ('approved', 'rejected')
+
+INSPECTOR_METRIC_FIELDS = ['inspected_products_count', 'approved_products_count', 'approval_rate']
+
+
+def record_outcomes(expert_id, approved=0, rejected=0, day=None):
+    """
+    ثبت نتیجه بازرسی‌های یک کارشناس: شمارنده‌ها و نرخ تایید کل با یک UPDATE
+    مبتنی بر F() (بدون خواندن و نوشتن دوباره) و افزایش ردیف آمار روزانه
+
+    مقادیر منفی (با day روز ثبت نتیجه قبلی) برای برگرداندن نتیجه یک بازرسی به کار می‌روند.
+    """
+    if not (approved or rejected) or expert_id is None:
+        return
+    inspected = F('inspected_products_count') + approved + rejected
+    accepted = F('approved_products_count') + approved
+    with transaction.atomic():
+        QualityControlExpert.objects.filter(pk=expert_id).update(
+            inspected_products_count=inspected,
+            approved_products_count=accepted,
+            approval_rate=Cast(
+                Coalesce(
+                    Cast(accepted, FloatField()) * Value(100.0) / NullIf(inspected, Value(0)),
+                    Value(100.0),
+                ),
+                DecimalField(max_digits=5, decimal_places=2),
+            ),
+        )
+        _add_to_bucket(expert_id, day or timezone.localdate(), approved, rejected)
+
+
+def annotate_rolling_stats(queryset):
+    """
+    جمع تایید/رد هر پنجره زمانی از جدول آمار روزانه به صورت annotation
+    (approved_7d، rejected_7d، ...) تا سریالایزر به ازای هر کارشناس کوئری نزند
+    """
+    today = timezone.localdate()
+    annotations = {}
+    for days in METRIC_WINDOWS:
+        annotations[f'approved_{days}d'] = _window_sum('approved', days, today)
+        annotations[f'rejected_{days}d'] = _window_sum('rejected', days, today)
+    return queryset.annotate(**annotations)
+
+
+def get_rolling_stats(expert):
+    """
+    نرخ تایید پنجره‌های 7/30/90 روزه کارشناس؛ از annotation استفاده می‌کند و در
+    نبود آن با یک aggregate روی آمار روزانه (حداکثر 90 ردیف) محاسبه می‌شود
+    """
+    if not hasattr(expert, f'approved_{METRIC_WINDOWS[0]}d'):
+        today = timezone.localdate()
+        sums = {}
+        for days in METRIC_WINDOWS:
+            since = Q(day__gt=today - timedelta(days=days))
+            sums[f'approved_{days}d'] = Sum('approved', filter=since)
+            sums[f'rejected_{days}d'] = Sum('rejected', filter=since)
+        totals = expert.daily_stats.aggregate(**sums)
+        for field, value in totals.items():
+            setattr(expert, field, value or 0)
+
+    windows = {}
+    for days in METRIC_WINDOWS:
+        approved = getattr(expert, f'approved_{days}d')
+        rejected = getattr(expert, f'rejected_{days}d')
+        windows[f'{days}d'] = {
+            'inspected': approved + rejected,
+            'approved': approved,
+            'rejected': rejected,
+            'approval_rate': round(approved / (approved + rejected) * 100, 2) if approved + rejected > 0 else None,
+        }
+    return windows
+
+
+def status_changing(sender, instance, **kwargs):
+    """نگه داشتن وضعیت، بازرس و روز ثبت نتیجه قبلی بازرسی تا post_save تغییر نتیجه را اعمال کند"""
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list(
+            'status', 'inspector_id', 'outcome_date'
+        ).first() or (None, None, None)
+        instance._previous_status, instance._previous_inspector_id, instance._previous_outcome_date = previous
+
+
+def outcome_changed(sender, instance, created, **kwargs):
+    """
+    ثبت نتیجه بازرسی (تایید/رد) در آمار کارشناس وقتی وضعیت بازرسی تغییر می‌کند
+
+    نتیجه قبلی از آمار همان کارشناس و همان روزی که ثبت شده بود کم می‌شود و نتیجه
+    جدید در روز جاری ثبت و روز آن روی لاگ/بازرسی ذخیره می‌شود.
+    """
+    previous = None if created else getattr(instance, '_previous_status', None)
+    if previous == instance.status:
+        return
+    today = timezone.localdate()
+    if previous in OUTCOMES:
+        record_outcomes(
+            getattr(instance, '_previous_inspector_id', instance.inspector_id),
+            approved=-(previous == 'approved'),
+            rejected=-(previous == 'rejected'),
+            day=getattr(instance, '_previous_outcome_date', None) or today,
+        )
+    if instance.status in OUTCOMES:
+        record_outcomes(
+            instance.inspector_id,
+            approved=int(instance.status == 'approved'),
+            rejected=int(instance.status == 'rejected'),
+            day=today,
+        )
+
+    outcome_date = today if instance.status in OUTCOMES else None
+    if instance.outcome_date != outcome_date:
+        sender.objects.filter(pk=instance.pk).update(outcome_date=outcome_date)
+        instance.outcome_date = outcome_date
+
+
+def connect():
+    """اتصال سیگنال‌های آمار کارشناسان؛ در AppConfig.ready صدا زده می‌شود"""
+    # وضعیت قبلی لاگ بازرسی را history.log_status_changing نگه می‌دارد (همان dispatch_uid)
+    pre_save.connect(log_status_changing, sender=InspectionLog, dispatch_uid='qc_history_log_status_pre')
+    post_save.connect(outcome_changed, sender=InspectionLog, dispatch_uid='qc_metrics_log_outcome')
+    pre_save.connect(
+        status_changing, sender=ProductionCardQCInspection, dispatch_uid='qc_metrics_inspection_status_pre'
+    )
+    post_save.connect(
+        outcome_changed, sender=ProductionCardQCInspection, dispatch_uid='qc_metrics_inspection_outcome'
+    )
+
+
+def _add_to_bucket(expert_id, day, approved, rejected):
+    bucket = InspectorDailyStats.objects.filter(qc_expert_id=expert_id, day=day)
+    changes = {'approved': F('approved') + approved, 'rejected': F('rejected') + rejected}
+    if bucket.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            InspectorDailyStats.objects.create(
+                qc_expert_id=expert_id, day=day, approved=approved, rejected=rejected
+            )
+    except IntegrityError:
+        # ردیف روز همزمان توسط درخواست دیگری ساخته شده است
+        bucket.update(**changes)
+
+
+def _window_sum(field, days, today):
+    rows = InspectorDailyStats.objects.filter(
+        qc_expert_id=OuterRef('pk'), day__gt=today - timedelta(days=days)
+    ).order_by().values('qc_expert_id').annotate(total=Sum(field)).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
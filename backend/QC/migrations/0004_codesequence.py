@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+SEQUENCES = ['production_card', 'inspection', 'workstation', 'workstation_report']
+
+
+def create_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in SEQUENCES:
+        schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS qc_code_{name}')
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in SEQUENCES:
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS qc_code_{name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0003_alter_productioncard_approved_by_qa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='نام شمارنده')),
+                ('value', models.BigIntegerField(default=0, verbose_name='آخرین شماره رزرو شده')),
+            ],
+            options={
+                'verbose_name': 'شمارنده کد',
+                'verbose_name_plural': 'شمارنده\u200cهای کد',
+            },
+        ),
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
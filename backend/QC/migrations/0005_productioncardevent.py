@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0004_codesequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionCardEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('created', 'ایجاد'), ('status_changed', 'تغییر وضعیت'), ('progress_updated', 'به\u200cروزرسانی پیشرفت'), ('approved', 'تأیید کنترل کیفیت')], max_length=20, verbose_name='نوع رویداد')),
+                ('old_status', models.CharField(blank=True, max_length=20, verbose_name='وضعیت قبلی')),
+                ('new_status', models.CharField(blank=True, max_length=20, verbose_name='وضعیت جدید')),
+                ('old_progress', models.PositiveIntegerField(blank=True, null=True, verbose_name='پیشرفت قبلی (%)')),
+                ('new_progress', models.PositiveIntegerField(blank=True, null=True, verbose_name='پیشرفت جدید (%)')),
+                ('note', models.TextField(blank=True, verbose_name='یادداشت')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان رویداد')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='production_card_events', to=settings.AUTH_USER_MODEL, verbose_name='انجام دهنده')),
+                ('production_card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='QC.productioncard', verbose_name='کارت تولید')),
+            ],
+            options={
+                'verbose_name': 'رویداد کارت تولید',
+                'verbose_name_plural': 'رویدادهای کارت تولید',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['production_card', '-created_at'], name='QC_producti_product_2ff84d_idx')],
+            },
+        ),
+    ]
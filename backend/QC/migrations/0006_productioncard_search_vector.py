@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:06
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# ایندکس‌ها فقط روی PostgreSQL ساخته می‌شوند تا مایگریشن روی sqlite (محیط dev) هم اجرا شود
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS qc_card_search_vector_gin '
+    'ON "QC_productioncard" USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS qc_card_code_trgm '
+    'ON "QC_productioncard" USING gin (card_code gin_trgm_ops)',
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS qc_card_search_vector_gin',
+    'DROP INDEX IF EXISTS qc_card_code_trgm',
+]
+
+BACKFILL = """
+UPDATE "QC_productioncard" AS card SET search_vector =
+    setweight(to_tsvector('simple', coalesce(card.card_code, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(card.title, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT product.name
+        FROM product_requirementsproducts AS rp
+        JOIN product_product AS product ON product.id = rp.product_id
+        WHERE rp.id = card.requirements_product_id
+    ), '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(card.notes, '')), 'D')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+    schema_editor.execute(BACKFILL)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0005_productioncardevent'),
+        ('product', '0002_operator_productionline_requirements_productiontask_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='productioncard',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='بردار جستجو'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
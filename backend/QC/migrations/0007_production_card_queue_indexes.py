@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0006_productioncard_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productioncard',
+            index=models.Index(condition=models.Q(('is_active', True), ('status__in', ['draft', 'pending_approval', 'approved', 'in_production', 'paused'])), fields=['scheduled_end_date', 'priority'], name='qc_card_overdue_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productioncard',
+            index=models.Index(condition=models.Q(('is_active', True), ('status__in', ['draft', 'pending_approval', 'approved'])), fields=['scheduled_start_date', 'priority'], name='qc_card_upcoming_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,207 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def _text(value):
+    return '' if value is None else str(value)[:255]
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)) if value not in (None, '') else None
+    except InvalidOperation:
+        return None
+
+
+def _datetime(value):
+    return (parse_datetime(value) if isinstance(value, str) else None) or django.utils.timezone.now()
+
+
+def copy_details_to_rows(apps, schema_editor):
+    """انتقال چک لیست، آزمون‌ها و اندازه‌گیری‌های JSON به جداول جدید"""
+    Inspection = apps.get_model('QC', 'ProductionCardQCInspection')
+    ChecklistItem = apps.get_model('QC', 'InspectionChecklistItem')
+    TestResult = apps.get_model('QC', 'InspectionTestResult')
+    Measurement = apps.get_model('QC', 'InspectionMeasurement')
+
+    inspections = Inspection.objects.only('id', 'checklist_items', 'test_results', 'measurements')
+    for inspection in inspections.iterator():
+        ChecklistItem.objects.bulk_create([
+            ChecklistItem(
+                inspection_id=inspection.id,
+                position=position,
+                item_name=_text(item.get('item_name')),
+                standard_value=_text(item.get('standard_value')),
+                actual_value=_text(item.get('actual_value')),
+                passed=bool(item.get('passed')),
+                notes=_text(item.get('notes')),
+                checked_at=_datetime(item.get('checked_at')),
+            )
+            for position, item in enumerate(inspection.checklist_items or [], start=1)
+            if isinstance(item, dict)
+        ])
+        TestResult.objects.bulk_create([
+            TestResult(
+                inspection_id=inspection.id,
+                test_name=_text(test.get('test_name')),
+                method=_text(test.get('method')),
+                result=_text(test.get('result')),
+                unit=_text(test.get('unit'))[:50],
+                passed=bool(test.get('passed')),
+                tested_at=_datetime(test.get('tested_at')),
+            )
+            for test in inspection.test_results or []
+            if isinstance(test, dict)
+        ])
+        measurements = []
+        for measurement in inspection.measurements or []:
+            if not isinstance(measurement, dict):
+                continue
+            value = _decimal(measurement.get('value', measurement.get('measured_value')))
+            if value is None:
+                continue
+            measurements.append(Measurement(
+                inspection_id=inspection.id,
+                characteristic=_text(measurement.get('characteristic', measurement.get('name'))),
+                value=value,
+                nominal_value=_decimal(measurement.get('nominal_value')),
+                lower_limit=_decimal(measurement.get('lower_limit')),
+                upper_limit=_decimal(measurement.get('upper_limit')),
+                unit=_text(measurement.get('unit'))[:50],
+                passed=measurement.get('passed'),
+                measured_at=_datetime(measurement.get('measured_at')),
+            ))
+        Measurement.objects.bulk_create(measurements)
+
+
+def copy_rows_to_details(apps, schema_editor):
+    """بازگرداندن ردیف‌ها به فیلدهای JSON"""
+    Inspection = apps.get_model('QC', 'ProductionCardQCInspection')
+    inspections = Inspection.objects.prefetch_related('checklist_rows', 'test_rows', 'measurement_rows')
+    for inspection in inspections.iterator(chunk_size=500):
+        inspection.checklist_items = [
+            {
+                'id': item.position,
+                'item_name': item.item_name,
+                'standard_value': item.standard_value,
+                'actual_value': item.actual_value,
+                'passed': item.passed,
+                'checked_at': item.checked_at.isoformat(),
+                'notes': item.notes,
+            }
+            for item in inspection.checklist_rows.all()
+        ]
+        inspection.test_results = [
+            {
+                'test_name': test.test_name,
+                'method': test.method,
+                'result': test.result,
+                'unit': test.unit,
+                'passed': test.passed,
+                'tested_at': test.tested_at.isoformat(),
+                'operator': test.operator_id,
+            }
+            for test in inspection.test_rows.all()
+        ]
+        inspection.measurements = [
+            {
+                'characteristic': measurement.characteristic,
+                'value': str(measurement.value),
+                'unit': measurement.unit,
+                'passed': measurement.passed,
+                'measured_at': measurement.measured_at.isoformat(),
+            }
+            for measurement in inspection.measurement_rows.all()
+        ]
+        inspection.save(update_fields=['checklist_items', 'test_results', 'measurements'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0007_production_card_queue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionTestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_name', models.CharField(max_length=255, verbose_name='نام آزمون')),
+                ('method', models.CharField(blank=True, max_length=255, verbose_name='روش آزمون')),
+                ('result', models.CharField(blank=True, max_length=255, verbose_name='نتیجه')),
+                ('unit', models.CharField(blank=True, max_length=50, verbose_name='واحد')),
+                ('passed', models.BooleanField(verbose_name='قبول شده')),
+                ('tested_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان آزمون')),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_rows', to='QC.productioncardqcinspection', verbose_name='بازرسی')),
+                ('operator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inspection_test_results', to=settings.AUTH_USER_MODEL, verbose_name='اپراتور')),
+            ],
+            options={
+                'verbose_name': 'نتیجه آزمون بازرسی',
+                'verbose_name_plural': 'نتایج آزمون بازرسی',
+                'ordering': ['inspection', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InspectionChecklistItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='ردیف')),
+                ('item_name', models.CharField(max_length=255, verbose_name='نام مورد')),
+                ('standard_value', models.CharField(blank=True, max_length=255, verbose_name='مقدار استاندارد')),
+                ('actual_value', models.CharField(blank=True, max_length=255, verbose_name='مقدار واقعی')),
+                ('passed', models.BooleanField(verbose_name='تأیید شده')),
+                ('notes', models.TextField(blank=True, verbose_name='یادداشت')),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان بررسی')),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checklist_rows', to='QC.productioncardqcinspection', verbose_name='بازرسی')),
+            ],
+            options={
+                'verbose_name': 'مورد چک لیست بازرسی',
+                'verbose_name_plural': 'موارد چک لیست بازرسی',
+                'ordering': ['inspection', 'position', 'id'],
+                'indexes': [models.Index(fields=['inspection', 'position'], name='QC_inspecti_inspect_eddeb3_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InspectionMeasurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('characteristic', models.CharField(max_length=255, verbose_name='مشخصه')),
+                ('value', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='مقدار اندازه\u200cگیری شده')),
+                ('nominal_value', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='مقدار اسمی')),
+                ('lower_limit', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='حد پایین')),
+                ('upper_limit', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='حد بالا')),
+                ('unit', models.CharField(blank=True, max_length=50, verbose_name='واحد')),
+                ('passed', models.BooleanField(blank=True, null=True, verbose_name='در محدوده مجاز')),
+                ('measured_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان اندازه\u200cگیری')),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='measurement_rows', to='QC.productioncardqcinspection', verbose_name='بازرسی')),
+            ],
+            options={
+                'verbose_name': 'اندازه\u200cگیری بازرسی',
+                'verbose_name_plural': 'اندازه\u200cگیری\u200cهای بازرسی',
+                'ordering': ['inspection', 'id'],
+                'indexes': [models.Index(fields=['characteristic', 'measured_at'], name='QC_inspecti_charact_2d2d8e_idx')],
+            },
+        ),
+        migrations.RunPython(copy_details_to_rows, copy_rows_to_details),
+        migrations.RemoveField(
+            model_name='productioncardqcinspection',
+            name='checklist_items',
+        ),
+        migrations.RemoveField(
+            model_name='productioncardqcinspection',
+            name='measurements',
+        ),
+        migrations.RemoveField(
+            model_name='productioncardqcinspection',
+            name='test_results',
+        ),
+    ]
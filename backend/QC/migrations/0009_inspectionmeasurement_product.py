@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_product(apps, schema_editor):
+    """محصول اندازه‌گیری‌های موجود از مسیر بازرسی و کارت تولید"""
+    InspectionMeasurement = apps.get_model('QC', 'InspectionMeasurement')
+    ProductionCardQCInspection = apps.get_model('QC', 'ProductionCardQCInspection')
+    InspectionMeasurement.objects.filter(product__isnull=True).update(
+        product_id=Subquery(
+            ProductionCardQCInspection.objects.filter(
+                pk=OuterRef('inspection_id')
+            ).values('production_card__requirements_product__product_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0008_inspection_detail_tables'),
+        ('product', '0002_operator_productionline_requirements_productiontask_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionmeasurement',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='qc_measurements', to='product.product', verbose_name='محصول'),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionmeasurement',
+            index=models.Index(fields=['product', 'characteristic', 'id'], name='QC_inspecti_product_243393_idx'),
+        ),
+        migrations.RunPython(backfill_product, migrations.RunPython.noop),
+    ]
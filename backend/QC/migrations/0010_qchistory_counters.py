@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+RECENT_SIZE = 10
+
+
+def backfill_counters(apps, schema_editor):
+    """شمارنده‌ها و موارد اخیر تاریخچه‌های موجود از جداول M2M"""
+    QCHistoryCreator = apps.get_model('QC', 'QCHistoryCreator')
+    statuses = dict(apps.get_model('QC', 'ProductionCard')._meta.get_field('status').choices)
+    orders_through = QCHistoryCreator.inspected_orders.through
+    cards_through = QCHistoryCreator.inspected_cart.through
+
+    for history in QCHistoryCreator.objects.all().iterator():
+        counts = history.inspection_logs.aggregate(
+            total=Count('id'),
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+        )
+        recent_orders = orders_through.objects.filter(
+            qchistorycreator_id=history.pk
+        ).order_by('-id').values_list('order_id', flat=True)[:RECENT_SIZE]
+        recent_cards = cards_through.objects.filter(
+            qchistorycreator_id=history.pk
+        ).order_by('-id').values(
+            'productioncard_id',
+            'productioncard__card_code',
+            'productioncard__title',
+            'productioncard__status',
+            'productioncard__created_at',
+        )[:RECENT_SIZE]
+        QCHistoryCreator.objects.filter(pk=history.pk).update(
+            total_inspections=counts['total'],
+            approved_inspections=counts['approved'],
+            rejected_inspections=counts['rejected'],
+            inspected_orders_count=history.inspected_orders.count(),
+            inspected_cards_count=history.inspected_cart.count(),
+            recent_order_ids=list(recent_orders),
+            recent_cards=[
+                {
+                    'id': row['productioncard_id'],
+                    'card_code': row['productioncard__card_code'],
+                    'title': row['productioncard__title'],
+                    'status': statuses.get(row['productioncard__status'], row['productioncard__status']),
+                    'inspection_date': row['productioncard__created_at'].isoformat(),
+                }
+                for row in recent_cards
+            ],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0009_inspectionmeasurement_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='approved_inspections',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد بازرسی\u200cهای تأیید شده'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='inspected_cards_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد کارت\u200cهای بازرسی شده'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='inspected_orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد سفارش\u200cهای بازرسی شده'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='recent_cards',
+            field=models.JSONField(blank=True, default=list, verbose_name='کارت\u200cهای اخیر'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='recent_order_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='سفارش\u200cهای اخیر'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='rejected_inspections',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد بازرسی\u200cهای رد شده'),
+        ),
+        migrations.AddField(
+            model_name='qchistorycreator',
+            name='total_inspections',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد کل بازرسی\u200cها'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
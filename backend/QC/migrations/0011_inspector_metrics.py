@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:18
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_metrics(apps, schema_editor):
+    """
+    آمار روزانه و شمارنده‌های کارشناسان از لاگ‌ها و بازرسی‌های کارت ثبت‌شده؛
+    کارشناس بدون نتیجه ثبت‌شده شمارنده قبلی خود را نگه می‌دارد
+    """
+    QualityControlExpert = apps.get_model('QC', 'QualityControlExpert')
+    InspectorDailyStats = apps.get_model('QC', 'InspectorDailyStats')
+    sources = [
+        (apps.get_model('QC', 'InspectionLog'), 'inspection_date'),
+        (apps.get_model('QC', 'ProductionCardQCInspection'), 'updated_at'),
+    ]
+
+    buckets = defaultdict(lambda: [0, 0])
+    for model, date_field in sources:
+        rows = model.objects.filter(
+            inspector__isnull=False, status__in=['approved', 'rejected']
+        ).annotate(day=TruncDate(date_field)).values('inspector_id', 'day').annotate(
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+        ).order_by()
+        for row in rows:
+            bucket = buckets[(row['inspector_id'], row['day'])]
+            bucket[0] += row['approved']
+            bucket[1] += row['rejected']
+
+    InspectorDailyStats.objects.bulk_create([
+        InspectorDailyStats(qc_expert_id=expert_id, day=day, approved=approved, rejected=rejected)
+        for (expert_id, day), (approved, rejected) in buckets.items()
+    ], batch_size=1000)
+
+    totals = defaultdict(lambda: [0, 0])
+    for (expert_id, _), (approved, rejected) in buckets.items():
+        totals[expert_id][0] += approved
+        totals[expert_id][1] += rejected
+
+    for expert in QualityControlExpert.objects.all().iterator():
+        approved, rejected = totals.get(expert.pk, (0, 0))
+        if approved + rejected:
+            expert.inspected_products_count = approved + rejected
+            expert.approved_products_count = approved
+            expert.approval_rate = round(approved / (approved + rejected) * 100, 2)
+        else:
+            expert.approved_products_count = round(
+                expert.inspected_products_count * float(expert.approval_rate) / 100
+            )
+        expert.save(update_fields=['inspected_products_count', 'approved_products_count', 'approval_rate'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0010_qchistory_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qualitycontrolexpert',
+            name='approved_products_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد محصولات تایید شده'),
+        ),
+        migrations.CreateModel(
+            name='InspectorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='روز')),
+                ('approved', models.IntegerField(default=0, verbose_name='تعداد تایید')),
+                ('rejected', models.IntegerField(default=0, verbose_name='تعداد رد')),
+                ('qc_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='QC.qualitycontrolexpert', verbose_name='کارشناس QC')),
+            ],
+            options={
+                'verbose_name': 'آمار روزانه کارشناس QC',
+                'verbose_name_plural': 'آمار روزانه کارشناسان QC',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('qc_expert', 'day'), name='qc_expert_daily_stats_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_metrics, migrations.RunPython.noop),
+    ]
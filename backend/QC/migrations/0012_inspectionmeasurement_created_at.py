@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0011_inspector_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionmeasurement',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='تاریخ ثبت'),
+            preserve_default=False,
+        ),
+    ]
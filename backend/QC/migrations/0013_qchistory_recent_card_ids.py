@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:39
+
+from django.db import migrations
+
+
+def card_ids(apps, schema_editor):
+    """فهرست کارت‌های اخیر از رونوشت کارت‌ها به شناسه‌ها"""
+    QCHistoryCreator = apps.get_model('QC', 'QCHistoryCreator')
+    for history in QCHistoryCreator.objects.exclude(recent_card_ids=[]).iterator():
+        history.recent_card_ids = [card['id'] if isinstance(card, dict) else card for card in history.recent_card_ids]
+        history.save(update_fields=['recent_card_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0012_inspectionmeasurement_created_at'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='qchistorycreator',
+            old_name='recent_cards',
+            new_name='recent_card_ids',
+        ),
+        migrations.RunPython(card_ids, migrations.RunPython.noop),
+    ]
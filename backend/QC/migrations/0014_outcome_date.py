@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:53
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_outcome_date(apps, schema_editor):
+    """روز ثبت نتیجه‌های موجود؛ همان روزهایی که آمار روزانه 0011 با آن‌ها ساخته شد"""
+    sources = [
+        (apps.get_model('QC', 'InspectionLog'), 'inspection_date'),
+        (apps.get_model('QC', 'ProductionCardQCInspection'), 'updated_at'),
+    ]
+    for model, date_field in sources:
+        model.objects.filter(status__in=['approved', 'rejected']).update(outcome_date=TruncDate(date_field))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('QC', '0013_qchistory_recent_card_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionlog',
+            name='outcome_date',
+            field=models.DateField(blank=True, null=True, verbose_name='تاریخ ثبت نتیجه'),
+        ),
+        migrations.AddField(
+            model_name='productioncardqcinspection',
+            name='outcome_date',
+            field=models.DateField(blank=True, null=True, verbose_name='تاریخ ثبت نتیجه'),
+        ),
+        migrations.RunPython(backfill_outcome_date, migrations.RunPython.noop),
+    ]
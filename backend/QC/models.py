@@ -2,10 +2,11 @@
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 import random
-from time import timezone
+from django.utils import timezone
 
 
 class QualityControlExpert(models.Model):
@@ -62,6 +63,11 @@ class QualityControlExpert(models.Model):
         default=100.00,
         verbose_name="نرخ تایید (%)"
     )
+
+    approved_products_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد محصولات تایید شده"
+    )
     
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -82,11 +88,58 @@ class QualityControlExpert(models.Model):
         return f"{self.user.get_full_name()} - {self.employee_code} - {self.department}"
     
     def update_inspection_stats(self, approved_count, total_inspected):
-        """به روزرسانی آمار بازرسی"""
+        """به روزرسانی آمار بازرسی (اتمیک با F؛ موارد تایید نشده رد شده حساب می‌شوند)"""
         if total_inspected > 0:
-            self.inspected_products_count += total_inspected
-            self.approval_rate = (approved_count / total_inspected) * 100
-            self.save()
+            from .metrics import INSPECTOR_METRIC_FIELDS, record_outcomes
+            record_outcomes(
+                self.pk,
+                approved=approved_count,
+                rejected=total_inspected - approved_count,
+            )
+            self.refresh_from_db(fields=INSPECTOR_METRIC_FIELDS)
+
+
+class InspectorDailyStats(models.Model):
+    """
+    آمار روزانه نتایج بازرسی هر کارشناس؛ نرخ تایید پنجره‌های 7/30/90 روزه
+    از جمع این ردیف‌ها خوانده می‌شود (QC.metrics)
+    """
+
+    qc_expert = models.ForeignKey(
+        QualityControlExpert,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name="کارشناس QC"
+    )
+
+    day = models.DateField(
+        verbose_name="روز"
+    )
+
+    # تغییر نتیجه یک بازرسی از ردیف روزی که نتیجه قبلی در آن ثبت شده کم می‌شود
+    approved = models.IntegerField(
+        default=0,
+        verbose_name="تعداد تایید"
+    )
+
+    rejected = models.IntegerField(
+        default=0,
+        verbose_name="تعداد رد"
+    )
+
+    class Meta:
+        verbose_name = "آمار روزانه کارشناس QC"
+        verbose_name_plural = "آمار روزانه کارشناسان QC"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['qc_expert', 'day'],
+                name='qc_expert_daily_stats_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.qc_expert_id} - {self.day}: {self.approved}/{self.approved + self.rejected}"
 
 
 
@@ -94,6 +147,28 @@ class QualityControlExpert(models.Model):
 
 
 
+class CodeSequence(models.Model):
+    """شمارنده پایدار تولید کد (وقتی SEQUENCE پایگاه داده در دسترس نیست)؛ QC.codes"""
+
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name="نام شمارنده"
+    )
+
+    value = models.BigIntegerField(
+        default=0,
+        verbose_name="آخرین شماره رزرو شده"
+    )
+
+    class Meta:
+        verbose_name = "شمارنده کد"
+        verbose_name_plural = "شمارنده‌های کد"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
 class QCHistoryCreator(models.Model): 
     """مدل برای ثبت تاریخچه بازرسی‌های QC"""
     
@@ -122,6 +197,44 @@ class QCHistoryCreator(models.Model):
         related_name='inspected_cart_p_cart'
     )
 
+    # شمارنده‌ها و موارد اخیر؛ با سیگنال‌های QC.history هنگام ثبت به‌روز می‌شوند
+    total_inspections = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد کل بازرسی‌ها"
+    )
+
+    approved_inspections = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد بازرسی‌های تأیید شده"
+    )
+
+    rejected_inspections = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد بازرسی‌های رد شده"
+    )
+
+    inspected_orders_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد سفارش‌های بازرسی شده"
+    )
+
+    inspected_cards_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="تعداد کارت‌های بازرسی شده"
+    )
+
+    recent_order_ids = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="سفارش‌های اخیر"
+    )
+
+    # فقط شناسه‌ها؛ وضعیت و عنوان کارت‌ها هنگام نمایش از خود کارت خوانده می‌شود
+    recent_card_ids = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="کارت‌های اخیر"
+    )
 
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -179,6 +292,13 @@ class InspectionLog(models.Model):
         verbose_name="تاریخ بازرسی"
     )
     
+    # روز ثبت نتیجه (تایید/رد) در آمار روزانه بازرس؛ تغییر نتیجه از همان روز کم می‌شود (QC.metrics)
+    outcome_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="تاریخ ثبت نتیجه"
+    )
+    
     comments = models.TextField(
         blank=True,
         null=True,
@@ -217,6 +337,11 @@ class InspectionLog(models.Model):
 
 
 
+# وضعیت‌های باز (کارت هنوز تمام نشده) و وضعیت‌های قبل از شروع تولید
+OPEN_CARD_STATUSES = ['draft', 'pending_approval', 'approved', 'in_production', 'paused']
+UPCOMING_CARD_STATUSES = ['draft', 'pending_approval', 'approved']
+
+
 # Cart from products 
 class ProductionCard(models.Model):
     """مدل کارت تولید برای هر محصول"""
@@ -396,6 +521,13 @@ class ProductionCard(models.Model):
         default=True,
         verbose_name="فعال"
     )
+
+    # بردار جستجوی متنی (کد، عنوان، نام محصول، یادداشت)؛ توسط QC.search نگهداری می‌شود
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="بردار جستجو"
+    )
     # create by qc controller 
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -424,15 +556,119 @@ class ProductionCard(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['priority']),
             models.Index(fields=['scheduled_start_date']),
+            # ایندکس‌های جزئی صف‌های کارت‌های تأخیری و پیش‌رو
+            models.Index(
+                fields=['scheduled_end_date', 'priority'],
+                name='qc_card_overdue_queue_idx',
+                condition=models.Q(is_active=True, status__in=OPEN_CARD_STATUSES),
+            ),
+            models.Index(
+                fields=['scheduled_start_date', 'priority'],
+                name='qc_card_upcoming_queue_idx',
+                condition=models.Q(is_active=True, status__in=UPCOMING_CARD_STATUSES),
+            ),
         ]
-    
+
+    # فیلدهایی که تغییرشان بردار جستجو را به‌روز می‌کند
+    SEARCH_SOURCE_FIELDS = {'card_code', 'title', 'notes', 'requirements_product', 'requirements_product_id'}
+
     def __str__(self):
         return f"{self.card_code} - {self.title}"
     
+    def save(self, *args, **kwargs):
+        # کد کارت از شمارنده مشترک (بدون تکرار و بدون شمارش جدول)
+        if not self.card_code:
+            from .codes import production_card_codes
+            production_card_codes.assign([self], 'card_code')
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & self.SEARCH_SOURCE_FIELDS:
+            from .search import update_search_vectors
+            update_search_vectors(ProductionCard.objects.filter(pk=self.pk))
+    
+
+
+
+
+
+
+class ProductionCardEvent(models.Model):
+    """رویدادهای کارت تولید (تغییر وضعیت، پیشرفت، تأیید)؛ فقط درج می‌شود و ویرایش نمی‌شود"""
+
+    EVENT_TYPES = (
+        ('created', 'ایجاد'),
+        ('status_changed', 'تغییر وضعیت'),
+        ('progress_updated', 'به‌روزرسانی پیشرفت'),
+        ('approved', 'تأیید کنترل کیفیت'),
+    )
+
+    production_card = models.ForeignKey(
+        'ProductionCard',
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name="کارت تولید"
+    )
 
+    event_type = models.CharField(
+        max_length=20,
+        choices=EVENT_TYPES,
+        verbose_name="نوع رویداد"
+    )
 
+    old_status = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name="وضعیت قبلی"
+    )
 
+    new_status = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name="وضعیت جدید"
+    )
 
+    old_progress = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="پیشرفت قبلی (%)"
+    )
+
+    new_progress = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="پیشرفت جدید (%)"
+    )
+
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='production_card_events',
+        verbose_name="انجام دهنده"
+    )
+
+    note = models.TextField(
+        blank=True,
+        verbose_name="یادداشت"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="زمان رویداد"
+    )
+
+    class Meta:
+        verbose_name = "رویداد کارت تولید"
+        verbose_name_plural = "رویدادهای کارت تولید"
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['production_card', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.production_card_id} - {self.get_event_type_display()}"
 
 
 class ProductionCardQCInspection(
@@ -495,6 +731,13 @@ class ProductionCardQCInspection(
         verbose_name="وضعیت بازرسی"
     )
     
+    # روز ثبت نتیجه (تایید/رد) در آمار روزانه بازرس؛ تغییر نتیجه از همان روز کم می‌شود (QC.metrics)
+    outcome_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="تاریخ ثبت نتیجه"
+    )
+    
     # زمان‌بندی
     scheduled_date = models.DateTimeField(
         null=True,
@@ -539,25 +782,8 @@ class ProductionCardQCInspection(
         verbose_name="تعداد کل موارد بررسی شده"
     )
     
-    # جزئیات بازرسی
-    checklist_items = models.JSONField(
-        default=list,
-        blank=True,
-        verbose_name="اقلام چک لیست"
-    )
-    
-    test_results = models.JSONField(
-        default=list,
-        blank=True,
-        verbose_name="نتایج آزمون‌ها"
-    )
-    
-    measurements = models.JSONField(
-        default=list,
-        blank=True,
-        verbose_name="اندازه‌گیری‌ها"
-    )
-    
+    # جزئیات بازرسی (چک لیست، آزمون‌ها و اندازه‌گیری‌ها) در جداول
+    # InspectionChecklistItem، InspectionTestResult و InspectionMeasurement
 
     # مستندات
     inspection_report = models.FileField(
@@ -646,9 +872,8 @@ class ProductionCardQCInspection(
     def save(self, *args, **kwargs):
         # ایجاد کد بازرسی به صورت خودکار
         if not self.inspection_code:
-            card_code = self.production_card.card_code[:5]
-            date_part = timezone.now().strftime("%y%m%d%H%M")
-            self.inspection_code = f"QC-{card_code}-{date_part}"
+            from .codes import inspection_codes
+            inspection_codes.assign([self], 'inspection_code')
         
         # محاسبه تعداد کل موارد بررسی شده
         self.total_items_checked = self.passed_items + self.failed_items
@@ -659,41 +884,39 @@ class ProductionCardQCInspection(
         
         super().save(*args, **kwargs)
     
+    # نمای JSON قبلی جزئیات بازرسی (از ردیف‌های جداول فرزند؛ با prefetch کوئری نمی‌زند)
+    @property
+    def checklist_items(self):
+        return [item.as_dict() for item in self.checklist_rows.all()]
+
+    @property
+    def test_results(self):
+        return [result.as_dict() for result in self.test_rows.all()]
+
+    @property
+    def measurements(self):
+        return [measurement.as_dict() for measurement in self.measurement_rows.all()]
+
     def add_checklist_item(self, item_name, standard_value, actual_value, passed):
         """افزودن مورد به چک لیست"""
-        item = {
-            'id': len(self.checklist_items) + 1,
+        from .checklists import ingest_checklist
+        ingest_checklist(self, [{
             'item_name': item_name,
             'standard_value': standard_value,
             'actual_value': actual_value,
             'passed': passed,
-            'checked_at': timezone.now().isoformat(),
-            'notes': ''
-        }
-        self.checklist_items.append(item)
-        
-        # به‌روزرسانی آمار
-        if passed:
-            self.passed_items += 1
-        else:
-            self.failed_items += 1
-        
-        self.save()
-    
+        }])
 
     def add_test_result(self, test_name, method, result, unit, passed):
         """افزودن نتیجه آزمون"""
-        test = {
+        from .checklists import ingest_test_results
+        ingest_test_results(self, [{
             'test_name': test_name,
             'method': method,
             'result': result,
             'unit': unit,
             'passed': passed,
-            'tested_at': timezone.now().isoformat(),
-            'operator': None
-        }
-        self.test_results.append(test)
-        self.save()
+        }])
     
     def approve_inspection(self, qc_manager, comments=""):
         """تأیید بازرسی توسط مدیر QC"""
@@ -722,3 +945,249 @@ class ProductionCardQCInspection(
         # به‌روزرسانی وضعیت کارت تولید
         self.production_card.status = 'paused'
         self.production_card.save()
+
+
+class InspectionChecklistItem(models.Model):
+    """مورد چک لیست بازرسی QC"""
+
+    inspection = models.ForeignKey(
+        'ProductionCardQCInspection',
+        on_delete=models.CASCADE,
+        related_name='checklist_rows',
+        verbose_name="بازرسی"
+    )
+
+    position = models.PositiveIntegerField(
+        verbose_name="ردیف"
+    )
+
+    item_name = models.CharField(
+        max_length=255,
+        verbose_name="نام مورد"
+    )
+
+    standard_value = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="مقدار استاندارد"
+    )
+
+    actual_value = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="مقدار واقعی"
+    )
+
+    passed = models.BooleanField(
+        verbose_name="تأیید شده"
+    )
+
+    notes = models.TextField(
+        blank=True,
+        verbose_name="یادداشت"
+    )
+
+    checked_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="زمان بررسی"
+    )
+
+    class Meta:
+        verbose_name = "مورد چک لیست بازرسی"
+        verbose_name_plural = "موارد چک لیست بازرسی"
+        ordering = ['inspection', 'position', 'id']
+        indexes = [
+            models.Index(fields=['inspection', 'position']),
+        ]
+
+    def __str__(self):
+        return f"{self.inspection_id} - {self.item_name}"
+
+    def as_dict(self):
+        return {
+            'id': self.position,
+            'item_name': self.item_name,
+            'standard_value': self.standard_value,
+            'actual_value': self.actual_value,
+            'passed': self.passed,
+            'checked_at': self.checked_at.isoformat(),
+            'notes': self.notes,
+        }
+
+
+class InspectionTestResult(models.Model):
+    """نتیجه آزمون بازرسی QC"""
+
+    inspection = models.ForeignKey(
+        'ProductionCardQCInspection',
+        on_delete=models.CASCADE,
+        related_name='test_rows',
+        verbose_name="بازرسی"
+    )
+
+    test_name = models.CharField(
+        max_length=255,
+        verbose_name="نام آزمون"
+    )
+
+    method = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="روش آزمون"
+    )
+
+    result = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="نتیجه"
+    )
+
+    unit = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name="واحد"
+    )
+
+    passed = models.BooleanField(
+        verbose_name="قبول شده"
+    )
+
+    operator = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='inspection_test_results',
+        verbose_name="اپراتور"
+    )
+
+    tested_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="زمان آزمون"
+    )
+
+    class Meta:
+        verbose_name = "نتیجه آزمون بازرسی"
+        verbose_name_plural = "نتایج آزمون بازرسی"
+        ordering = ['inspection', 'id']
+
+    def __str__(self):
+        return f"{self.inspection_id} - {self.test_name}"
+
+    def as_dict(self):
+        return {
+            'test_name': self.test_name,
+            'method': self.method,
+            'result': self.result,
+            'unit': self.unit,
+            'passed': self.passed,
+            'tested_at': self.tested_at.isoformat(),
+            'operator': self.operator_id,
+        }
+
+
+class InspectionMeasurement(models.Model):
+    """اندازه‌گیری یک مشخصه در بازرسی QC (با حدود مجاز)"""
+
+    inspection = models.ForeignKey(
+        'ProductionCardQCInspection',
+        on_delete=models.CASCADE,
+        related_name='measurement_rows',
+        verbose_name="بازرسی"
+    )
+
+    # محصول کارت تولید (تکراری از مسیر بازرسی) تا سری‌های SPC بدون join خوانده شوند
+    product = models.ForeignKey(
+        'product.Product',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='qc_measurements',
+        verbose_name="محصول"
+    )
+
+    characteristic = models.CharField(
+        max_length=255,
+        verbose_name="مشخصه"
+    )
+
+    value = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        verbose_name="مقدار اندازه‌گیری شده"
+    )
+
+    nominal_value = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="مقدار اسمی"
+    )
+
+    lower_limit = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="حد پایین"
+    )
+
+    upper_limit = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="حد بالا"
+    )
+
+    unit = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name="واحد"
+    )
+
+    passed = models.BooleanField(
+        null=True,
+        blank=True,
+        verbose_name="در محدوده مجاز"
+    )
+
+    measured_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="زمان اندازه‌گیری"
+    )
+
+    # زمان ثبت در سرور (نه زمان اعلام‌شده اندازه‌گیری) برای تثبیت خلاصه سری‌های SPC
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="تاریخ ثبت"
+    )
+
+    class Meta:
+        verbose_name = "اندازه‌گیری بازرسی"
+        verbose_name_plural = "اندازه‌گیری‌های بازرسی"
+        ordering = ['inspection', 'id']
+        indexes = [
+            models.Index(fields=['characteristic', 'measured_at']),
+            models.Index(fields=['product', 'characteristic', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.inspection_id} - {self.characteristic}: {self.value}"
+
+    def as_dict(self):
+        return {
+            'characteristic': self.characteristic,
+            'value': _decimal_str(self.value),
+            'nominal_value': _decimal_str(self.nominal_value),
+            'lower_limit': _decimal_str(self.lower_limit),
+            'upper_limit': _decimal_str(self.upper_limit),
+            'unit': self.unit,
+            'passed': self.passed,
+            'measured_at': self.measured_at.isoformat(),
+        }
+
+
+def _decimal_str(value):
+    return str(value) if value is not None else None
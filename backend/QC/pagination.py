@@ -0,0 +1,119 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class WorkQueueCursorPagination(BasePagination):
+    """
+    صفحه‌بندی cursor (keyset) برای صف‌های کاری با ترتیب چند ستونی
+
+    برخلاف CursorPagination خود DRF که فقط ستون اول ترتیب را در cursor نگه می‌دارد،
+    کلید کامل ترتیب (مثلاً رتبه اولویت، تاریخ و id) در cursor ذخیره می‌شود، پس
+    صفحه بعد با یک WHERE روی همان کلید و بدون OFFSET خوانده می‌شود. به جای count
+    یک ردیف اضافه خوانده می‌شود تا has_more مشخص شود.
+
+    ordering فهرستی از (نام فیلد، نزولی) است و آخرین فیلد باید یکتا باشد (معمولاً id).
+    فیلدها نباید null باشند.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'cursor نامعتبر است'
+
+    def __init__(self, ordering, results_key='results'):
+        self.ordering = ordering
+        self.results_key = results_key
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*[
+            f'-{field}' if descending else field for field, descending in self.ordering
+        ])
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.next_position = self._position(page[-1]) if self.has_more else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'has_more': self.has_more,
+            self.results_key: data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        return None
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            # هر مقدار با فیلد ترتیب متناظر تبدیل می‌شود (تاریخ‌ها رشته ISO هستند)
+            position = [
+                self._ordering_field(queryset, field).to_python(value)
+                for (field, _), value in zip(self.ordering, values)
+            ]
+            if any(value is None for value in position):
+                raise ValueError
+        except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def _ordering_field(queryset, name):
+        """فیلد مدل یا annotation (مثل priority_rank) برای تبدیل مقدار cursor"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def _position(self, instance):
+        return [getattr(instance, field) for field, _ in self.ordering]
+
+    def _after(self, position):
+        """
+        شرط «بعد از position» در ترتیب چند ستونی:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.ordering, position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
@@ -1,25 +1,21 @@
-
 from rest_framework.permissions import BasePermission
+from backend.utils.profiles import RoleProfileResolver
 from .models import QualityControlExpert
 
+# فقط کارشناسان فعال
+qc_profile_resolver = RoleProfileResolver(QualityControlExpert, 'qc', is_active=True)
+
+
 class IsQualityControlExpert(BasePermission):
     """
     بررسی می‌کند که کاربر وارد شده یک کارشناس کنترل کیفیت باشد
     """
     
     def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
+        qc_profile = qc_profile_resolver.resolve(request)
+        if qc_profile is None:
             return False
-        
-        try:
-            qc_profile = QualityControlExpert.objects.select_related('user').get(
-                user=request.user,
-                is_active=True  # فقط کارشناسان فعال
-            )
-            
-            # TODO  check QC controll 
-            request.qc_profile = qc_profile
-            return True
-            
-        except QualityControlExpert.DoesNotExist:
-            return False
\ No newline at end of file
+
+        # TODO  check QC controll 
+        request.qc_profile = qc_profile
+        return True
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import OPEN_CARD_STATUSES, UPCOMING_CARD_STATUSES
+from .pagination import WorkQueueCursorPagination
+
+PRIORITY_RANK = {
+    'urgent': 3,
+    'high': 2,
+    'medium': 1,
+    'low': 0,
+}
+
+UPCOMING_WINDOW_DAYS = 7
+
+# فوری‌ترها اول، سپس قدیمی‌ترین موعد؛ id برای یکتایی cursor
+OVERDUE_ORDERING = [('priority_rank', True), ('scheduled_end_date', False), ('id', False)]
+UPCOMING_ORDERING = [('priority_rank', True), ('scheduled_start_date', False), ('id', False)]
+
+
+def annotate_priority_rank(queryset):
+    """رتبه عددی اولویت برای مرتب‌سازی (فوری = 3 ... کم = 0)"""
+    return queryset.annotate(priority_rank=Case(
+        *[When(priority=priority, then=Value(rank)) for priority, rank in PRIORITY_RANK.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def overdue_queue(queryset, now=None):
+    """
+    کارت‌های باز که موعد پایانشان گذشته است؛ شرط‌ها با ایندکس جزئی
+    qc_card_overdue_queue_idx منطبق‌اند
+    """
+    now = now or timezone.now()
+    return annotate_priority_rank(queryset.filter(
+        is_active=True,
+        status__in=OPEN_CARD_STATUSES,
+        scheduled_end_date__lt=now,
+    ))
+
+
+def upcoming_queue(queryset, now=None, days=UPCOMING_WINDOW_DAYS):
+    """
+    کارت‌هایی که در days روز آینده شروع می‌شوند؛ شرط‌ها با ایندکس جزئی
+    qc_card_upcoming_queue_idx منطبق‌اند
+    """
+    now = now or timezone.now()
+    return annotate_priority_rank(queryset.filter(
+        is_active=True,
+        status__in=UPCOMING_CARD_STATUSES,
+        scheduled_start_date__gte=now,
+        scheduled_start_date__lte=now + timedelta(days=days),
+    ))
+
+
+def overdue_pagination():
+    return WorkQueueCursorPagination(OVERDUE_ORDERING, results_key='cards')
+
+
+def upcoming_pagination():
+    return WorkQueueCursorPagination(UPCOMING_ORDERING, results_key='cards')
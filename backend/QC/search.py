@@ -0,0 +1,68 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery
+from rest_framework import filters
+
+# متن‌ها فارسی‌اند و PostgreSQL ریشه‌یاب فارسی ندارد؛ پیکربندی simple فقط توکن‌سازی می‌کند
+SEARCH_CONFIG = 'simple'
+
+
+def search_vector_expression():
+    """
+    بردار جستجوی کارت تولید: کد و عنوان (وزن A)، نام محصول (B) و یادداشت (D)
+    """
+    from product.models import RequirementsProducts
+
+    product_name = Subquery(
+        RequirementsProducts.objects.filter(
+            pk=OuterRef('requirements_product_id')
+        ).values('product__name')[:1]
+    )
+    return (
+        SearchVector('card_code', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(product_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('notes', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """به‌روزرسانی search_vector کارت‌های queryset با یک UPDATE (فقط PostgreSQL)"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return 0
+    return queryset.update(search_vector=search_vector_expression())
+
+
+class ProductionCardSearchFilter(filters.SearchFilter):
+    """
+    جایگزین SearchFilter برای کارت‌های تولید
+
+    روی PostgreSQL از ستون search_vector (ایندکس GIN) با تطبیق پیشوندی استفاده می‌کند
+    و کد کارت را با LIKE پیشوندی (ایندکس trigram) هم تطبیق می‌دهد. نتایج بر اساس
+    رتبه متنی به‌علاوه شباهت trigram کد مرتب می‌شوند، مگر ?ordering داده شده باشد.
+    در سایر پایگاه‌ها همان رفتار SearchFilter روی search_fields حفظ می‌شود.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        tokens = [token for term in terms for token in re.findall(r'\w+', term)]
+        if not tokens:
+            return queryset
+
+        query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens),
+            search_type='raw',
+            config=SEARCH_CONFIG,
+        )
+        # کدها با حروف بزرگ ساخته می‌شوند؛ LIKE ساده (بدون UPPER) از ایندکس trigram استفاده می‌کند
+        code = ' '.join(terms).upper()
+        return queryset.filter(
+            Q(search_vector=query) | Q(card_code__startswith=code)
+        ).annotate(
+            search_rank=SearchRank(F('search_vector'), query) + TrigramSimilarity('card_code', code)
+        ).order_by('-search_rank', 'pk')
@@ -1,13 +1,14 @@
 # serializers/production_card.py
 from rest_framework import serializers
+from django.conf import settings
 from django.utils import timezone
-from .models import ProductionCard, QualityControlExpert
+from .models import ProductionCard, ProductionCardEvent, QualityControlExpert
+from .stats import get_qc_counts, get_qc_status
 
 from product.models import RequirementsProducts
+from product.serializers import RequirementsProductsOutputSerializer
 
 from django.utils.text import slugify
-import random
-import string
 
 
 
@@ -107,11 +108,7 @@ class ProductionCardInputSerializer(serializers.ModelSerializer):
         return data
     
     def create(self, validated_data):
-        # تولید کد کارت تولید
-        prefix = "PC"
-        year_month = timezone.now().strftime("%y%m")
-        random_suffix = ''.join(random.choices(string.digits, k=4))
-        validated_data['card_code'] = f"{prefix}{year_month}{random_suffix}"
+        # کد کارت تولید در ProductionCard.save از شمارنده مشترک تولید می‌شود
         
         # تنظیم کاربر ایجاد کننده اگر ارسال نشده
         request = self.context.get('request')
@@ -149,7 +146,7 @@ class ProductionCardInputSerializer(serializers.ModelSerializer):
 
 
 class ProductionCardOutputSerializer(serializers.ModelSerializer):
-    requirements_product = serializers.SerializerMethodField()
+    requirements_product = RequirementsProductsOutputSerializer(read_only=True)
     requirements_product_id = serializers.IntegerField(source='requirements_product.id', read_only=True)
     requirements_product_name = serializers.CharField(source='requirements_product.name', read_only=True)
     
@@ -158,7 +155,7 @@ class ProductionCardOutputSerializer(serializers.ModelSerializer):
     created_by_fullname = serializers.SerializerMethodField()
     
     approved_by_qa = serializers.SerializerMethodField()
-    approved_by_qa_id = serializers.IntegerField(source='approved_by_qa.id', read_only=True)
+    approved_by_qa_id = serializers.SerializerMethodField()
     approved_by_qa_fullname = serializers.SerializerMethodField()
     
     product_info = serializers.SerializerMethodField()
@@ -237,37 +234,38 @@ class ProductionCardOutputSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'card_code', 'created_at', 'updated_at']
     
-    def get_requirements_product(self, obj):
-        from product.serializers import RequirementsProductsOutputSerializer
-        return RequirementsProductsOutputSerializer(obj.requirements_product).data
-    
     def get_created_by(self, obj):
         if obj.created_by:
             return {
                 'id': obj.created_by.id,
-                'username': obj.created_by.user.username if obj.created_by.user else None,
+                'username': obj.created_by.username,
             }
         return None
     
     def get_created_by_fullname(self, obj):
-        if obj.created_by and hasattr(obj.created_by, 'user'):
-            user = obj.created_by.user
+        if obj.created_by:
+            user = obj.created_by
             return f"{user.first_name} {user.last_name}".strip() or user.username
         return None
     
+    # approved_by_qa چند به چند است؛ همه متدها از کش prefetch (approved_by_qa__user) می‌خوانند
     def get_approved_by_qa(self, obj):
-        if obj.approved_by_qa:
-            return {
-                'id': obj.approved_by_qa.id,
-                'username': obj.approved_by_qa.user.username if obj.approved_by_qa.user else None,
+        return [
+            {
+                'id': qc.id,
+                'username': qc.user.username,
             }
-        return None
+            for qc in obj.approved_by_qa.all()
+        ]
+    
+    def get_approved_by_qa_id(self, obj):
+        return [qc.id for qc in obj.approved_by_qa.all()]
     
     def get_approved_by_qa_fullname(self, obj):
-        if obj.approved_by_qa and hasattr(obj.approved_by_qa, 'user'):
-            user = obj.approved_by_qa.user
-            return f"{user.first_name} {user.last_name}".strip() or user.username
-        return None
+        return [
+            f"{qc.user.first_name} {qc.user.last_name}".strip() or qc.user.username
+            for qc in obj.approved_by_qa.all()
+        ]
     
     def get_product_info(self, obj):
         """نمایش اطلاعات محصول مرتبط"""
@@ -323,6 +321,8 @@ class ProductionCardLiteSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='requirements_product.product.name', read_only=True)
     is_overdue = serializers.SerializerMethodField()
     remaining_days = serializers.SerializerMethodField()
+    qc_status = serializers.SerializerMethodField()
+    qc_inspections_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductionCard
@@ -342,6 +342,8 @@ class ProductionCardLiteSerializer(serializers.ModelSerializer):
             'actual_start_date',
             'is_overdue',
             'remaining_days',
+            'qc_status',
+            'qc_inspections_count',
             'created_at',
         ]
     
@@ -356,28 +358,47 @@ class ProductionCardLiteSerializer(serializers.ModelSerializer):
             return max(0, remaining.days)
         return 0
     
+    def get_qc_status(self, obj):
+        return get_qc_status(obj)
+    
+    def get_qc_inspections_count(self, obj):
+        return get_qc_counts(obj)['qc_inspections_total']
+    
 
 
 class ProductionCardStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=ProductionCard.CARD_STATUS_CHOICES)
     notes = serializers.CharField(required=False, allow_blank=True)
     
+    # انتقال‌های مجاز وضعیت؛ وضعیت‌هایی که در جدول نیستند محدودیتی ندارند
+    VALID_TRANSITIONS = {
+        'draft': ['pending_approval'],
+        'pending_approval': ['approved', 'draft'],
+        'approved': ['in_production'],
+        'in_production': ['paused', 'completed'],
+        'paused': ['in_production'],
+    }
+    
+    @classmethod
+    def is_valid_transition(cls, current_status, status):
+        return current_status not in cls.VALID_TRANSITIONS or status in cls.VALID_TRANSITIONS[current_status]
+    
+    @classmethod
+    def allowed_sources(cls, status):
+        """وضعیت‌هایی که می‌توانند به status منتقل شوند"""
+        return [
+            current_status for current_status, _ in ProductionCard.CARD_STATUS_CHOICES
+            if cls.is_valid_transition(current_status, status)
+        ]
+    
     def validate(self, data):
         status = data.get('status')
         instance = self.instance
         
         if instance:
             # اعتبارسنجی انتقال وضعیت
-            valid_transitions = {
-                'draft': ['pending_approval'],
-                'pending_approval': ['approved', 'draft'],
-                'approved': ['in_production'],
-                'in_production': ['paused', 'completed'],
-                'paused': ['in_production'],
-            }
-            
             current_status = instance.status
-            if current_status in valid_transitions and status not in valid_transitions[current_status]:
+            if not self.is_valid_transition(current_status, status):
                 raise serializers.ValidationError({
                     'status': f'انتقال از وضعیت {current_status} به {status} مجاز نیست'
                 })
@@ -387,4 +408,51 @@ class ProductionCardStatusUpdateSerializer(serializers.Serializer):
 
 class ProductionCardProgressUpdateSerializer(serializers.Serializer):
     progress = serializers.IntegerField(min_value=0, max_value=100)
-    notes = serializers.CharField(required=False, allow_blank=True)
\ No newline at end of file
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class ProductionCardBulkStatusSerializer(serializers.Serializer):
+    card_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PRODUCTION_CARD_BULK_MAX,
+    )
+    status = serializers.ChoiceField(choices=ProductionCard.CARD_STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class ProductionCardBulkProgressSerializer(serializers.Serializer):
+    card_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PRODUCTION_CARD_BULK_MAX,
+    )
+    progress = serializers.IntegerField(min_value=0, max_value=100)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class ProductionCardEventSerializer(serializers.ModelSerializer):
+    event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
+    actor_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ProductionCardEvent
+        fields = [
+            'id',
+            'event_type',
+            'event_type_display',
+            'old_status',
+            'new_status',
+            'old_progress',
+            'new_progress',
+            'actor',
+            'actor_name',
+            'note',
+            'created_at',
+        ]
+        read_only_fields = fields
+    
+    def get_actor_name(self, obj):
+        if obj.actor:
+            return f"{obj.actor.first_name} {obj.actor.last_name}".strip() or obj.actor.username
+        return None
\ No newline at end of file
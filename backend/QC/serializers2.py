@@ -1,15 +1,23 @@
 # serializers.py
 from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from .models import (
     QualityControlExpert,
     QCHistoryCreator,
     InspectionLog,
     ProductionCard,
-    ProductionCardQCInspection
+    ProductionCardQCInspection,
+    InspectionChecklistItem,
+    InspectionTestResult,
+    InspectionMeasurement
 )
+from .checklists import INSPECTION_DETAIL_FIELDS, ingest_inspection_details
+from .metrics import get_rolling_stats
+from .spc import SPC_TAIL_POINTS
 
-import random 
+from .stats import get_qc_counts, get_qc_status
 
 class QualityControlExpertInputSerializer(serializers.ModelSerializer):
     """Serializer برای ایجاد و ویرایش کارشناس QC"""
@@ -23,7 +31,7 @@ class QualityControlExpertInputSerializer(serializers.ModelSerializer):
             'specialization',
             'is_active'
         ]
-        read_only_fields = ['created_at', 'inspected_products_count', 'approval_rate']
+        read_only_fields = ['created_at', 'inspected_products_count', 'approved_products_count', 'approval_rate']
     
     def validate_employee_code(self, value):
         """اعتبارسنجی کد پرسنلی"""
@@ -53,6 +61,7 @@ class QualityControlExpertInputSerializer(serializers.ModelSerializer):
         
         # تنظیم آمار اولیه
         validated_data['inspected_products_count'] = 0
+        validated_data['approved_products_count'] = 0
         validated_data['approval_rate'] = 100.00
         
         return super().create(validated_data)
@@ -91,6 +100,7 @@ class QualityControlExpertOutputSerializer(serializers.ModelSerializer):
             'qualification_level_display',
             'specialization',
             'inspected_products_count',
+            'approved_products_count',
             'approval_rate',
             'performance_stats',
             'phone_number',
@@ -100,11 +110,13 @@ class QualityControlExpertOutputSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_performance_stats(self, obj):
-        """محاسبه آمار عملکرد"""
+        """آمار عملکرد از شمارنده‌های کارشناس و آمار روزانه (بدون مرور تاریخچه بازرسی‌ها)"""
         return {
             'total_inspections': obj.inspected_products_count,
+            'approved_inspections': obj.approved_products_count,
             'approval_rate': float(obj.approval_rate),
-            'performance_level': self._calculate_performance_level(obj.approval_rate)
+            'performance_level': self._calculate_performance_level(obj.approval_rate),
+            'rolling': get_rolling_stats(obj),
         }
     
     def get_phone_number(self, obj):
@@ -126,7 +138,12 @@ class QualityControlExpertOutputSerializer(serializers.ModelSerializer):
 
 
 class QCHistoryCreatorOutputSerializer(serializers.ModelSerializer):
-    """Serializer برای نمایش تاریخچه QC"""
+    """
+    Serializer برای نمایش تاریخچه QC
+
+    آمار و شناسه موارد اخیر از فیلدهای نگهداری‌شده خوانده می‌شوند (بدون کوئری روی M2M)؛
+    فهرست کامل لاگ‌ها، سفارش‌ها و کارت‌ها از endpoint های صفحه‌بندی‌شده تاریخچه
+    """
     
     qc_expert_name = serializers.CharField(source='qc_expert.user.get_full_name', read_only=True)
     qc_expert_code = serializers.CharField(source='qc_expert.employee_code', read_only=True)
@@ -134,10 +151,10 @@ class QCHistoryCreatorOutputSerializer(serializers.ModelSerializer):
     # آمار بازرسی‌ها
     inspection_stats = serializers.SerializerMethodField(read_only=True)
     
-    # لیست سفارش‌های بازرسی شده (فقط IDها)
-    inspected_order_ids = serializers.SerializerMethodField(read_only=True)
+    # سفارش‌های اخیر بازرسی شده (فقط IDها)
+    inspected_order_ids = serializers.ListField(source='recent_order_ids', read_only=True)
     
-    # لیست کارت‌های بازرسی شده
+    # کارت‌های اخیر بازرسی شده (وضعیت فعلی کارت‌ها)
     inspected_cards = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
@@ -147,7 +164,9 @@ class QCHistoryCreatorOutputSerializer(serializers.ModelSerializer):
             'qc_expert_name',
             'qc_expert_code',
             'inspection_stats',
+            'inspected_orders_count',
             'inspected_order_ids',
+            'inspected_cards_count',
             'inspected_cards',
             'created_at'
         ]
@@ -155,33 +174,28 @@ class QCHistoryCreatorOutputSerializer(serializers.ModelSerializer):
     
     def get_inspection_stats(self, obj):
         """آمار بازرسی‌ها"""
-        logs = obj.inspection_logs.all()
-        total = logs.count()
-        approved = logs.filter(status='approved').count()
-        rejected = logs.filter(status='rejected').count()
+        total = obj.total_inspections
+        approved = obj.approved_inspections
         
         return {
             'total_inspections': total,
             'approved': approved,
-            'rejected': rejected,
+            'rejected': obj.rejected_inspections,
             'approval_rate': (approved / total * 100) if total > 0 else 0
         }
-    
-    def get_inspected_order_ids(self, obj):
-        """ID سفارش‌های بازرسی شده"""
-        return list(obj.inspected_orders.values_list('id', flat=True))
-    
+
     def get_inspected_cards(self, obj):
-        """اطلاعات کارت‌های بازرسی شده"""
-        cards = obj.inspected_cart.all()
+        """کارت‌های اخیر با یک کوئری روی حداکثر QC_HISTORY_RECENT_SIZE کارت، به ترتیب فهرست اخیر"""
+        cards = ProductionCard.objects.only('card_code', 'title', 'status', 'created_at').in_bulk(obj.recent_card_ids)
         return [
             {
+                'id': card.pk,
                 'card_code': card.card_code,
                 'title': card.title,
                 'status': card.get_status_display(),
-                'inspection_date': card.created_at
+                'inspection_date': card.created_at.isoformat(),
             }
-            for card in cards[:10]  # فقط 10 مورد اول
+            for card in map(cards.get, obj.recent_card_ids) if card is not None
         ]
 
 
@@ -363,8 +377,7 @@ class ProductionCardInputSerializer(serializers.ModelSerializer):
         """ایجاد کارت تولید"""
         request = self.context.get('request')
         
-        # تنظیم کد کارت تولید
-        validated_data['card_code'] = self._generate_card_code()
+        # کد کارت تولید در ProductionCard.save از شمارنده مشترک تولید می‌شود
         
         # تنظیم ایجادکننده
         if request and request.user.is_authenticated:
@@ -375,13 +388,6 @@ class ProductionCardInputSerializer(serializers.ModelSerializer):
         
         return super().create(validated_data)
     
-    def _generate_card_code(self):
-        """تولید کد کارت تولید"""
-        prefix = "PC"
-        timestamp = timezone.now().strftime("%y%m%d%H%M%S")
-        random_num = str(random.randint(100, 999))
-        return f"{prefix}-{timestamp}-{random_num}"
-
 
 class ProductionCardOutputSerializer(serializers.ModelSerializer):
     """Serializer برای نمایش کارت تولید"""
@@ -459,24 +465,8 @@ class ProductionCardOutputSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_qc_status(self, obj):
-        """وضعیت QC کارت تولید"""
-        inspections = obj.qc_inspections.all()
-        
-        if not inspections.exists():
-            return 'no_inspection'
-        
-        approved_count = inspections.filter(status='approved').count()
-        pending_count = inspections.filter(status__in=['pending', 'in_progress']).count()
-        rejected_count = inspections.filter(status='rejected').count()
-        
-        if rejected_count > 0:
-            return 'rejected'
-        elif pending_count > 0:
-            return 'pending'
-        elif approved_count == inspections.count():
-            return 'fully_approved'
-        else:
-            return 'partial_approved'
+        """وضعیت QC کارت تولید (از annotation کوئری در صورت وجود)"""
+        return get_qc_status(obj)
     
     def get_approved_by_names(self, obj):
         """نام کارشناسان QC که تأیید کرده‌اند"""
@@ -515,7 +505,7 @@ class ProductionCardOutputSerializer(serializers.ModelSerializer):
         return None
     
     def get_qc_inspections_count(self, obj):
-        return obj.qc_inspections.count()
+        return get_qc_counts(obj)['qc_inspections_total']
     
     def get_production_line_info(self, obj):
         """اطلاعات خط تولید مرتبط"""
@@ -529,9 +519,123 @@ class ProductionCardOutputSerializer(serializers.ModelSerializer):
         return None
 
 
+class InspectionChecklistItemSerializer(serializers.ModelSerializer):
+    """Serializer مورد چک لیست بازرسی"""
+    
+    class Meta:
+        model = InspectionChecklistItem
+        fields = [
+            'id',
+            'position',
+            'item_name',
+            'standard_value',
+            'actual_value',
+            'passed',
+            'notes',
+            'checked_at'
+        ]
+        read_only_fields = ['id', 'position']
+        extra_kwargs = {'checked_at': {'required': False}}
+
+
+class InspectionTestResultSerializer(serializers.ModelSerializer):
+    """Serializer نتیجه آزمون بازرسی"""
+    
+    class Meta:
+        model = InspectionTestResult
+        fields = [
+            'id',
+            'test_name',
+            'method',
+            'result',
+            'unit',
+            'passed',
+            'operator',
+            'tested_at'
+        ]
+        read_only_fields = ['id']
+        extra_kwargs = {'tested_at': {'required': False}}
+
+
+class InspectionMeasurementSerializer(serializers.ModelSerializer):
+    """Serializer اندازه‌گیری بازرسی"""
+    
+    class Meta:
+        model = InspectionMeasurement
+        fields = [
+            'id',
+            'characteristic',
+            'value',
+            'nominal_value',
+            'lower_limit',
+            'upper_limit',
+            'unit',
+            'passed',
+            'measured_at'
+        ]
+        read_only_fields = ['id']
+        extra_kwargs = {'measured_at': {'required': False}}
+    
+    def validate(self, attrs):
+        lower_limit = attrs.get('lower_limit')
+        upper_limit = attrs.get('upper_limit')
+        if lower_limit is not None and upper_limit is not None and lower_limit > upper_limit:
+            raise serializers.ValidationError("حد پایین نمی‌تواند بیشتر از حد بالا باشد.")
+        return attrs
+
+
+class InspectionDetailsBulkSerializer(serializers.Serializer):
+    """
+    ثبت گروهی جزئیات بازرسی؛ هر بخش با یک INSERT ثبت می‌شود و
+    با replace=true جایگزین ردیف‌های قبلی همان بخش‌ها می‌شود
+    """
+    checklist_items = InspectionChecklistItemSerializer(many=True, required=False)
+    test_results = InspectionTestResultSerializer(many=True, required=False)
+    measurements = InspectionMeasurementSerializer(many=True, required=False)
+    replace = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        sizes = [len(attrs.get(name, [])) for name in INSPECTION_DETAIL_FIELDS]
+        if not any(sizes):
+            raise serializers.ValidationError("حداقل یک مورد برای ثبت لازم است.")
+        if max(sizes) > settings.INSPECTION_BULK_MAX:
+            raise serializers.ValidationError(
+                f"حداکثر {settings.INSPECTION_BULK_MAX} مورد در هر بخش قابل ثبت است."
+            )
+        return attrs
+    
+    def save(self, inspection):
+        return ingest_inspection_details(
+            inspection,
+            self.validated_data,
+            replace=self.validated_data['replace']
+        )
+
+
+class SPCQuerySerializer(serializers.Serializer):
+    """پارامترهای درخواست نمودار کنترل (SPC) یک مشخصه محصول"""
+    product = serializers.IntegerField(min_value=1, source='product_id')
+    characteristic = serializers.CharField(max_length=255)
+    subgroup_size = serializers.IntegerField(min_value=2, max_value=10, default=5)
+    lsl = serializers.FloatField(required=False, allow_null=True, default=None)
+    usl = serializers.FloatField(required=False, allow_null=True, default=None)
+    points = serializers.IntegerField(min_value=1, max_value=SPC_TAIL_POINTS, default=100)
+    fresh = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        if attrs['lsl'] is not None and attrs['usl'] is not None and attrs['lsl'] >= attrs['usl']:
+            raise serializers.ValidationError("حد پایین مشخصه باید کمتر از حد بالا باشد.")
+        return attrs
+
+
 class ProductionCardQCInspectionInputSerializer(serializers.ModelSerializer):
     """Serializer برای ایجاد و ویرایش بازرسی QC کارت تولید"""
     
+    # جزئیات در جداول جدا ثبت می‌شوند؛ در ویرایش جایگزین ردیف‌های قبلی می‌شوند
+    checklist_items = InspectionChecklistItemSerializer(many=True, required=False, write_only=True)
+    test_results = InspectionTestResultSerializer(many=True, required=False, write_only=True)
+    measurements = InspectionMeasurementSerializer(many=True, required=False, write_only=True)
+    
     class Meta:
         model = ProductionCardQCInspection
         fields = [
@@ -584,13 +688,6 @@ class ProductionCardQCInspectionInputSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("تاریخ بازرسی نمی‌تواند در گذشته باشد.")
         return value
     
-    def validate_checklist_items(self, value):
-        """اعتبارسنجی اقلام چک لیست"""
-        for item in value:
-            if not item.get('item_name'):
-                raise serializers.ValidationError("هر آیتم چک لیست باید دارای نام باشد.")
-        return value
-    
     def create(self, validated_data):
         """ایجاد بازرسی QC"""
         request = self.context.get('request')
@@ -604,7 +701,25 @@ class ProductionCardQCInspectionInputSerializer(serializers.ModelSerializer):
         # تنظیم وضعیت اولیه
         validated_data['status'] = 'pending'
         
-        return super().create(validated_data)
+        details = self._pop_details(validated_data)
+        with transaction.atomic():
+            inspection = super().create(validated_data)
+            ingest_inspection_details(inspection, details)
+        return inspection
+    
+    def update(self, instance, validated_data):
+        details = self._pop_details(validated_data)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            ingest_inspection_details(instance, details, replace=True)
+        return instance
+    
+    @staticmethod
+    def _pop_details(validated_data):
+        return {
+            name: validated_data.pop(name)
+            for name in INSPECTION_DETAIL_FIELDS if name in validated_data
+        }
 
 
 class ProductionCardQCInspectionOutputSerializer(serializers.ModelSerializer):
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from product.models import Product
+from .models import ProductionCard
+from .search import update_search_vectors
+from .stats import invalidate_production_stats
+
+
+@receiver([post_save, post_delete], sender=ProductionCard)
+def production_card_changed(sender, instance, **kwargs):
+    """با هر تغییر کارت تولید، اسنپ‌شات آمار تولید باطل می‌شود"""
+    invalidate_production_stats()
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, created, **kwargs):
+    """نام محصول در بردار جستجوی کارت‌های تولید آن محصول است"""
+    if not created:
+        update_search_vectors(
+            ProductionCard.objects.filter(requirements_product__product=instance)
+        )
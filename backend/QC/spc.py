@@ -0,0 +1,398 @@
+import hashlib
+import logging
+import math
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, FloatField, Q
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import InspectionMeasurement
+
+logger = logging.getLogger(__name__)
+
+# ضرایب نمودار X-bar/R بر اساس اندازه زیرگروه: (A2, D3, D4, d2)
+XBAR_R_CONSTANTS = {
+    2: (1.880, 0.0, 3.267, 1.128),
+    3: (1.023, 0.0, 2.574, 1.693),
+    4: (0.729, 0.0, 2.282, 2.059),
+    5: (0.577, 0.0, 2.114, 2.326),
+    6: (0.483, 0.0, 2.004, 2.534),
+    7: (0.419, 0.076, 1.924, 2.704),
+    8: (0.373, 0.136, 1.864, 2.847),
+    9: (0.337, 0.184, 1.816, 2.970),
+    10: (0.308, 0.223, 1.777, 3.078),
+}
+
+# نمودار مقادیر منفرد با دامنه متحرک دوتایی
+MR_D2 = 1.128
+MR_D4 = 3.267
+
+# قواعد Western Electric: (شماره، طول پنجره، حداقل نقاط، مرز بر حسب sigma)
+WESTERN_ELECTRIC_RULES = [
+    (1, 1, 1, 3),
+    (2, 3, 2, 2),
+    (3, 5, 4, 1),
+    (4, 8, 8, 0),
+]
+
+# تعداد نقاط اخیر (و میانگین زیرگروه‌های همین بازه) که همراه خلاصه سری نگه داشته
+# می‌شوند؛ سقف points درخواست و پنجره بررسی قواعد Western Electric
+SPC_TAIL_POINTS = 5000
+
+# اندازه دسته خواندن اندازه‌گیری‌ها در ساخت خلاصه
+SPC_CHUNK_SIZE = 10000
+
+
+def iter_series(product_id, characteristic, after_id=0, settled_before=None):
+    """
+    اندازه‌گیری‌های یک مشخصه محصول جدیدتر از after_id به ترتیب شناسه، در دسته‌های
+    (ids, values, settled) از آرایه‌های NumPy
+
+    settled نشان می‌دهد ردیف پیش از settled_before ثبت شده است (تراکنش آن قطعاً
+    تمام شده) و می‌تواند در خلاصه ادغام شود.
+    """
+    settled = Q(created_at__lt=settled_before) if settled_before else Q(pk__isnull=False)
+    rows = InspectionMeasurement.objects.filter(
+        product_id=product_id,
+        characteristic=characteristic,
+        id__gt=after_id,
+    ).order_by('id').values_list(
+        'id', Cast('value', FloatField()), ExpressionWrapper(settled, output_field=BooleanField())
+    ).iterator(chunk_size=SPC_CHUNK_SIZE)
+    while chunk := list(islice(rows, SPC_CHUNK_SIZE)):
+        ids, values, flags = zip(*chunk)
+        yield np.array(ids, dtype=np.int64), np.array(values, dtype=np.float64), np.array(flags, dtype=bool)
+
+
+def empty_summary():
+    """خلاصه سری بدون اندازه‌گیری"""
+    return {
+        'last_id': 0,
+        'count': 0,
+        'mean': 0.0,
+        'm2': 0.0,
+        'mr_sum': 0.0,
+        'subgroups': {
+            size: {'count': 0, 'mean_sum': 0.0, 'range_sum': 0.0, 'means': np.empty(0)}
+            for size in XBAR_R_CONSTANTS
+        },
+        'ids': np.empty(0, dtype=np.int64),
+        'values': np.empty(0),
+    }
+
+
+def fold(summary, ids, values):
+    """
+    افزودن اندازه‌گیری‌های جدید (به ترتیب شناسه) به خلاصه سری و برگرداندن خلاصه جدید
+
+    خلاصه فقط مجموع‌ها (میانگین و m2 به روش Chan، مجموع دامنه‌های متحرک، مجموع
+    میانگین و دامنه زیرگروه‌های کامل هر اندازه) و SPC_TAIL_POINTS نقطه آخر را نگه
+    می‌دارد؛ زیرگروه ناقص از انتهای همین نقاط ساخته می‌شود.
+    """
+    if not values.size:
+        return summary
+    previous, added = summary['count'], values.size
+    count = previous + added
+    mean = values.mean()
+    delta = mean - summary['mean']
+    tail = summary['values']
+
+    subgroups = {}
+    for size, group in summary['subgroups'].items():
+        carry = tail[tail.size - previous % size:]
+        chain = np.concatenate([carry, values])
+        full = chain.size // size
+        blocks = chain[:full * size].reshape(full, size)
+        means = blocks.mean(axis=1)
+        subgroups[size] = {
+            'count': group['count'] + full,
+            'mean_sum': group['mean_sum'] + float(means.sum()),
+            'range_sum': group['range_sum'] + float(np.ptp(blocks, axis=1).sum()),
+            'means': np.concatenate([group['means'], means])[-(SPC_TAIL_POINTS // size):],
+        }
+
+    return {
+        'last_id': int(ids[-1]),
+        'count': count,
+        'mean': summary['mean'] + float(delta) * added / count,
+        'm2': summary['m2'] + float(np.square(values - mean).sum()) + float(delta) ** 2 * previous * added / count,
+        'mr_sum': summary['mr_sum'] + float(np.abs(np.diff(np.concatenate([tail[-1:], values]))).sum()),
+        'subgroups': subgroups,
+        'ids': np.concatenate([summary['ids'], ids])[-SPC_TAIL_POINTS:],
+        'values': np.concatenate([tail, values])[-SPC_TAIL_POINTS:],
+    }
+
+
+def load_spec_limits(product_id, characteristic):
+    """آخرین حدود مشخصه (LSL, USL) ثبت شده برای سری"""
+    limits = InspectionMeasurement.objects.filter(
+        Q(lower_limit__isnull=False) | Q(upper_limit__isnull=False),
+        product_id=product_id,
+        characteristic=characteristic,
+    ).order_by('-id').values_list('lower_limit', 'upper_limit').first()
+    if not limits:
+        return None, None
+    return tuple(float(limit) if limit is not None else None for limit in limits)
+
+
+def individuals_chart(summary):
+    """حدود کنترل نمودار مقادیر منفرد و دامنه متحرک (I-MR)"""
+    if summary['count'] < 2:
+        return None
+    center = summary['mean']
+    mr_bar = summary['mr_sum'] / (summary['count'] - 1)
+    return {
+        'center': center,
+        'ucl': center + 3 * mr_bar / MR_D2,
+        'lcl': center - 3 * mr_bar / MR_D2,
+        'mr_bar': mr_bar,
+        'mr_ucl': MR_D4 * mr_bar,
+        'sigma': mr_bar / MR_D2,
+    }
+
+
+def xbar_r_chart(summary, subgroup_size):
+    """حدود کنترل نمودار X-bar/R با زیرگروه‌های متوالی (زیرگروه ناقص آخر کنار گذاشته می‌شود)"""
+    group = summary['subgroups'][subgroup_size]
+    count = group['count']
+    if count < 2:
+        return None
+    a2, d3, d4, d2 = XBAR_R_CONSTANTS[subgroup_size]
+    center = group['mean_sum'] / count
+    r_bar = group['range_sum'] / count
+    return {
+        'subgroup_size': subgroup_size,
+        'subgroups': count,
+        'center': center,
+        'ucl': center + a2 * r_bar,
+        'lcl': center - a2 * r_bar,
+        'r_bar': r_bar,
+        'r_ucl': d4 * r_bar,
+        'r_lcl': d3 * r_bar,
+        'sigma': r_bar / d2,
+        'means': group['means'],
+    }
+
+
+def capability(summary, sigma_within, lsl, usl):
+    """شاخص‌های قابلیت فرآیند Cp/Cpk (sigma درون‌گروهی) و Pp/Ppk (sigma کل)"""
+    if summary['count'] < 2 or (lsl is None and usl is None):
+        return None
+    mean = summary['mean']
+    sigma_overall = math.sqrt(summary['m2'] / (summary['count'] - 1))
+    return {
+        'mean': mean,
+        'sigma_within': sigma_within,
+        'sigma_overall': sigma_overall,
+        'cp': _spread_index(lsl, usl, sigma_within),
+        'cpk': _location_index(mean, lsl, usl, sigma_within),
+        'pp': _spread_index(lsl, usl, sigma_overall),
+        'ppk': _location_index(mean, lsl, usl, sigma_overall),
+    }
+
+
+def western_electric_violations(values, center, sigma):
+    """
+    نقاط نقض قواعد Western Electric با محاسبه برداری (مجموع تجمعی روی پنجره‌ها)
+
+    خروجی برای هر قاعده آرایه اندیس نقطه‌ای است که پنجره نقض در آن تمام می‌شود.
+    """
+    if not sigma or values.size == 0:
+        return {rule: np.empty(0, dtype=np.int64) for rule, *_ in WESTERN_ELECTRIC_RULES}
+    z = (values - center) / sigma
+    violations = {}
+    for rule, window, required, bound in WESTERN_ELECTRIC_RULES:
+        above = _window_hits(z > bound, window) >= required
+        below = _window_hits(z < -bound, window) >= required
+        violations[rule] = np.flatnonzero(above | below) + window - 1
+    return violations
+
+
+def compute_spc(summary, lsl=None, usl=None, subgroup_size=5, points=100):
+    """
+    نمودارهای کنترل، قابلیت فرآیند و نقض قواعد یک سری از روی خلاصه آن
+
+    حدود و شاخص‌ها از کل سری محاسبه می‌شوند؛ قواعد Western Electric روی نقاط
+    نگه‌داشته‌شده (حداکثر SPC_TAIL_POINTS نقطه آخر) بررسی می‌شوند.
+    """
+    ids, values = summary['ids'], summary['values']
+    # اندیس نقاط انتهایی در کل سری
+    offset = summary['count'] - values.size
+    individuals = individuals_chart(summary)
+    xbar_r = xbar_r_chart(summary, subgroup_size)
+    sigma_within = individuals['sigma'] if individuals else None
+    violations = (
+        western_electric_violations(values, individuals['center'], individuals['sigma'])
+        if individuals else {}
+    )
+
+    latest = sorted(
+        ((int(index), rule) for rule, indexes in violations.items() for index in indexes[-points:]),
+        reverse=True,
+    )[:points]
+
+    if xbar_r:
+        means = xbar_r.pop('means')
+        xbar_r['recent_means'] = _floats(means[-points:])
+
+    return {
+        'count': summary['count'],
+        'last_measurement_id': int(ids[-1]) if ids.size else None,
+        'spec': {'lsl': lsl, 'usl': usl},
+        'individuals': _rounded(individuals),
+        'xbar_r': _rounded(xbar_r),
+        'capability': _rounded(capability(summary, sigma_within, lsl, usl)),
+        'violations': {
+            'window': int(values.size),
+            'counts': {f'rule_{rule}': int(indexes.size) for rule, indexes in violations.items()},
+            'latest': [
+                {'rule': rule, 'index': offset + index, 'measurement_id': int(ids[index])}
+                for index, rule in latest
+            ],
+        },
+        'recent_points': [
+            {'measurement_id': int(measurement_id), 'value': value}
+            for measurement_id, value in zip(ids[-points:], _floats(values[-points:]))
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_spc(product_id, characteristic, lsl=None, usl=None, subgroup_size=5, points=100, fresh=False):
+    """
+    نتیجه SPC سری از خلاصه کش‌شده
+
+    کش فقط خلاصه سری (مجموع‌ها و نقاط انتهایی، با اندازه ثابت) و last_id آخرین
+    اندازه‌گیری ادغام‌شده را نگه می‌دارد. شناسه‌ها به ترتیب commit نمی‌رسند، پس فقط
+    ردیف‌هایی که بیش از QC_SPC_SETTLE_SECONDS پیش ثبت شده‌اند (تا اولین ردیف
+    تثبیت‌نشده) ادغام می‌شوند؛ ردیف‌های بعدی در هر درخواست دوباره خوانده و فقط
+    در پاسخ ادغام می‌شوند. حذف یا ویرایش اندازه‌گیری کش سری را باطل می‌کند.
+    """
+    key = _series_key(product_id, characteristic)
+    summary = None if fresh else _cache_get(key)
+    changed = summary is None
+    if summary is None:
+        summary = empty_summary()
+
+    settled_before = timezone.now() - timedelta(seconds=settings.QC_SPC_SETTLE_SECONDS)
+    pending_ids, pending_values = [], []
+    for ids, values, settled in iter_series(product_id, characteristic, summary['last_id'], settled_before):
+        if not pending_ids:
+            head = ids.size if settled.all() else int(np.argmin(settled))
+            if head:
+                summary = fold(summary, ids[:head], values[:head])
+                changed = True
+            ids, values = ids[head:], values[head:]
+        if ids.size:
+            pending_ids.append(ids)
+            pending_values.append(values)
+    if changed:
+        _cache_set(key, summary)
+    if pending_ids:
+        summary = fold(summary, np.concatenate(pending_ids), np.concatenate(pending_values))
+
+    spec_lsl, spec_usl = load_spec_limits(product_id, characteristic)
+    lsl = spec_lsl if lsl is None else lsl
+    usl = spec_usl if usl is None else usl
+    result = compute_spc(summary, lsl, usl, subgroup_size, points)
+    result.update({'product': product_id, 'characteristic': characteristic})
+    return result
+
+
+def invalidate_series(product_id, characteristic):
+    """حذف کش سری (وقتی اندازه‌گیری‌های ثبت‌شده حذف یا جایگزین می‌شوند)"""
+    key = _series_key(product_id, characteristic)
+    try:
+        cache.delete(key)
+    except Exception as e:
+        logger.warning(f"SPC cache delete failed for {key}: {e}")
+
+
+def measurement_changing(sender, instance, **kwargs):
+    """نگه داشتن سری قبلی اندازه‌گیری ویرایش‌شده تا post_save کش آن را هم باطل کند"""
+    if instance.pk:
+        instance._previous_series = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('product_id', 'characteristic').first()
+
+
+def measurement_changed(sender, instance, created=False, **kwargs):
+    """
+    باطل کردن کش سری پس از commit وقتی اندازه‌گیری ثبت‌شده ویرایش یا حذف می‌شود
+    (حذف آبشاری بازرسی هم برای هر ردیف post_delete می‌فرستد)
+    """
+    if created:
+        return
+    series = {(instance.product_id, instance.characteristic), getattr(instance, '_previous_series', None)}
+    for product_id, characteristic in filter(None, series):
+        if product_id is not None:
+            transaction.on_commit(partial(invalidate_series, product_id, characteristic))
+
+
+def connect():
+    """اتصال سیگنال‌های باطل کردن کش SPC؛ در AppConfig.ready صدا زده می‌شود"""
+    pre_save.connect(measurement_changing, sender=InspectionMeasurement, dispatch_uid='qc_spc_measurement_pre')
+    post_save.connect(measurement_changed, sender=InspectionMeasurement, dispatch_uid='qc_spc_measurement_saved')
+    post_delete.connect(measurement_changed, sender=InspectionMeasurement, dispatch_uid='qc_spc_measurement_deleted')
+
+
+def _window_hits(flags, window):
+    """تعداد نقاط True در هر پنجره متوالی به طول window"""
+    if flags.size < window:
+        return np.empty(0, dtype=np.int64)
+    totals = np.concatenate([[0], np.cumsum(flags, dtype=np.int64)])
+    return totals[window:] - totals[:-window]
+
+
+def _spread_index(lsl, usl, sigma):
+    if lsl is None or usl is None or not sigma:
+        return None
+    return (usl - lsl) / (6 * sigma)
+
+
+def _location_index(mean, lsl, usl, sigma):
+    if not sigma:
+        return None
+    sides = [(usl - mean) if usl is not None else None, (mean - lsl) if lsl is not None else None]
+    return min(side for side in sides if side is not None) / (3 * sigma)
+
+
+def _rounded(values):
+    if values is None:
+        return None
+    return {
+        name: round(float(value), 6) if isinstance(value, (float, np.floating)) else value
+        for name, value in values.items()
+    }
+
+
+def _floats(array):
+    return [round(value, 6) for value in array.tolist()]
+
+
+def _series_key(product_id, characteristic):
+    digest = hashlib.md5(characteristic.encode()).hexdigest()
+    return f'qc:spc:{product_id}:{digest}'
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"SPC cache read failed for {key}: {e}")
+        return None
+
+
+def _cache_set(key, summary):
+    try:
+        cache.set(key, summary, settings.QC_SPC_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"SPC cache write failed for {key}: {e}")
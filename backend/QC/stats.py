@@ -0,0 +1,272 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import OPEN_CARD_STATUSES, ProductionCard, ProductionCardQCInspection, QualityControlExpert
+
+logger = logging.getLogger(__name__)
+
+STATS_VERSION_KEY = 'qc:production_stats:version'
+
+INSPECTION_STATS_KEY = 'qc:inspection_stats'
+
+QC_PENDING_STATUSES = ['pending', 'in_progress']
+
+QC_COUNT_FIELDS = ['qc_inspections_total', 'qc_approved_count', 'qc_pending_count', 'qc_rejected_count']
+
+
+def compute_production_stats(queryset):
+    """
+    آمار کارت‌های تولید با یک کوئری تجمیعی شرطی
+    """
+    statuses = [value for value, _ in ProductionCard.CARD_STATUS_CHOICES]
+    priorities = [value for value, _ in ProductionCard.PRIORITY_CHOICES]
+
+    aggregates = {
+        'total_cards': Count('id'),
+        'overdue_cards': Count('id', filter=Q(
+            status__in=OPEN_CARD_STATUSES,
+            scheduled_end_date__lt=timezone.now()
+        )),
+        'average_progress': Avg('current_progress'),
+        'total_quantity_to_produce': Sum('quantity_to_produce'),
+    }
+    for value in statuses:
+        aggregates[f'status__{value}'] = Count('id', filter=Q(status=value))
+    for value in priorities:
+        aggregates[f'priority__{value}'] = Count('id', filter=Q(priority=value))
+
+    row = queryset.order_by().aggregate(**aggregates)
+
+    # همان شکل خروجی group by قبلی: فقط مقادیر دارای کارت، مرتب بر اساس کلید
+    return {
+        'total_cards': row['total_cards'],
+        'overdue_cards': row['overdue_cards'],
+        'average_progress': round(row['average_progress'] or 0, 2),
+        'total_quantity_to_produce': row['total_quantity_to_produce'] or 0,
+        'cards_by_status': [
+            {'status': value, 'count': row[f'status__{value}']}
+            for value in sorted(statuses) if row[f'status__{value}']
+        ],
+        'cards_by_priority': [
+            {'priority': value, 'count': row[f'priority__{value}']}
+            for value in sorted(priorities) if row[f'priority__{value}']
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_production_stats(queryset, params, fresh=False):
+    """
+    آمار تولید از اسنپ‌شات کش‌شده؛ کلید کش شامل نسخه (با هر ذخیره کارت تولید
+    افزایش می‌یابد) و پارامترهای فیلتر است
+    """
+    key = _snapshot_key(params)
+    if not fresh:
+        try:
+            snapshot = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Production stats cache read failed: {e}")
+            snapshot = None
+        if snapshot is not None:
+            return snapshot
+
+    snapshot = compute_production_stats(queryset)
+    try:
+        cache.set(key, snapshot, settings.PRODUCTION_STATS_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Production stats cache write failed: {e}")
+    return snapshot
+
+
+def invalidate_production_stats():
+    """باطل کردن همه اسنپ‌شات‌های آمار تولید"""
+    try:
+        if not cache.add(STATS_VERSION_KEY, 1, None):
+            cache.incr(STATS_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Production stats cache invalidation failed: {e}")
+
+
+def annotate_qc_status(queryset):
+    """
+    شمارش بازرسی‌های QC هر کارت تولید به‌صورت annotation تا سریالایزرها
+    به ازای هر ردیف کوئری نزنند
+    """
+    return queryset.annotate(**_qc_count_aggregates('qc_inspections__'))
+
+
+def get_qc_counts(card):
+    """
+    شمارش بازرسی‌های QC کارت؛ از annotation استفاده می‌کند و در نبود آن با یک
+    aggregate محاسبه و روی نمونه نگه می‌دارد
+    """
+    if not hasattr(card, 'qc_inspections_total'):
+        counts = card.qc_inspections.aggregate(**_qc_count_aggregates(''))
+        for field in QC_COUNT_FIELDS:
+            setattr(card, field, counts[field])
+    return {field: getattr(card, field) for field in QC_COUNT_FIELDS}
+
+
+def get_qc_status(card):
+    """وضعیت QC کارت تولید بر اساس شمارش بازرسی‌ها"""
+    counts = get_qc_counts(card)
+    if not counts['qc_inspections_total']:
+        return 'no_inspection'
+    if counts['qc_rejected_count'] > 0:
+        return 'rejected'
+    if counts['qc_pending_count'] > 0:
+        return 'pending'
+    if counts['qc_approved_count'] == counts['qc_inspections_total']:
+        return 'fully_approved'
+    return 'partial_approved'
+
+
+def _qc_count_aggregates(prefix):
+    return {
+        'qc_inspections_total': Count(f'{prefix}id'),
+        'qc_approved_count': Count(f'{prefix}id', filter=Q(**{f'{prefix}status': 'approved'})),
+        'qc_pending_count': Count(f'{prefix}id', filter=Q(**{f'{prefix}status__in': QC_PENDING_STATUSES})),
+        'qc_rejected_count': Count(f'{prefix}id', filter=Q(**{f'{prefix}status': 'rejected'})),
+    }
+
+
+def compute_expert_stats(queryset):
+    """
+    آمار کارشناسان QC با یک aggregate
+    """
+    levels = [value for value, _ in QualityControlExpert.QUALIFICATION_LEVELS]
+    aggregates = {
+        'total_experts': Count('id'),
+        'active_count': Count('id', filter=Q(is_active=True)),
+        'average_approval_rate': Avg('approval_rate'),
+    }
+    for value in levels:
+        aggregates[f'level__{value}'] = Count('id', filter=Q(qualification_level=value))
+
+    row = queryset.order_by().aggregate(**aggregates)
+    return {
+        'total_experts': row['total_experts'],
+        'by_level': {value: row[f'level__{value}'] for value in levels},
+        'active_count': row['active_count'],
+        'average_approval_rate': row['average_approval_rate'] or 0,
+    }
+
+
+def compute_inspection_stats(days=None):
+    """
+    آمار تفصیلی بازرسی‌ها در پنجره زمانی اخیر: بازرسی‌ها و نرخ تأیید هر کارشناس
+    و تعداد بازرسی‌های پایان‌یافته در هر روز (همه با aggregate گروهی)
+    """
+    days = days or settings.QC_INSPECTION_STATS_WINDOW_DAYS
+    since = timezone.now() - timedelta(days=days)
+    inspections = ProductionCardQCInspection.objects.filter(created_at__gte=since).order_by()
+    outcome = {
+        'total': Count('id'),
+        'approved': Count('id', filter=Q(status='approved')),
+        'rejected': Count('id', filter=Q(status='rejected')),
+        'needs_correction': Count('id', filter=Q(status='needs_correction')),
+    }
+
+    overall = inspections.aggregate(average_score=Avg('overall_score'), **outcome)
+
+    experts = []
+    for row in inspections.filter(inspector__isnull=False).values(
+        'inspector_id',
+        'inspector__employee_code',
+        'inspector__user__first_name',
+        'inspector__user__last_name',
+    ).annotate(average_score=Avg('overall_score'), **outcome).order_by('-total'):
+        experts.append({
+            'inspector_id': row['inspector_id'],
+            'employee_code': row['inspector__employee_code'],
+            'name': f"{row['inspector__user__first_name']} {row['inspector__user__last_name']}".strip(),
+            'total': row['total'],
+            'approved': row['approved'],
+            'rejected': row['rejected'],
+            'needs_correction': row['needs_correction'],
+            'approval_rate': _rate(row['approved'], row['approved'] + row['rejected']),
+            'average_score': _round(row['average_score']),
+        })
+
+    throughput = [
+        {
+            'day': row['day'].isoformat(),
+            'completed': row['completed'],
+            'approved': row['approved'],
+            'rejected': row['rejected'],
+        }
+        for row in inspections.filter(actual_end_date__isnull=False).annotate(
+            day=TruncDate('actual_end_date')
+        ).values('day').annotate(
+            completed=Count('id'),
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+        ).order_by('day')
+    ]
+
+    return {
+        'window_days': days,
+        'total_inspections': overall['total'],
+        'approved': overall['approved'],
+        'rejected': overall['rejected'],
+        'needs_correction': overall['needs_correction'],
+        'approval_rate': _rate(overall['approved'], overall['approved'] + overall['rejected']),
+        'average_score': _round(overall['average_score']),
+        'average_daily_throughput': _round(
+            sum(day['completed'] for day in throughput) / days
+        ),
+        'experts': experts,
+        'throughput_per_day': throughput,
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_inspection_stats(fresh=False):
+    """
+    آمار تفصیلی بازرسی‌ها از کش؛ کش به‌صورت دوره‌ای توسط تسک
+    refresh_inspection_stats بازسازی می‌شود
+    """
+    if not fresh:
+        try:
+            snapshot = cache.get(INSPECTION_STATS_KEY)
+        except Exception as e:
+            logger.warning(f"Inspection stats cache read failed: {e}")
+            snapshot = None
+        if snapshot is not None:
+            return snapshot
+    return refresh_inspection_stats()
+
+
+def refresh_inspection_stats():
+    """محاسبه دوباره آمار تفصیلی بازرسی‌ها و ذخیره در کش"""
+    snapshot = compute_inspection_stats()
+    try:
+        cache.set(INSPECTION_STATS_KEY, snapshot, settings.QC_INSPECTION_STATS_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Inspection stats cache write failed: {e}")
+    return snapshot
+
+
+def _rate(part, whole):
+    return round(part * 100 / whole, 2) if whole else 0
+
+
+def _round(value):
+    return round(float(value), 2) if value is not None else None
+
+
+def _snapshot_key(params):
+    try:
+        version = cache.get(STATS_VERSION_KEY) or 0
+    except Exception:
+        version = 0
+    filters = '&'.join(f'{name}={params[name]}' for name in sorted(params) if params[name] is not None)
+    digest = hashlib.md5(filters.encode()).hexdigest()
+    return f'qc:production_stats:{version}:{digest}'
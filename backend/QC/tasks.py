@@ -0,0 +1,17 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_inspection_stats():
+    """
+    بازسازی دوره‌ای کش آمار تفصیلی بازرسی‌های QC
+    باید هر چند دقیقه یک بار توسط Celery beat اجرا شود
+    """
+    from QC.stats import refresh_inspection_stats as refresh
+
+    snapshot = refresh()
+    return {'total_inspections': snapshot['total_inspections']}
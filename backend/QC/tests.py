@@ -1,3 +1,631 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+from datetime import timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from order.models import Order
+from product.models import Product, RequirementsProducts
+from Sales.models import SalesExpert
+
+from .models import (
+    CodeSequence,
+    InspectionLog,
+    InspectionMeasurement,
+    InspectorDailyStats,
+    ProductionCard,
+    ProductionCardEvent,
+    ProductionCardQCInspection,
+    QCHistoryCreator,
+    QualityControlExpert,
+)
+from .codes import CodeGenerator, production_card_codes
+from .metrics import get_rolling_stats, record_outcomes
+from .spc import _cache_get, _series_key, empty_summary, fold, get_spc
+from .transitions import bulk_change_status, bulk_update_progress
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductionCardListQueryCountTests(TestCase):
+    """تعداد کوئری‌های لیست کارت‌های تولید نباید به تعداد کارت‌ها وابسته باشد"""
+
+    url = '/QC/production-cards/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='qc-manager')
+        QualityControlExpert.objects.create(
+            user=cls.user,
+            employee_code='QC-1',
+            department='QC',
+            qualification_level='manager',
+        )
+        product = Product.objects.create(name='product', slug='product', price=1)
+        cls.requirements_product = RequirementsProducts.objects.create(
+            name='requirements', slug='requirements', product=product
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_cards(self, count):
+        for _ in range(count):
+            index = ProductionCard.objects.count()
+            card = ProductionCard.objects.create(
+                card_code=f'PC-{index}',
+                title=f'card {index}',
+                requirements_product=self.requirements_product,
+            )
+            for status in ['approved', 'pending', 'rejected']:
+                ProductionCardQCInspection.objects.create(
+                    production_card=card,
+                    inspection_code=f'QC-{index}-{status}',
+                    status=status,
+                )
+
+    def list_query_count(self):
+        # پروفایل QC در هر اندازه‌گیری از پایگاه داده خوانده شود
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response.json()
+
+    def test_list_query_count_is_constant(self):
+        self.create_cards(2)
+        small, _ = self.list_query_count()
+
+        self.create_cards(8)
+        large, data = self.list_query_count()
+
+        self.assertEqual(small, large)
+        self.assertEqual(data['count'], 10)
+
+    def test_list_uses_annotated_qc_status(self):
+        self.create_cards(3)
+        cache.clear()
+        # پروفایل QC، شمارش صفحه‌بندی و لیست annotate شده
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        card = response.json()['results'][0]
+        self.assertEqual(card['qc_inspections_count'], 3)
+        self.assertEqual(card['qc_status'], 'rejected')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WorkQueueCursorTests(TestCase):
+    """cursor صف‌های کاری با مقدار نامعتبر باید 404 برگرداند نه 500"""
+
+    url = '/QC/production-cards/overdue/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='qc-queue')
+        QualityControlExpert.objects.create(
+            user=cls.user,
+            employee_code='QC-2',
+            department='QC',
+            qualification_level='manager',
+        )
+        product = Product.objects.create(name='queue product', slug='queue-product', price=1)
+        cls.requirements_product = RequirementsProducts.objects.create(
+            name='queue requirements', slug='queue-requirements', product=product
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def test_cursor_with_wrong_value_types_is_rejected(self):
+        for values in (['x', 'y', 'z'], [1, 'not-a-date', 3], [None, '2025-01-01T00:00:00+00:00', 1]):
+            response = self.client.get(self.url, {'cursor': self.cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+    def test_next_cursor_walks_the_queue(self):
+        for index in range(3):
+            ProductionCard.objects.create(
+                card_code=f'PC-Q{index}',
+                title=f'queue {index}',
+                requirements_product=self.requirements_product,
+                scheduled_end_date=timezone.now() - timedelta(days=index + 1),
+            )
+        seen = []
+        response = self.client.get(self.url, {'page_size': 2}).json()
+        seen += [card['id'] for card in response['cards']]
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            seen += [card['id'] for card in response['cards']]
+        self.assertEqual(sorted(seen), sorted(ProductionCard.objects.values_list('id', flat=True)))
+
+
+class SPCSummaryTests(TestCase):
+    """خلاصه افزایشی سری SPC باید با محاسبه مستقیم روی کل سری برابر باشد"""
+
+    def test_fold_in_parts_matches_full_series(self):
+        values = np.random.default_rng(0).normal(10, 2, 103)
+        ids = np.arange(1, values.size + 1)
+        summary = empty_summary()
+        for start, stop in ((0, 1), (1, 8), (8, 50), (50, 103)):
+            summary = fold(summary, ids[start:stop], values[start:stop])
+
+        self.assertEqual(summary['count'], 103)
+        self.assertAlmostEqual(summary['mean'], values.mean())
+        self.assertAlmostEqual(summary['m2'] / 102, values.var(ddof=1))
+        self.assertAlmostEqual(summary['mr_sum'], np.abs(np.diff(values)).sum())
+        for size in (2, 5, 7):
+            subgroups = values[:103 // size * size].reshape(-1, size)
+            group = summary['subgroups'][size]
+            self.assertEqual(group['count'], 103 // size)
+            self.assertAlmostEqual(group['mean_sum'], subgroups.mean(axis=1).sum())
+            self.assertAlmostEqual(group['range_sum'], np.ptp(subgroups, axis=1).sum())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    QC_SPC_SETTLE_SECONDS=60,
+)
+class SPCSeriesCacheTests(TestCase):
+    """ردیف‌های تثبیت‌نشده در کش ادغام نمی‌شوند و حذف اندازه‌گیری کش را باطل می‌کند"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='spc product', slug='spc-product', price=1)
+        card = ProductionCard.objects.create(
+            card_code='PC-SPC',
+            title='spc',
+            requirements_product=RequirementsProducts.objects.create(
+                name='spc requirements', slug='spc-requirements', product=cls.product
+            ),
+        )
+        cls.inspection = ProductionCardQCInspection.objects.create(production_card=card, inspection_code='QC-SPC')
+
+    def setUp(self):
+        cache.clear()
+
+    def measure(self, *values, age=0):
+        rows = InspectionMeasurement.objects.bulk_create(
+            InspectionMeasurement(inspection=self.inspection, product=self.product, characteristic='d', value=value)
+            for value in values
+        )
+        InspectionMeasurement.objects.filter(pk__in=[row.pk for row in rows]).update(
+            created_at=timezone.now() - timedelta(seconds=age)
+        )
+        return rows
+
+    def cached_last_id(self):
+        return (_cache_get(_series_key(self.product.pk, 'd')) or {}).get('last_id')
+
+    def test_unsettled_rows_are_reported_but_not_folded(self):
+        settled = self.measure(1, 2, age=120)
+        # ردیف با شناسه کمتر هنوز تثبیت نشده (مثل تراکنشی که دیرتر commit می‌شود)
+        in_flight = self.measure(3)
+        self.measure(4, age=120)
+
+        result = get_spc(self.product.pk, 'd')
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(self.cached_last_id(), settled[-1].pk)
+
+        InspectionMeasurement.objects.filter(pk=in_flight[0].pk).update(created_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(get_spc(self.product.pk, 'd')['count'], 4)
+        self.assertEqual(self.cached_last_id(), InspectionMeasurement.objects.latest('id').pk)
+
+    def test_delete_invalidates_series(self):
+        rows = self.measure(1, 2, 3, age=120)
+        self.assertEqual(get_spc(self.product.pk, 'd')['count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rows[0].delete()
+        self.assertIsNone(self.cached_last_id())
+        result = get_spc(self.product.pk, 'd')
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(result['individuals']['center'], 2.5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QCHistoryTests(TestCase):
+    """شمارنده‌ها و موارد اخیر تاریخچه با داده‌های واقعی M2M هماهنگ می‌مانند"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='qc-history')
+        cls.expert = QualityControlExpert.objects.create(
+            user=cls.user,
+            employee_code='QC-3',
+            department='QC',
+            qualification_level='manager',
+        )
+        cls.product = Product.objects.create(name='history product', slug='history-product', price=1)
+        cls.requirements_product = RequirementsProducts.objects.create(
+            name='history requirements', slug='history-requirements', product=cls.product
+        )
+        cls.saler = SalesExpert.objects.create(
+            user=get_user_model().objects.create(username='history-saler'), employee_code='S-1', branch='main'
+        )
+
+    def setUp(self):
+        self.history = QCHistoryCreator.objects.create(qc_expert=self.expert)
+        self.cards = [
+            ProductionCard.objects.create(
+                card_code=f'PC-H{index}', title=f'history {index}', requirements_product=self.requirements_product
+            )
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self):
+        response = self.client.get(f'/QC/qc-experts/{self.expert.pk}/history/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_recent_cards_show_current_card_state(self):
+        for card in self.cards:
+            self.history.inspected_cart.add(card)
+        card = self.cards[0]
+        card.title = 'renamed'
+        card.status = 'completed'
+        card.save()
+
+        recent = {item['id']: item for item in self.summary()['inspected_cards']}
+        self.assertEqual(list(recent), [card.pk for card in reversed(self.cards)])
+        self.assertEqual(recent[card.pk]['title'], 'renamed')
+        self.assertEqual(recent[card.pk]['status'], card.get_status_display())
+
+    def counters(self):
+        self.history.refresh_from_db()
+        return {
+            'total': self.history.total_inspections,
+            'approved': self.history.approved_inspections,
+            'rejected': self.history.rejected_inspections,
+            'cards': self.history.inspected_cards_count,
+        }
+
+    def test_removing_non_member_card_keeps_count(self):
+        self.history.inspected_cart.add(self.cards[0])
+        self.history.inspected_cart.add(self.cards[1])
+        self.history.inspected_cart.remove(self.cards[1], self.cards[2])
+
+        self.assertEqual(self.counters()['cards'], 1)
+        self.assertEqual(self.history.recent_card_ids, [self.cards[0].pk])
+
+    def test_card_delete_updates_history(self):
+        for card in self.cards:
+            self.history.inspected_cart.add(card)
+        self.cards[1].delete()
+
+        self.assertEqual(self.counters()['cards'], 2)
+        self.assertEqual(self.history.recent_card_ids, [self.cards[2].pk, self.cards[0].pk])
+
+    def test_log_counters_follow_remove_and_cascade_delete(self):
+        order = Order.objects.create(
+            saler=self.saler, name='order', customer_name='a', customer_family='b',
+            address='-', postal_code='1', city='c', product=self.product,
+        )
+        approved, rejected, other = (
+            InspectionLog.objects.create(inspector=self.expert, order=order, status=status)
+            for status in ('approved', 'rejected', 'approved')
+        )
+        self.history.inspection_logs.add(approved, rejected)
+        self.history.inspection_logs.remove(rejected, other)
+        self.assertEqual(self.counters(), {'total': 1, 'approved': 1, 'rejected': 0, 'cards': 0})
+
+        self.history.inspection_logs.add(rejected)
+        order.delete()
+        self.assertEqual(self.counters(), {'total': 0, 'approved': 0, 'rejected': 0, 'cards': 0})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductionCardTransitionTests(TestCase):
+    """تغییر گروهی وضعیت و پیشرفت فقط انتقال‌های مجاز را با یک رویداد برای هر کارت اعمال می‌کند"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='qc-transitions')
+        product = Product.objects.create(name='transition product', slug='transition-product', price=1)
+        cls.requirements_product = RequirementsProducts.objects.create(
+            name='transition requirements', slug='transition-requirements', product=product
+        )
+
+    def create_card(self, code, **fields):
+        return ProductionCard.objects.create(
+            card_code=code, title=code, requirements_product=self.requirements_product, **fields
+        )
+
+    def test_disallowed_sources_are_skipped_and_reported(self):
+        approved = self.create_card('PC-T1', status='approved')
+        draft = self.create_card('PC-T2', status='draft')
+        inactive = self.create_card('PC-T3', status='approved', is_active=False)
+
+        results = bulk_change_status([draft.pk, approved.pk, inactive.pk, 0], 'in_production', actor=self.user)
+
+        self.assertEqual([result['card_id'] for result in results], [draft.pk, approved.pk, inactive.pk, 0])
+        self.assertEqual([result['success'] for result in results], [False, True, False, False])
+        self.assertEqual(results[0]['old_status'], 'draft')
+        self.assertIn('مجاز نیست', results[0]['error'])
+        self.assertEqual(results[1]['new_status'], 'in_production')
+        draft.refresh_from_db()
+        approved.refresh_from_db()
+        self.assertEqual(draft.status, 'draft')
+        self.assertIsNone(draft.actual_start_date)
+        self.assertEqual(approved.status, 'in_production')
+        self.assertIsNotNone(approved.actual_start_date)
+        self.assertEqual(
+            list(ProductionCardEvent.objects.values_list('production_card_id', 'old_status', 'new_status', 'actor')),
+            [(approved.pk, 'approved', 'in_production', self.user.pk)],
+        )
+
+    def test_actual_dates_are_not_overwritten(self):
+        started = timezone.now() - timedelta(days=3)
+        ended = timezone.now() - timedelta(days=1)
+        resumed = self.create_card('PC-T4', status='paused', actual_start_date=started)
+        fresh = self.create_card('PC-T5', status='approved')
+
+        bulk_change_status([resumed.pk, fresh.pk], 'in_production')
+        resumed.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(resumed.actual_start_date, started)
+        self.assertGreater(fresh.actual_start_date, started)
+
+        ProductionCard.objects.filter(pk=resumed.pk).update(actual_end_date=ended)
+        bulk_update_progress([resumed.pk, fresh.pk], 100)
+        resumed.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(resumed.actual_end_date, ended)
+        self.assertIsNotNone(fresh.actual_end_date)
+        self.assertEqual(resumed.actual_start_date, started)
+
+    def test_one_event_per_updated_card(self):
+        cards = [self.create_card(f'PC-T{index}', status='in_production', current_progress=10) for index in range(6, 9)]
+        self.create_card('PC-T9', status='in_production', current_progress=10)
+        card_ids = [card.pk for card in cards]
+
+        results = bulk_update_progress(card_ids + [0], 40, actor=self.user, note='shift')
+
+        self.assertEqual([result['success'] for result in results], [True, True, True, False])
+        self.assertEqual(set(ProductionCard.objects.filter(current_progress=40).values_list('pk', flat=True)), set(card_ids))
+        events = ProductionCardEvent.objects.filter(event_type='progress_updated')
+        self.assertEqual(sorted(events.values_list('production_card_id', flat=True)), sorted(card_ids))
+        self.assertEqual(
+            set(events.values_list('old_progress', 'new_progress', 'old_status', 'new_status', 'note')),
+            {(10, 40, 'in_production', 'in_production', 'shift')},
+        )
+
+        bulk_update_progress(card_ids[:1], 100)
+        event = ProductionCardEvent.objects.filter(production_card_id=card_ids[0]).first()
+        self.assertEqual((event.new_status, event.new_progress), ('completed', 100))
+        self.assertEqual(ProductionCardEvent.objects.count(), 4)
+
+
+class InspectorMetricsTests(TestCase):
+    """نتیجه بازرسی در روز ثبت آن شمرده و تغییر آن از همان روز کم می‌شود"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.expert = QualityControlExpert.objects.create(
+            user=get_user_model().objects.create(username='qc-metrics'),
+            employee_code='QC-4',
+            department='QC',
+            qualification_level='manager',
+        )
+        cls.product = Product.objects.create(name='metrics product', slug='metrics-product', price=1)
+        cls.card = ProductionCard.objects.create(
+            card_code='PC-M',
+            title='metrics',
+            requirements_product=RequirementsProducts.objects.create(
+                name='metrics requirements', slug='metrics-requirements', product=cls.product
+            ),
+        )
+        saler = SalesExpert.objects.create(
+            user=get_user_model().objects.create(username='metrics-saler'), employee_code='S-2', branch='main'
+        )
+        cls.order = Order.objects.create(
+            saler=saler, name='order', customer_name='a', customer_family='b',
+            address='-', postal_code='1', city='c', product=cls.product,
+        )
+
+    def buckets(self):
+        return {
+            row.day: (row.approved, row.rejected)
+            for row in InspectorDailyStats.objects.filter(qc_expert=self.expert)
+        }
+
+    def totals(self):
+        self.expert.refresh_from_db()
+        return self.expert.inspected_products_count, self.expert.approved_products_count
+
+    def test_outcome_is_booked_today(self):
+        today = timezone.localdate()
+        inspection = ProductionCardQCInspection.objects.create(
+            production_card=self.card, inspection_code='QC-M1', inspector=self.expert, status='approved'
+        )
+        inspection.refresh_from_db()
+
+        self.assertEqual(inspection.outcome_date, today)
+        self.assertEqual(self.buckets(), {today: (1, 0)})
+        self.assertEqual(self.totals(), (1, 1))
+
+    def test_changed_outcome_is_reversed_on_its_original_day(self):
+        today = timezone.localdate()
+        earlier = today - timedelta(days=10)
+        inspection = ProductionCardQCInspection.objects.create(
+            production_card=self.card, inspection_code='QC-M2', inspector=self.expert, status='approved'
+        )
+        # نتیجه 10 روز پیش ثبت شده است
+        ProductionCardQCInspection.objects.filter(pk=inspection.pk).update(outcome_date=earlier)
+        InspectorDailyStats.objects.filter(qc_expert=self.expert).update(day=earlier)
+
+        inspection.refresh_from_db()
+        inspection.status = 'rejected'
+        inspection.save()
+
+        self.assertEqual(self.buckets(), {earlier: (0, 0), today: (0, 1)})
+        self.assertEqual(self.totals(), (1, 0))
+        week = get_rolling_stats(QualityControlExpert.objects.get(pk=self.expert.pk))['7d']
+        self.assertEqual((week['approved'], week['rejected'], week['approval_rate']), (0, 1, 0.0))
+        inspection.refresh_from_db()
+        self.assertEqual(inspection.outcome_date, today)
+
+    def test_log_outcome_withdrawn(self):
+        log = InspectionLog.objects.create(inspector=self.expert, order=self.order, status='rejected')
+        log.status = 'pending'
+        log.save()
+
+        log.refresh_from_db()
+        self.assertIsNone(log.outcome_date)
+        self.assertEqual(self.buckets(), {timezone.localdate(): (0, 0)})
+        self.assertEqual(self.totals(), (0, 0))
+
+    def test_day_row_created_by_a_concurrent_request(self):
+        today = timezone.localdate()
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is InspectorDailyStats and not raced:
+                # درخواست دیگری بین UPDATE و INSERT ردیف روز را می‌سازد
+                raced.append(True)
+                InspectorDailyStats.objects.create(qc_expert=self.expert, day=today, approved=1)
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            record_outcomes(self.expert.pk, approved=1, day=today)
+
+        self.assertEqual(self.buckets(), {today: (2, 0)})
+
+    def test_counters_use_database_values(self):
+        stale = QualityControlExpert.objects.get(pk=self.expert.pk)
+        record_outcomes(self.expert.pk, approved=1)
+        record_outcomes(stale.pk, rejected=1)
+
+        self.expert.refresh_from_db()
+        self.assertEqual(self.totals(), (2, 1))
+        self.assertEqual(float(self.expert.approval_rate), 50.0)
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite serializes writers; the race needs concurrent connections")
+class InspectorMetricsConcurrencyTests(TransactionTestCase):
+    """ثبت همزمان نتیجه‌ها با F() هیچ افزایشی را از دست نمی‌دهد"""
+
+    def test_concurrent_record_outcomes(self):
+        expert = QualityControlExpert.objects.create(
+            user=get_user_model().objects.create(username='qc-race'),
+            employee_code='QC-5',
+            department='QC',
+            qualification_level='manager',
+        )
+        barrier = threading.Barrier(8)
+
+        def record(approved):
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    record_outcomes(expert.pk, approved=approved, rejected=1 - approved)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=record, args=(index % 2,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expert.refresh_from_db()
+        self.assertEqual((expert.inspected_products_count, expert.approved_products_count), (40, 20))
+        self.assertEqual(
+            InspectorDailyStats.objects.get(qc_expert=expert).approved, 20
+        )
+
+
+class CodeGeneratorBlockTests(TransactionTestCase):
+    """بیرون از تراکنش شماره‌ها از بلوک رزرو شده داده و بلوک جدید فقط با تمام شدن آن گرفته می‌شود"""
+
+    def setUp(self):
+        self.codes = CodeGenerator('production_card', lambda number, instance: number, block_size=5)
+
+    def test_numbers_come_from_the_reserved_block(self):
+        first = self.codes.take(2)
+        self.assertEqual(first, [first[0], first[0] + 1])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.codes.take(3), [first[0] + 2, first[0] + 3, first[0] + 4])
+
+        with mock.patch.object(self.codes, '_allocate', wraps=self.codes._allocate) as allocate:
+            self.assertEqual(self.codes.take(1), [first[0] + 5])
+        allocate.assert_called_once_with(5)
+        self.assertEqual(len(self.codes._numbers), 4)
+
+    def test_request_larger_than_the_rest_of_the_block(self):
+        first = self.codes.take(2)[0]
+        # سه شماره باقی‌مانده بلوک و چهار شماره از بلوک بعدی
+        self.assertEqual(self.codes.take(7), list(range(first + 2, first + 9)))
+        self.assertEqual(len(self.codes._numbers), 1)
+
+    @skipIf(connection.vendor == 'postgresql', "PostgreSQL codes come from a SEQUENCE, not CodeSequence")
+    def test_counter_reserves_whole_blocks(self):
+        self.codes.take(2)
+        self.assertEqual(CodeSequence.objects.get(name='production_card').value, 5)
+        self.codes.take(4)
+        self.assertEqual(CodeSequence.objects.get(name='production_card').value, 10)
+
+
+@skipIf(connection.vendor == 'postgresql', "PostgreSQL codes come from a SEQUENCE that rollback does not return")
+class CodeGeneratorTransactionTests(TestCase):
+    """داخل تراکنش باز فقط به تعداد لازم رزرو می‌شود و چیزی کش نمی‌شود"""
+
+    def setUp(self):
+        self.codes = CodeGenerator('production_card', lambda number, instance: number, block_size=5)
+
+    def counter(self):
+        return CodeSequence.objects.get(name='production_card').value
+
+    def test_fallback_keeps_no_block(self):
+        self.assertEqual(self.codes.take(2), [1, 2])
+        self.assertEqual(self.counter(), 2)
+        self.assertEqual(len(self.codes._numbers), 0)
+        self.assertEqual(self.codes.take(3), [3, 4, 5])
+        self.assertEqual(self.counter(), 5)
+
+    def test_rolled_back_numbers_are_reissued(self):
+        self.codes.take(2)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(self.codes.take(3), [3, 4, 5])
+                raise RuntimeError
+        self.assertEqual(self.counter(), 2)
+        self.assertEqual(self.codes.take(1), [3])
+
+    def test_assign_before_bulk_create(self):
+        product = Product.objects.create(name='codes product', slug='codes-product', price=1)
+        requirements_product = RequirementsProducts.objects.create(
+            name='codes requirements', slug='codes-requirements', product=product
+        )
+        cards = [
+            ProductionCard(card_code=code, title=f'codes {index}', requirements_product=requirements_product)
+            for index, code in enumerate(['', 'PC-KEEP', ''])
+        ]
+
+        with mock.patch.object(production_card_codes, 'take', wraps=production_card_codes.take) as take:
+            production_card_codes.assign(cards, 'card_code')
+        take.assert_called_once_with(2)
+        ProductionCard.objects.bulk_create(cards)
+
+        codes = list(ProductionCard.objects.order_by('pk').values_list('card_code', flat=True))
+        self.assertEqual(codes[1], 'PC-KEEP')
+        self.assertEqual(len(set(codes)), 3)
+        self.assertTrue(all(code.endswith(('-000001', '-000002')) for code in codes[::2]))
+        self.assertEqual(self.counter(), 2)
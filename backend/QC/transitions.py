@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ProductionCard, ProductionCardEvent
+from .serializers import ProductionCardStatusUpdateSerializer
+from .stats import invalidate_production_stats
+
+
+def bulk_change_status(card_ids, status, actor=None, note=''):
+    """
+    تغییر وضعیت گروهی کارت‌های تولید
+
+    انتقال‌ها در حافظه با جدول ProductionCardStatusUpdateSerializer بررسی و با یک
+    UPDATE ... WHERE status IN (وضعیت‌های مبدأ مجاز) اعمال می‌شوند؛ رویدادها با
+    bulk_create ثبت می‌شوند. خروجی نتیجه هر کارت به ترتیب card_ids است.
+    """
+    now = timezone.now()
+    allowed = ProductionCardStatusUpdateSerializer.allowed_sources(status)
+    changes = {}
+
+    # تاریخ‌های شروع و پایان را بر اساس وضعیت تنظیم کن (فقط اگر خالی باشند)
+    if status == 'in_production':
+        changes['actual_start_date'] = Coalesce(F('actual_start_date'), Value(now))
+    elif status in ['completed', 'archived']:
+        changes['actual_end_date'] = Coalesce(F('actual_end_date'), Value(now))
+    elif status == 'approved':
+        changes['approval_date'] = Coalesce(F('approval_date'), Value(now))
+
+    with transaction.atomic():
+        current = _lock_statuses(card_ids)
+        movable = [card_id for card_id, old_status in current.items() if old_status in allowed]
+        if movable:
+            ProductionCard.objects.filter(id__in=movable, status__in=allowed).update(
+                status=status, updated_at=now, **changes
+            )
+            ProductionCardEvent.objects.bulk_create([
+                ProductionCardEvent(
+                    production_card_id=card_id,
+                    event_type='status_changed',
+                    old_status=current[card_id],
+                    new_status=status,
+                    actor=actor,
+                    note=note,
+                )
+                for card_id in movable
+            ])
+            transaction.on_commit(invalidate_production_stats)
+
+    results = []
+    for card_id in card_ids:
+        old_status = current.get(card_id)
+        if old_status is None:
+            results.append({'card_id': card_id, 'success': False, 'error': 'کارت تولید یافت نشد'})
+        elif old_status not in allowed:
+            results.append({
+                'card_id': card_id,
+                'success': False,
+                'old_status': old_status,
+                'error': f'انتقال از وضعیت {old_status} به {status} مجاز نیست',
+            })
+        else:
+            results.append({'card_id': card_id, 'success': True, 'old_status': old_status, 'new_status': status})
+    return results
+
+
+def bulk_update_progress(card_ids, progress, actor=None, note=''):
+    """
+    به‌روزرسانی گروهی درصد پیشرفت با یک UPDATE؛ با پیشرفت 100% کارت‌ها تکمیل می‌شوند
+    """
+    now = timezone.now()
+    changes = {'current_progress': progress, 'updated_at': now}
+    if progress >= 100:
+        changes['status'] = 'completed'
+        changes['actual_end_date'] = Coalesce(F('actual_end_date'), Value(now))
+
+    with transaction.atomic():
+        current = _lock_progress(card_ids)
+        if current:
+            ProductionCard.objects.filter(id__in=list(current)).update(**changes)
+            ProductionCardEvent.objects.bulk_create([
+                ProductionCardEvent(
+                    production_card_id=card_id,
+                    event_type='progress_updated',
+                    old_status=old_status,
+                    new_status=changes.get('status', old_status),
+                    old_progress=old_progress,
+                    new_progress=progress,
+                    actor=actor,
+                    note=note,
+                )
+                for card_id, (old_status, old_progress) in current.items()
+            ])
+            transaction.on_commit(invalidate_production_stats)
+
+    results = []
+    for card_id in card_ids:
+        if card_id not in current:
+            results.append({'card_id': card_id, 'success': False, 'error': 'کارت تولید یافت نشد'})
+            continue
+        old_status, old_progress = current[card_id]
+        results.append({
+            'card_id': card_id,
+            'success': True,
+            'old_progress': old_progress,
+            'new_progress': progress,
+            'current_status': changes.get('status', old_status),
+        })
+    return results
+
+
+def _active_cards():
+    return ProductionCard.objects.filter(is_active=True)
+
+
+def _lock_statuses(card_ids):
+    return dict(
+        _active_cards().select_for_update().filter(id__in=set(card_ids)).order_by('id').values_list('id', 'status')
+    )
+
+
+def _lock_progress(card_ids):
+    return {
+        card_id: (status, progress)
+        for card_id, status, progress in _active_cards().select_for_update().filter(
+            id__in=set(card_ids)
+        ).order_by('id').values_list('id', 'status', 'current_progress')
+    }
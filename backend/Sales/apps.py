@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Sales'
+
+    def ready(self):
+        from Sales.permissions import sales_profile_resolver
+        sales_profile_resolver.connect()
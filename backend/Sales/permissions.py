@@ -1,18 +1,17 @@
 from rest_framework.permissions import IsAuthenticated , BasePermission
+from backend.utils.profiles import RoleProfileResolver
 from .models import SalesExpert
 
+sales_profile_resolver = RoleProfileResolver(SalesExpert, 'sales')
+
+
 class IsSalesExpert(BasePermission):
     "The requests user must be SalesExpert Instance"
 
     def has_permission(self, request, view):
-        # TODO add middle ware for this section
-        if not request.user or not request.user.is_authenticated:
+        sales_profile = sales_profile_resolver.resolve(request)
+        if sales_profile is None:
             return False
-        try:
-            sales_profile = SalesExpert.objects.select_related('user').get(user=request.user)
-            
-            request.sales_profile = sales_profile
-            return True
-            
-        except SalesExpert.DoesNotExist:
-            return False
\ No newline at end of file
+
+        request.sales_profile = sales_profile
+        return True
@@ -160,6 +160,41 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_DB = int(os.getenv('REDIS_DB', 0))
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# Django cache (shared across workers so signal invalidation reaches every process)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'django',
+    }
+}
+
+# Role profile (qc_profile / sales_profile) resolution cache
+ROLE_PROFILE_CACHE_TTL = int(os.getenv('ROLE_PROFILE_CACHE_TTL', 60))
+
+# QC production statistics snapshot (also invalidated on every ProductionCard save)
+PRODUCTION_STATS_CACHE_TTL = int(os.getenv('PRODUCTION_STATS_CACHE_TTL', 60))
+
+# QC inspection statistics (refreshed every few minutes by QC.tasks.refresh_inspection_stats)
+QC_INSPECTION_STATS_WINDOW_DAYS = int(os.getenv('QC_INSPECTION_STATS_WINDOW_DAYS', 30))
+QC_INSPECTION_STATS_CACHE_TTL = int(os.getenv('QC_INSPECTION_STATS_CACHE_TTL', 900))  # outlives the refresh interval
+
+# Card/inspection/workstation/report code numbers reserved per process at a time (QC.codes)
+CODE_BLOCK_SIZE = int(os.getenv('CODE_BLOCK_SIZE', 50))
+
+# Maximum production cards per bulk status/progress request
+PRODUCTION_CARD_BULK_MAX = int(os.getenv('PRODUCTION_CARD_BULK_MAX', 500))
+
+# Maximum checklist items / test results / measurements per QC inspection bulk request
+INSPECTION_BULK_MAX = int(os.getenv('INSPECTION_BULK_MAX', 1000))
+
+# Cached SPC series summaries per product/characteristic (QC.spc)
+QC_SPC_CACHE_TTL = int(os.getenv('QC_SPC_CACHE_TTL', 3600))
+QC_SPC_SETTLE_SECONDS = int(os.getenv('QC_SPC_SETTLE_SECONDS', 300))  # measurements still in flight are not folded
+
+# Recent orders/cards kept on each QCHistoryCreator (QC.history)
+QC_HISTORY_RECENT_SIZE = int(os.getenv('QC_HISTORY_RECENT_SIZE', 10))
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -174,22 +209,84 @@ PAYMENT_SETTINGS = {
         'MERCHANT_ID': os.getenv('ZARINPAL_MERCHANT_ID', ''),
         'API_REQUEST_URL': os.getenv('ZARINPAL_API_REQUEST_URL', 'https://api.zarinpal.com/pg/v4/payment/request.json'),
         'API_VERIFY_URL': os.getenv('ZARINPAL_API_VERIFY_URL', 'https://api.zarinpal.com/pg/v4/payment/verify.json'),
-        'CALLBACK_URL': os.getenv('ZARINPAL_CALLBACK_URL', 'http://localhost:8000/api/v1/payments/verify/'),
+        'API_REFUND_URL': os.getenv('ZARINPAL_API_REFUND_URL', 'https://api.zarinpal.com/pg/v4/payment/refund.json'),
+        'ACCESS_TOKEN': os.getenv('ZARINPAL_ACCESS_TOKEN', ''),
+        'CALLBACK_URL': os.getenv('ZARINPAL_CALLBACK_URL', 'http://localhost:8000/api/v1/payments/zarinpal/callback/'),
+        'CURRENCIES': os.getenv('ZARINPAL_CURRENCIES', 'IRR').split(','),
     },
     'STRIPE': {
         'API_KEY': os.getenv('STRIPE_API_KEY', ''),
         'CALLBACK_URL': os.getenv('STRIPE_CALLBACK_URL', 'http://localhost:8000/api/v1/payments/verify/'),
+        'CURRENCIES': os.getenv('STRIPE_CURRENCIES', 'USD,EUR').split(','),
     },
     'PAYPAL': {
         'CLIENT_ID': os.getenv('PAYPAL_CLIENT_ID', ''),
         'CLIENT_SECRET': os.getenv('PAYPAL_CLIENT_SECRET', ''),
         'CALLBACK_URL': os.getenv('PAYPAL_CALLBACK_URL', 'http://localhost:8000/api/v1/payments/verify/'),
+        'CURRENCIES': os.getenv('PAYPAL_CURRENCIES', 'USD,EUR').split(','),
     },
 }
 
+# Where the browser is sent after a gateway callback (payment_id and status are appended)
+PAYMENT_RESULT_URL = os.getenv('PAYMENT_RESULT_URL', 'http://localhost:3000/payment/result')
+
 # Transaction Cache TTL (in seconds)
 TRANSACTION_CACHE_TTL = int(os.getenv('TRANSACTION_CACHE_TTL', 900))  # 15 minutes
 IDEMPOTENCY_CACHE_TTL = int(os.getenv('IDEMPOTENCY_CACHE_TTL', 3600))  # 1 hour
+ORDER_SUMMARY_CACHE_TTL = int(os.getenv('ORDER_SUMMARY_CACHE_TTL', 86400))  # 1 day, refreshed on every event
+
+# Verification single-flight (lease must outlive the gateway timeout)
+VERIFICATION_LOCK_TTL = int(os.getenv('VERIFICATION_LOCK_TTL', 35))
+VERIFICATION_RESULT_TTL = int(os.getenv('VERIFICATION_RESULT_TTL', 60))
+
+# Settlement export (rows fetched per server-side cursor round trip)
+SETTLEMENT_EXPORT_CHUNK_SIZE = int(os.getenv('SETTLEMENT_EXPORT_CHUNK_SIZE', 2000))
+
+# Wallet ledger
+WALLET_BALANCE_CACHE_TTL = int(os.getenv('WALLET_BALANCE_CACHE_TTL', 300))  # 5 minutes
+WALLET_CREDIT_BATCH_SIZE = int(os.getenv('WALLET_CREDIT_BATCH_SIZE', 500))
+WALLET_SNAPSHOT_LAG_SECONDS = int(os.getenv('WALLET_SNAPSHOT_LAG_SECONDS', 300))  # skip entries still in flight
+
+# Pending transaction reconciliation
+RECONCILIATION_BATCH_SIZE = int(os.getenv('RECONCILIATION_BATCH_SIZE', 200))
+RECONCILIATION_CONCURRENCY = int(os.getenv('RECONCILIATION_CONCURRENCY', 8))
+RECONCILIATION_MIN_AGE_MINUTES = int(os.getenv('RECONCILIATION_MIN_AGE_MINUTES', 15))  # leave users time to pay
+RECONCILIATION_MAX_AGE_HOURS = int(os.getenv('RECONCILIATION_MAX_AGE_HOURS', 24))  # authorities expire
+
+# TransactionEvent payload storage (bytes of compact JSON)
+EVENT_PAYLOAD_COMPRESS_THRESHOLD = int(os.getenv('EVENT_PAYLOAD_COMPRESS_THRESHOLD', 512))
+EVENT_PAYLOAD_COMPRESSION_LEVEL = int(os.getenv('EVENT_PAYLOAD_COMPRESSION_LEVEL', 6))
+EVENT_PAYLOAD_MAX_BYTES = int(os.getenv('EVENT_PAYLOAD_MAX_BYTES', 65536))  # larger payloads keep scalars only
+
+# Event replay (projection rebuild)
+EVENT_REPLAY_WORKERS = int(os.getenv('EVENT_REPLAY_WORKERS', 4))
+EVENT_REPLAY_CHUNK_SIZE = int(os.getenv('EVENT_REPLAY_CHUNK_SIZE', 1000))  # transactions per partition
+
+# Adaptive gateway routing (opt-in per request via allowed_gateways)
+GATEWAY_ROUTING_ENABLED = os.getenv('GATEWAY_ROUTING_ENABLED', 'False').lower() == 'true'
+GATEWAY_ROUTING_WINDOW_MINUTES = int(os.getenv('GATEWAY_ROUTING_WINDOW_MINUTES', 5))
+GATEWAY_ROUTING_MIN_SAMPLES = int(os.getenv('GATEWAY_ROUTING_MIN_SAMPLES', 20))
+GATEWAY_ROUTING_MAX_ERROR_RATE = float(os.getenv('GATEWAY_ROUTING_MAX_ERROR_RATE', 0.2))
+GATEWAY_ROUTING_MAX_P99_MS = int(os.getenv('GATEWAY_ROUTING_MAX_P99_MS', 5000))
+GATEWAY_ROUTING_ERROR_PENALTY = float(os.getenv('GATEWAY_ROUTING_ERROR_PENALTY', 10))
+GATEWAY_ROUTING_SWITCH_MARGIN = float(os.getenv('GATEWAY_ROUTING_SWITCH_MARGIN', 0.5))  # hysteresis against flapping
+
+# Payment initialization velocity limits (requests per sliding window)
+VELOCITY_CHECKS_ENABLED = os.getenv('VELOCITY_CHECKS_ENABLED', 'True').lower() == 'true'
+VELOCITY_USER_LIMIT = int(os.getenv('VELOCITY_USER_LIMIT', 10))
+VELOCITY_USER_WINDOW = int(os.getenv('VELOCITY_USER_WINDOW', 60))
+VELOCITY_IP_LIMIT = int(os.getenv('VELOCITY_IP_LIMIT', 30))
+VELOCITY_IP_WINDOW = int(os.getenv('VELOCITY_IP_WINDOW', 60))
+VELOCITY_ORDER_LIMIT = int(os.getenv('VELOCITY_ORDER_LIMIT', 5))
+VELOCITY_ORDER_WINDOW = int(os.getenv('VELOCITY_ORDER_WINDOW', 300))
+VELOCITY_TRUST_FORWARDED_FOR = os.getenv('VELOCITY_TRUST_FORWARDED_FOR', 'False').lower() == 'true'  # only behind a proxy
+
+# Batched refunds (gateway calls per process are capped by concurrency and rate)
+REFUND_CHUNK_SIZE = int(os.getenv('REFUND_CHUNK_SIZE', 100))
+REFUND_CONCURRENCY = int(os.getenv('REFUND_CONCURRENCY', 4))
+REFUND_RATE_LIMIT = float(os.getenv('REFUND_RATE_LIMIT', 5))  # gateway calls per second
+REFUND_MAX_ATTEMPTS = int(os.getenv('REFUND_MAX_ATTEMPTS', 3))
+REFUND_RETRY_BACKOFF_SECONDS = int(os.getenv('REFUND_RETRY_BACKOFF_SECONDS', 60))  # doubled on each attempt
 
 # Logging Configuration
 LOGGING = {
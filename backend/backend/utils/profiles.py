@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+
+class RoleProfileResolver:
+    """
+    پروفایل نقش کاربر (مثل qc_profile یا sales_profile) را یک بار در هر درخواست
+    بارگذاری می‌کند.
+
+    نتیجه (از جمله «پروفایل ندارد») با TTL کوتاه بر اساس شناسه کاربر در کش
+    نگه داشته می‌شود و با سیگنال‌های post_save/post_delete مدل پروفایل باطل می‌شود.
+    """
+
+    NO_PROFILE = False
+
+    def __init__(self, model, name, **filters):
+        self.model = model
+        self.name = name
+        self.filters = filters
+
+    def cache_key(self, user_id):
+        return f'role_profile:{self.name}:{user_id}'
+
+    def resolve(self, request):
+        """پروفایل کاربر درخواست یا None"""
+        user = getattr(request, 'user', None)
+        if not user or not user.is_authenticated:
+            return None
+
+        # DRF Request را به HttpRequest اصلی برمی‌گردانیم تا حافظه در کل درخواست مشترک باشد
+        http_request = getattr(request, '_request', request)
+        resolved = http_request.__dict__.setdefault('_role_profiles', {})
+        if self.name not in resolved:
+            resolved[self.name] = self._load(user)
+        return resolved[self.name]
+
+    def invalidate(self, user_id):
+        try:
+            cache.delete(self.cache_key(user_id))
+        except Exception as e:
+            logger.warning(f"Role profile cache delete failed for {self.name}:{user_id}: {e}")
+
+    def connect(self):
+        """اتصال سیگنال‌های باطل‌سازی کش؛ در AppConfig.ready صدا زده می‌شود"""
+        post_save.connect(self._on_change, sender=self.model, dispatch_uid=f'role_profile_{self.name}_save')
+        post_delete.connect(self._on_change, sender=self.model, dispatch_uid=f'role_profile_{self.name}_delete')
+
+    def _on_change(self, sender, instance, **kwargs):
+        self.invalidate(instance.user_id)
+
+    def _load(self, user):
+        key = self.cache_key(user.pk)
+        try:
+            profile = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Role profile cache read failed for {key}: {e}")
+            profile = None
+
+        if profile is None:
+            profile = self.model.objects.filter(user_id=user.pk, **self.filters).first() or self.NO_PROFILE
+            try:
+                cache.set(key, profile, settings.ROLE_PROFILE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Role profile cache write failed for {key}: {e}")
+
+        if profile is self.NO_PROFILE:
+            return None
+        # کاربر در کش ذخیره نمی‌شود؛ همان کاربر احراز هویت‌شده درخواست متصل می‌شود
+        profile.user = user
+        return profile
@@ -9,7 +9,8 @@ from payment.services.exceptions import (
     DuplicateTransactionError,
     InvalidTransactionError,
     GatewayError,
-    VerificationError
+    VerificationError,
+    VelocityLimitExceeded
 )
 import logging
 
@@ -64,6 +65,19 @@ def custom_exception_handler(exc, context):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    if isinstance(exc, VelocityLimitExceeded):
+        response = Response(
+            {
+                'error': 'rate_limited',
+                'message': str(exc),
+                'detail': f'Retry after {exc.retry_after} seconds',
+                'scope': exc.scope
+            },
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(exc.retry_after)
+        return response
+    
     if isinstance(exc, PaymentException):
         return Response(
             {
@@ -19,6 +19,11 @@ class PaymentInitializeSerializer(serializers.Serializer):
     callback_url = serializers.URLField(required=False, help_text="Custom callback URL")
     idempotency_key = serializers.CharField(max_length=255, required=False, help_text="Idempotency key")
     metadata = serializers.JSONField(required=False, default=dict, help_text="Additional metadata")
+    allowed_gateways = serializers.ListField(
+        child=serializers.ChoiceField(choices=[(gt.value, gt.label) for gt in GatewayType]),
+        required=False,
+        help_text="Gateways the merchant has enabled; allows adaptive routing away from an unhealthy gateway"
+    )
     
     def validate_gateway(self, value):
         """Validate gateway value"""
@@ -34,6 +39,7 @@ class PaymentInitializeResponseSerializer(serializers.Serializer):
     payment_id = serializers.UUIDField(help_text="Payment transaction UUID")
     redirect_url = serializers.URLField(help_text="Payment gateway redirect URL")
     authority_code = serializers.CharField(help_text="Gateway authority code")
+    gateway = serializers.IntegerField(help_text="Gateway the payment was created on")
 
 
 class PaymentVerifySerializer(serializers.Serializer):
@@ -74,3 +80,82 @@ class PaymentStatusSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+
+
+class TransactionExportQuerySerializer(serializers.Serializer):
+    """Serializer for settlement export query parameters"""
+    start = serializers.DateTimeField(required=False, help_text="Inclusive lower bound on created_at")
+    end = serializers.DateTimeField(required=False, help_text="Exclusive upper bound on created_at")
+    gateway = serializers.ChoiceField(
+        choices=[(gt.value, gt.label) for gt in GatewayType],
+        required=False,
+        help_text="Payment gateway type"
+    )
+    # ``format`` is reserved by DRF for renderer selection (URL_FORMAT_OVERRIDE)
+    export_format = serializers.ChoiceField(
+        choices=['csv', 'jsonl'],
+        default='csv',
+        help_text="Export format"
+    )
+    
+    def validate(self, data):
+        """Validate date range"""
+        start = data.get('start')
+        end = data.get('end')
+        if start and end and start >= end:
+            raise serializers.ValidationError({'end': 'end must be after start'})
+        return data
+
+
+class WalletBalanceSerializer(serializers.Serializer):
+    """Serializer for wallet balance response"""
+    user_id = serializers.UUIDField(help_text="Wallet owner")
+    currency = serializers.CharField(help_text="Currency code")
+    balance = serializers.IntegerField(help_text="Balance in smallest currency unit")
+
+
+class RefundBatchCreateSerializer(serializers.Serializer):
+    """Serializer for bulk refund request"""
+    transaction_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=10000,
+        help_text="Transactions to refund"
+    )
+    reason = serializers.CharField(required=False, allow_blank=True, default='', help_text="Refund reason")
+
+
+class RefundBatchSerializer(serializers.Serializer):
+    """Serializer for refund batch status response"""
+    batch_uuid = serializers.UUIDField(help_text="Refund batch identifier")
+    status = serializers.CharField(help_text="Batch status")
+    reason = serializers.CharField(help_text="Refund reason")
+    counts = serializers.DictField(child=serializers.IntegerField(), help_text="Item counts by status")
+    stats = serializers.DictField(help_text="Counters and refunds per second of the last run")
+    rejected = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        help_text="Transactions not eligible for refund"
+    )
+    created_at = serializers.DateTimeField()
+    completed_at = serializers.DateTimeField(allow_null=True)
+
+
+class OrderPaymentSummaryQuerySerializer(serializers.Serializer):
+    """Serializer for order payment summary query parameters"""
+    user_id = serializers.UUIDField(help_text="Order owner")
+
+
+class OrderPaymentSummarySerializer(serializers.Serializer):
+    """Serializer for order payment summary response"""
+    order_id = serializers.CharField(help_text="Order identifier")
+    user_id = serializers.UUIDField(help_text="Order owner")
+    attempts = serializers.IntegerField(help_text="Number of payment attempts")
+    latest_status = serializers.CharField(allow_null=True, help_text="Status of the latest attempt")
+    latest_payment_id = serializers.UUIDField(allow_null=True, help_text="Latest attempt")
+    currency = serializers.CharField(allow_null=True, help_text="Currency code")
+    is_paid = serializers.BooleanField(help_text="Whether a non-refunded payment exists")
+    paid_amount = serializers.IntegerField(help_text="Sum of completed, non-refunded payments")
+    refunded_amount = serializers.IntegerField(help_text="Sum of refunded payments")
+    paid_payment_id = serializers.UUIDField(allow_null=True, help_text="Latest successful payment")
+    ref_id = serializers.CharField(allow_null=True, help_text="Gateway reference of the successful payment")
@@ -9,6 +9,12 @@ app_name = 'payment_api'
 urlpatterns = [
     path('payments/initialize/', views.initialize_payment, name='initialize-payment'),
     path('payments/verify/', views.verify_payment, name='verify-payment'),
+    path('payments/zarinpal/callback/', views.zarinpal_callback, name='zarinpal-callback'),
     path('payments/<uuid:payment_id>/status/', views.get_payment_status, name='payment-status'),
+    path('payments/export/', views.export_transactions, name='export-transactions'),
+    path('refunds/', views.create_refund_batch, name='create-refund-batch'),
+    path('refunds/<uuid:batch_uuid>/', views.get_refund_batch, name='refund-batch'),
+    path('orders/<str:order_id>/payments/summary/', views.get_order_payment_summary, name='order-payment-summary'),
+    path('wallets/<uuid:user_id>/balance/', views.get_wallet_balance, name='wallet-balance'),
 ]
 
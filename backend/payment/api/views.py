@@ -2,28 +2,50 @@
 DRF Views for Payment API
 """
 import logging
+from django.db import transaction as db_transaction
+from django.conf import settings
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import urlencode
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from payment.services.transaction_service import TransactionService
+from payment.services.export_service import SettlementExportService
+from payment.services.wallet_service import WalletService
+from payment.services.refund_service import RefundService
+from payment.services.velocity_guard import VelocityGuard
+from payment.services.order_summary_service import OrderSummaryService
 from payment.services.exceptions import PaymentException
 from payment.verification import ZarinpalVerifier, StripeVerifier, PayPalVerifier
-from payment.models import GatewayType
+from payment.models import GatewayType, RefundBatch, Transaction, TransactionEvent
+from payment.tasks.async_tasks import process_refund_batch, verify_payment_async
 from .serializers import (
     PaymentInitializeSerializer,
     PaymentInitializeResponseSerializer,
     PaymentVerifySerializer,
     PaymentVerifyResponseSerializer,
-    PaymentStatusSerializer
+    PaymentStatusSerializer,
+    TransactionExportQuerySerializer,
+    WalletBalanceSerializer,
+    RefundBatchCreateSerializer,
+    RefundBatchSerializer,
+    OrderPaymentSummaryQuerySerializer,
+    OrderPaymentSummarySerializer
 )
 
 logger = logging.getLogger(__name__)
 
 # Service instances
 transaction_service = TransactionService()
+wallet_service = WalletService()
+refund_service = RefundService()
+velocity_guard = VelocityGuard()
+order_summary_service = OrderSummaryService()
 verifiers = {
     GatewayType.ZARINPAL: ZarinpalVerifier(),
     GatewayType.STRIPE: StripeVerifier(),
@@ -38,6 +60,7 @@ verifiers = {
         201: PaymentInitializeResponseSerializer,
         400: 'Bad Request',
         409: 'Duplicate Transaction',
+        429: 'Too Many Requests',
         502: 'Gateway Error'
     },
     operation_summary="Initialize Payment",
@@ -61,7 +84,8 @@ def initialize_payment(request):
         "description": "Payment for order",
         "callback_url": "https://example.com/callback",
         "idempotency_key": "optional-key",
-        "metadata": {}
+        "metadata": {},
+        "allowed_gateways": [1, 2]
     }
     """
     serializer = PaymentInitializeSerializer(data=request.data)
@@ -69,6 +93,12 @@ def initialize_payment(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     try:
+        velocity_guard.check(
+            user_id=str(serializer.validated_data['user_id']),
+            ip_address=velocity_guard.get_client_ip(request),
+            order_id=serializer.validated_data['order_id']
+        )
+        
         result = transaction_service.create_payment(
             order_id=serializer.validated_data['order_id'],
             user_id=str(serializer.validated_data['user_id']),
@@ -78,7 +108,8 @@ def initialize_payment(request):
             description=serializer.validated_data.get('description', ''),
             callback_url=serializer.validated_data.get('callback_url'),
             idempotency_key=serializer.validated_data.get('idempotency_key'),
-            metadata=serializer.validated_data.get('metadata', {})
+            metadata=serializer.validated_data.get('metadata', {}),
+            allowed_gateways=serializer.validated_data.get('allowed_gateways')
         )
         
         response_serializer = PaymentInitializeResponseSerializer(result)
@@ -164,6 +195,97 @@ def verify_payment(request):
         )
 
 
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('Authority', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('Status', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['OK', 'NOK'], required=True)
+    ],
+    responses={
+        302: 'Redirect to the payment result page'
+    },
+    operation_summary="Zarinpal Callback",
+    operation_description="Browser return from Zarinpal; verification runs in the background"
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def zarinpal_callback(request):
+    """
+    Handle the Zarinpal browser redirect.
+    
+    GET /api/v1/payments/zarinpal/callback/?Authority=A000...&Status=OK
+    
+    Never calls the gateway: OK callbacks enqueue verify_payment_async and
+    the user is redirected straight away to PAYMENT_RESULT_URL.
+    """
+    authority = request.query_params.get('Authority', '').strip()
+    callback_status = request.query_params.get('Status', '').strip().upper()
+    
+    transaction = Transaction.objects.filter(
+        authority_code=authority,
+        gateway_id=GatewayType.ZARINPAL
+    ).only('transaction_uuid', 'is_done', 'is_added_wallet', 'is_refund').first() if authority else None
+    
+    if transaction is None:
+        logger.warning(f"Zarinpal callback for unknown authority: {authority!r}")
+        return _redirect_to_result(None, 'not_found')
+    
+    payment_id = str(transaction.transaction_uuid)
+    
+    if transaction.is_done:
+        return _redirect_to_result(payment_id, 'success')
+    
+    if callback_status != 'OK':
+        _record_cancelled_callback(transaction, callback_status, request.META.get('REMOTE_ADDR'))
+        return _redirect_to_result(payment_id, 'failed')
+    
+    db_transaction.on_commit(
+        lambda: _enqueue_verification(payment_id, {'Authority': authority, 'Status': callback_status})
+    )
+    return _redirect_to_result(payment_id, 'processing')
+
+
+def _record_cancelled_callback(transaction, callback_status, provider_ip):
+    """Log a NOK callback once per transaction (reloading the result page repeats the GET)"""
+    with db_transaction.atomic():
+        # Serialize concurrent reloads on the transaction row
+        Transaction.objects.select_for_update().only('pk').get(pk=transaction.pk)
+        already_recorded = TransactionEvent.objects.filter(
+            transaction=transaction,
+            new_status='failed',
+            event_source='zarinpal_callback'
+        ).exists()
+        if not already_recorded:
+            TransactionEvent.objects.create(
+                transaction=transaction,
+                old_status=transaction.status,
+                new_status='failed',
+                event_source='zarinpal_callback',
+                payload={'action': 'payment_cancelled', 'callback_status': callback_status},
+                provider_ip=provider_ip
+            )
+
+
+def _enqueue_verification(payment_id, callback_data):
+    """
+    Queue background verification without blocking the redirect: no publish
+    retries, and broker errors are only logged (reconciliation picks the
+    transaction up later)
+    """
+    try:
+        verify_payment_async.apply_async(args=(payment_id, callback_data), retry=False)
+    except Exception as e:
+        logger.error(f"Failed to enqueue verification for {payment_id}: {e}")
+
+
+def _redirect_to_result(payment_id, result_status):
+    """Redirect the browser to the payment result page"""
+    params = {'status': result_status}
+    if payment_id:
+        params['payment_id'] = payment_id
+    return HttpResponseRedirect(f"{settings.PAYMENT_RESULT_URL}?{urlencode(params)}")
+
+
 @swagger_auto_schema(
     method='get',
     responses={
@@ -196,3 +318,158 @@ def get_payment_status(request, payment_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+
+@swagger_auto_schema(
+    method='get',
+    query_serializer=TransactionExportQuerySerializer,
+    responses={
+        200: 'Streamed CSV or JSON Lines file',
+        400: 'Bad Request'
+    },
+    operation_summary="Export Transactions",
+    operation_description="Stream transactions with their latest event for settlement reconciliation"
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_transactions(request):
+    """
+    Stream a settlement export of transactions.
+    
+    GET /api/v1/payments/export/?start=2025-01-01T00:00:00Z&end=2025-02-01T00:00:00Z&export_format=csv
+    """
+    serializer = TransactionExportQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    export_format = serializer.validated_data['export_format']
+    exporter = SettlementExportService()
+    rows = exporter.stream(
+        export_format,
+        start=serializer.validated_data.get('start'),
+        end=serializer.validated_data.get('end'),
+        gateway_id=serializer.validated_data.get('gateway')
+    )
+    
+    filename = f"transactions-{timezone.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    response = StreamingHttpResponse(rows, content_type=exporter.CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('currency', openapi.IN_QUERY, type=openapi.TYPE_STRING, default='IRR')
+    ],
+    responses={
+        200: WalletBalanceSerializer,
+        403: 'Forbidden'
+    },
+    operation_summary="Get Wallet Balance",
+    operation_description="Get the current wallet balance of a user (staff only)"
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_wallet_balance(request, user_id):
+    """
+    Get wallet balance.
+    
+    GET /api/v1/wallets/{user_id}/balance/?currency=IRR
+    """
+    currency = request.query_params.get('currency', 'IRR')
+    balance = wallet_service.get_balance(str(user_id), currency)
+    serializer = WalletBalanceSerializer({
+        'user_id': user_id,
+        'currency': currency,
+        'balance': balance
+    })
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=RefundBatchCreateSerializer,
+    responses={
+        202: RefundBatchSerializer,
+        400: 'Bad Request'
+    },
+    operation_summary="Create Refund Batch",
+    operation_description="Queue refunds for many completed transactions; processed in the background"
+)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def create_refund_batch(request):
+    """
+    Create a bulk refund batch.
+    
+    POST /api/v1/refunds/
+    {
+        "transaction_ids": ["uuid", ...],
+        "reason": "Product recall"
+    }
+    """
+    serializer = RefundBatchCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    with db_transaction.atomic():
+        batch, rejected = refund_service.create_batch(
+            serializer.validated_data['transaction_ids'],
+            reason=serializer.validated_data['reason'],
+            requested_by=request.user.get_username()
+        )
+        db_transaction.on_commit(lambda: process_refund_batch.delay(str(batch.batch_uuid)))
+    
+    summary = refund_service.get_batch_summary(batch)
+    summary['rejected'] = rejected
+    return Response(RefundBatchSerializer(summary).data, status=status.HTTP_202_ACCEPTED)
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: RefundBatchSerializer,
+        404: 'Not Found'
+    },
+    operation_summary="Get Refund Batch",
+    operation_description="Get progress and throughput of a refund batch"
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_refund_batch(request, batch_uuid):
+    """
+    Get refund batch progress.
+    
+    GET /api/v1/refunds/{batch_uuid}/
+    """
+    batch = get_object_or_404(RefundBatch, batch_uuid=batch_uuid)
+    summary = refund_service.get_batch_summary(batch)
+    return Response(RefundBatchSerializer(summary).data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    query_serializer=OrderPaymentSummaryQuerySerializer,
+    responses={
+        200: OrderPaymentSummarySerializer,
+        400: 'Bad Request',
+        403: 'Forbidden'
+    },
+    operation_summary="Get Order Payment Summary",
+    operation_description="Attempts, latest status and paid/refunded amounts of an order (staff only)"
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_order_payment_summary(request, order_id):
+    """
+    Get order payment summary.
+    
+    GET /api/v1/orders/{order_id}/payments/summary/?user_id=550e8400-e29b-41d4-a716-446655440000
+    """
+    serializer = OrderPaymentSummaryQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    summary = order_summary_service.get_summary(order_id, serializer.validated_data['user_id'])
+    return Response(OrderPaymentSummarySerializer(summary).data, status=status.HTTP_200_OK)
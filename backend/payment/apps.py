@@ -8,4 +8,7 @@ class PaymentConfig(AppConfig):
 
     def ready(self):
         import payment.signals  # noqa
+        from django.db.models.signals import post_migrate
+        from payment.schema import add_missing_columns
+        post_migrate.connect(add_missing_columns, sender=self, dispatch_uid='payment_add_missing_columns')
 
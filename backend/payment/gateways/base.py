@@ -56,6 +56,22 @@ class BaseGateway(ABC):
         """
         raise NotImplementedError
     
+    def refund_payment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Refund a verified payment.
+        
+        Args:
+            data: Refund data (authority, ref_id, amount, reason)
+            
+        Returns:
+            Dict containing refund response
+        """
+        return {
+            "status": "error",
+            "message": f"{self.__class__.__name__} does not support refunds",
+            "error_code": "NOT_SUPPORTED"
+        }
+    
     def get_default_callback_url(self) -> str:
         """Get default callback URL from settings"""
         gateway_name = self.__class__.__name__.lower().replace('gateway', '')
@@ -7,6 +7,7 @@ import json
 import logging
 from typing import Dict, Any, Optional
 from django.conf import settings
+from urllib3.exceptions import NewConnectionError
 from .base import BaseGateway
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,8 @@ class ZarinpalGateway(BaseGateway):
         self.merchant_id = config.get('merchant_id') or settings.PAYMENT_SETTINGS['ZARINPAL']['MERCHANT_ID']
         self.api_request_url = config.get('api_request_url') or settings.PAYMENT_SETTINGS['ZARINPAL']['API_REQUEST_URL']
         self.api_verify_url = config.get('api_verify_url') or settings.PAYMENT_SETTINGS['ZARINPAL']['API_VERIFY_URL']
+        self.api_refund_url = config.get('api_refund_url') or settings.PAYMENT_SETTINGS['ZARINPAL']['API_REFUND_URL']
+        self.access_token = config.get('access_token') or settings.PAYMENT_SETTINGS['ZARINPAL']['ACCESS_TOKEN']
     
     def create_payment(self, amount: int, currency: str, **kwargs) -> Dict[str, Any]:
         """
@@ -220,4 +223,108 @@ class ZarinpalGateway(BaseGateway):
                 "error_code": "REQUEST_ERROR",
                 "RefID": None
             }
+    
+    def refund_payment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Refund a verified payment with Zarinpal.
+        Uses the merchant access token (refunds are not authorized by merchant_id alone).
+        """
+        authority = data.get('authority') or data.get('authority_code')
+        amount = data.get('amount')
+        
+        if not authority or not amount:
+            return {
+                "status": "error",
+                "message": "Missing authority or amount",
+                "error_code": "MISSING_PARAMS"
+            }
+        
+        req_data = {
+            "merchant_id": str(self.merchant_id),
+            "authority": str(authority),
+            "amount": str(amount),
+            "description": str(data.get('reason', '')),
+            "method": "PAYA"
+        }
+        
+        req_headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "authorization": f"Bearer {self.access_token}"
+        }
+        
+        logger.info(f"Sending refund request to Zarinpal: authority={authority}, amount={amount}")
+        
+        try:
+            response = requests.post(
+                url=self.api_refund_url,
+                data=json.dumps(req_data),
+                headers=req_headers,
+                timeout=DEFAULT_TIMEOUT
+            )
+            if response.status_code == 429:
+                return {
+                    "status": "error",
+                    "message": "Rate limited by gateway",
+                    "error_code": "RATE_LIMITED"
+                }
+            response.raise_for_status()
+            response_data = response.json()
+            
+            # Check for errors
+            if 'errors' in response_data and len(response_data['errors']) > 0:
+                error_info = response_data['errors'][0]
+                return {
+                    "status": "error",
+                    "message": error_info.get('message', 'Unknown error'),
+                    "error_code": error_info.get('code', 'unknown')
+                }
+            
+            if 'data' in response_data:
+                return {
+                    "status": "success",
+                    "data": response_data['data'],
+                    "message": response_data['data'].get('message', 'Refund registered')
+                }
+            
+            return {
+                "status": "error",
+                "message": "Unexpected response format",
+                "error_code": "UNEXPECTED_FORMAT"
+            }
+            
+        except requests.ConnectTimeout:
+            logger.error(f"Refund request could not connect within {DEFAULT_TIMEOUT}s")
+            return {
+                "status": "error",
+                "message": "Connection timeout",
+                "error_code": "CONNECT_ERROR"
+            }
+        except requests.Timeout:
+            logger.error(f"Refund request timeout after {DEFAULT_TIMEOUT}s")
+            return {
+                "status": "error",
+                "message": "Request timeout",
+                "error_code": "TIMEOUT"
+            }
+        except requests.ConnectionError as e:
+            logger.error(f"Refund request failed: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                # Only a connection that was never established proves nothing was sent
+                "error_code": "CONNECT_ERROR" if _connect_failed(e) else "REQUEST_ERROR"
+            }
+        except requests.RequestException as e:
+            logger.error(f"Refund request failed: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                "error_code": "REQUEST_ERROR"
+            }
+
 
+def _connect_failed(error: requests.ConnectionError) -> bool:
+    """Whether the connection failed before the request was sent (DNS, refused)"""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
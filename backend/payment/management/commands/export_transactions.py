@@ -0,0 +1,54 @@
+"""
+Management command for streaming settlement exports
+"""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from payment.services.export_service import SettlementExportService
+
+
+class Command(BaseCommand):
+    help = "Stream transactions with their latest event as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Inclusive lower bound on created_at (ISO 8601)")
+        parser.add_argument('--end', help="Exclusive upper bound on created_at (ISO 8601)")
+        parser.add_argument('--gateway', type=int, help="Gateway type ID")
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=SettlementExportService.FORMATS,
+            default=SettlementExportService.FORMAT_CSV
+        )
+        parser.add_argument('--chunk-size', type=int, help="Rows per cursor fetch")
+        parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'], 'start')
+        end = self._parse(options['end'], 'end')
+        if start and end and start >= end:
+            raise CommandError("--end must be after --start")
+
+        exporter = SettlementExportService(chunk_size=options['chunk_size'])
+        rows = exporter.stream(
+            options['export_format'],
+            start=start,
+            end=end,
+            gateway_id=options['gateway']
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(rows)
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
+        else:
+            sys.stdout.writelines(rows)
+
+    @staticmethod
+    def _parse(value, name):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid --{name} datetime: {value}")
+        return parsed
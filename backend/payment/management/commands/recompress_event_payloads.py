@@ -0,0 +1,66 @@
+"""
+Management command for recompressing historical TransactionEvent payloads
+"""
+import json
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from payment.models import TransactionEvent
+from payment.utils.payload_codec import encode_payload
+
+
+class Command(BaseCommand):
+    help = "Compact and compress stored TransactionEvent payloads in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events per batch")
+        parser.add_argument('--start-id', type=int, default=0, help="Resume after this event id")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches")
+        parser.add_argument('--dry-run', action='store_true', help="Report savings without writing")
+
+    def handle(self, *args, **options):
+        last_id = options['start_id']
+        batches = 0
+        rewritten = 0
+        bytes_before = 0
+        bytes_after = 0
+
+        while options['max_batches'] is None or batches < options['max_batches']:
+            events = list(
+                TransactionEvent.objects.filter(
+                    id__gt=last_id,
+                    payload_blob__isnull=True
+                ).order_by('id').only('id', 'payload_json', 'payload_blob')[:options['batch_size']]
+            )
+            if not events:
+                break
+
+            changed = []
+            for event in events:
+                before = self._size(event.payload_json)
+                payload_json, payload_blob = encode_payload(event.payload_json)
+                after = self._size(payload_json) + len(payload_blob or b'')
+                if after >= before:
+                    continue
+                event.payload_json, event.payload_blob = payload_json, payload_blob
+                changed.append(event)
+                bytes_before += before
+                bytes_after += after
+
+            if changed and not options['dry_run']:
+                with db_transaction.atomic():
+                    TransactionEvent.objects.bulk_update(changed, ['payload_json', 'payload_blob'])
+
+            rewritten += len(changed)
+            batches += 1
+            last_id = events[-1].id
+            self.stderr.write(f"Batch {batches}: up to id {last_id}, rewritten {len(changed)}")
+
+        saved = bytes_before - bytes_after
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would rewrite' if options['dry_run'] else 'Rewrote'} {rewritten} events, "
+            f"{bytes_before} -> {bytes_after} bytes ({saved} saved); last id {last_id}"
+        ))
+
+    @staticmethod
+    def _size(value) -> int:
+        return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
@@ -0,0 +1,36 @@
+"""
+Management command for reconciling pending transactions with the gateway
+"""
+from django.core.management.base import BaseCommand
+from payment.services.reconciliation_service import ReconciliationService
+
+
+class Command(BaseCommand):
+    help = "Re-verify pending Zarinpal transactions whose callback never arrived"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Transactions per batch")
+        parser.add_argument('--concurrency', type=int, help="Concurrent gateway calls")
+        parser.add_argument('--max-batches', type=int, help="Stop after N batches (resumable)")
+        parser.add_argument('--reset', action='store_true', help="Ignore the saved checkpoint")
+
+    def handle(self, *args, **options):
+        service = ReconciliationService(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency']
+        )
+        report = service.run(max_batches=options['max_batches'], reset=options['reset'])
+
+        self.stdout.write(
+            f"processed={report['processed']} completed={report['completed']} "
+            f"already_verified={report['already_verified']} failed={report['failed']} "
+            f"transient={report['transient']} batches={report['batches']}"
+        )
+        self.stdout.write(
+            f"elapsed={report['elapsed_seconds']}s "
+            f"throughput={report['throughput_per_second']} tx/s"
+        )
+        if report['finished']:
+            self.stdout.write(self.style.SUCCESS("Reconciliation sweep complete"))
+        else:
+            self.stdout.write(self.style.WARNING("Stopped early; rerun to resume from checkpoint"))
@@ -0,0 +1,46 @@
+"""
+Management command for rebuilding projections from the TransactionEvent log
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+from payment.services.replay_service import EventReplayService
+
+
+class Command(BaseCommand):
+    help = "Replay TransactionEvents to rebuild Redis state, order summaries and wallet snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First transaction day (YYYY-MM-DD, inclusive)")
+        parser.add_argument('--end', help="Last transaction day (YYYY-MM-DD, inclusive)")
+        parser.add_argument('--workers', type=int, help="Worker processes (1 runs in-process)")
+        parser.add_argument('--chunk-size', type=int, help="Transactions per partition")
+        parser.add_argument('--skip-redis', action='store_true', help="Do not rebuild state/cache/order summary keys")
+        parser.add_argument('--skip-wallets', action='store_true', help="Do not rebuild wallet snapshots")
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'], 'start')
+        end = self._parse(options['end'], 'end')
+        if start and end and start > end:
+            raise CommandError("--end must not be before --start")
+
+        report = EventReplayService(
+            workers=options['workers'],
+            chunk_size=options['chunk_size']
+        ).run(
+            start=start,
+            end=end,
+            rebuild_redis=not options['skip_redis'],
+            rebuild_wallets=not options['skip_wallets']
+        )
+        self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+
+    @staticmethod
+    def _parse(value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"Invalid --{name} date: {value}")
+        return parsed
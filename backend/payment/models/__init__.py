@@ -1,5 +1,24 @@
 from .transaction import Transaction, TransactionEvent
-from .enums import TransactionStatus, GatewayType
-
-__all__ = ['Transaction', 'TransactionEvent', 'TransactionStatus', 'GatewayType']
+from .wallet import WalletLedgerEntry, WalletBalanceSnapshot
+from .refund import RefundBatch, RefundItem
+from .enums import (
+    TransactionStatus,
+    GatewayType,
+    WalletEntryType,
+    RefundBatchStatus,
+    RefundItemStatus,
+)
 
+__all__ = [
+    'Transaction',
+    'TransactionEvent',
+    'WalletLedgerEntry',
+    'WalletBalanceSnapshot',
+    'RefundBatch',
+    'RefundItem',
+    'TransactionStatus',
+    'GatewayType',
+    'WalletEntryType',
+    'RefundBatchStatus',
+    'RefundItemStatus',
+]
@@ -17,3 +17,26 @@ class GatewayType(models.IntegerChoices):
     STRIPE = 2, 'Stripe'
     PAYPAL = 3, 'PayPal'
 
+
+
+class WalletEntryType(models.TextChoices):
+    """Wallet ledger entry type enumeration"""
+    CREDIT = 'credit', 'Credit'
+    DEBIT = 'debit', 'Debit'
+    REFUND = 'refund', 'Refund'
+
+
+class RefundBatchStatus(models.TextChoices):
+    """Refund batch status enumeration"""
+    PENDING = 'pending', 'Pending'
+    PROCESSING = 'processing', 'Processing'
+    COMPLETED = 'completed', 'Completed'
+
+
+class RefundItemStatus(models.TextChoices):
+    """Refund item status enumeration"""
+    PENDING = 'pending', 'Pending'
+    PROCESSING = 'processing', 'Processing'
+    SUCCEEDED = 'succeeded', 'Succeeded'
+    FAILED = 'failed', 'Failed'
+    NEEDS_REVIEW = 'needs_review', 'Needs Review'
@@ -0,0 +1,136 @@
+"""
+Django ORM Models for Batched Refunds
+"""
+import uuid
+from django.db import models
+from .enums import RefundBatchStatus, RefundItemStatus
+from .transaction import Transaction
+
+
+class RefundBatch(models.Model):
+    """
+    Refund Batch Model
+    
+    A bulk refund request (e.g. a product recall). Items are processed
+    by a background job that can resume after a crash.
+    """
+    batch_uuid = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        help_text="Unique refund batch identifier"
+    )
+    
+    reason = models.TextField(
+        blank=True,
+        help_text="Reason for the refund campaign"
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=RefundBatchStatus.choices,
+        default=RefundBatchStatus.PENDING,
+        db_index=True,
+        help_text="Batch processing status"
+    )
+    
+    requested_by = models.CharField(
+        max_length=150,
+        blank=True,
+        help_text="Username of the requester"
+    )
+    
+    stats = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Processing counters and throughput (JSON)"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True
+    )
+    
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+    
+    class Meta:
+        db_table = 'refund_batch'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Refund batch {self.batch_uuid} - {self.status}"
+
+
+class RefundItem(models.Model):
+    """
+    Refund Item Model
+    
+    One transaction to refund within a batch.
+    """
+    id = models.BigAutoField(primary_key=True)
+    
+    batch = models.ForeignKey(
+        RefundBatch,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.PROTECT,
+        related_name='refund_items'
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=RefundItemStatus.choices,
+        default=RefundItemStatus.PENDING,
+        help_text="Item processing status"
+    )
+    
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of gateway refund attempts"
+    )
+    
+    gateway_response = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Last gateway refund response (JSON)"
+    )
+    
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a worker took the item for a gateway call"
+    )
+    
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Earliest time a retried item may be claimed again"
+    )
+    
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+    
+    class Meta:
+        db_table = 'refund_item'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['batch', 'status']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['batch', 'transaction'],
+                name='refund_item_unique_per_batch'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Refund item {self.id} - {self.transaction_id} - {self.status}"
@@ -5,6 +5,7 @@ import uuid
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from payment.utils.payload_codec import encode_payload, decode_payload
 from .enums import TransactionStatus, GatewayType
 
 
@@ -182,9 +183,18 @@ class TransactionEvent(models.Model):
         help_text="Source of the event (e.g., 'payment_gateway', 'webhook')"
     )
     
-    payload = models.JSONField(
+    payload_json = models.JSONField(
         default=dict,
-        help_text="Event payload data (JSON)"
+        db_column='payload',
+        help_text="Event payload data (JSON); only the action when compressed"
+    )
+    
+    payload_blob = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_column='payload_zlib',
+        help_text="zlib-compressed payload JSON for large payloads"
     )
     
     provider_ip = models.GenericIPAddressField(
@@ -207,4 +217,13 @@ class TransactionEvent(models.Model):
     
     def __str__(self):
         return f"Event {self.id} - {self.old_status} -> {self.new_status}"
+    
+    @property
+    def payload(self) -> dict:
+        """Event payload, decompressed transparently"""
+        return decode_payload(self.payload_json, self.payload_blob)
+    
+    @payload.setter
+    def payload(self, value: dict):
+        self.payload_json, self.payload_blob = encode_payload(value)
 
@@ -0,0 +1,126 @@
+"""
+Django ORM Models for Wallet Ledger
+"""
+from django.db import models
+from .enums import WalletEntryType
+from .transaction import Transaction
+
+
+class WalletLedgerEntry(models.Model):
+    """
+    Wallet Ledger Entry Model
+    
+    Append-only record of every wallet movement. Rows are never updated
+    or deleted; a balance is the sum of a wallet's entries.
+    """
+    id = models.BigAutoField(primary_key=True)
+    
+    user_id = models.UUIDField(
+        help_text="Wallet owner (same identifier as Transaction.user_id)"
+    )
+    
+    currency = models.CharField(
+        max_length=10,
+        default='IRR',
+        help_text="Currency code (ISO 4217)"
+    )
+    
+    amount = models.BigIntegerField(
+        help_text="Signed amount in smallest currency unit (negative for debits)"
+    )
+    
+    entry_type = models.CharField(
+        max_length=20,
+        choices=WalletEntryType.choices,
+        help_text="Ledger entry type"
+    )
+    
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='wallet_entries',
+        help_text="Payment transaction that produced this entry"
+    )
+    
+    description = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Entry description"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True
+    )
+    
+    class Meta:
+        db_table = 'wallet_ledger_entry'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user_id', 'currency', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transaction', 'entry_type'],
+                condition=models.Q(transaction__isnull=False),
+                name='wallet_entry_unique_per_transaction'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Wallet entry {self.id} - {self.user_id} {self.amount:+d} {self.currency}"
+    
+    def save(self, *args, **kwargs):
+        """Entries are immutable once written"""
+        if self.pk is not None and not self._state.adding:
+            raise ValueError("Wallet ledger entries are append-only")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Wallet ledger entries are append-only")
+
+
+class WalletBalanceSnapshot(models.Model):
+    """
+    Wallet Balance Snapshot Model
+    
+    Balance of a wallet up to and including last_entry_id. A balance read
+    is this row plus the short tail of entries written after it.
+    """
+    user_id = models.UUIDField(
+        help_text="Wallet owner"
+    )
+    
+    currency = models.CharField(
+        max_length=10,
+        default='IRR',
+        help_text="Currency code (ISO 4217)"
+    )
+    
+    balance = models.BigIntegerField(
+        default=0,
+        help_text="Balance up to last_entry_id"
+    )
+    
+    last_entry_id = models.BigIntegerField(
+        default=0,
+        help_text="Highest ledger entry id included in balance"
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+    
+    class Meta:
+        db_table = 'wallet_balance_snapshot'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_id', 'currency'],
+                name='wallet_snapshot_unique_wallet'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Wallet {self.user_id} {self.balance} {self.currency} @ {self.last_entry_id}"
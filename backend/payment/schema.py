@@ -0,0 +1,40 @@
+"""
+Schema upgrades for the payment app.
+
+The payment app has no migrations: its tables are created by syncdb, which
+never alters an existing table. Columns added to existing models are created
+here, from a post_migrate handler, so ``python manage.py migrate`` applies
+them at deploy time.
+"""
+import logging
+from django.db import connections
+from payment.models import RefundItem, TransactionEvent
+
+logger = logging.getLogger(__name__)
+
+# (model, field name) pairs added after their table was first created
+ADDED_COLUMNS = [
+    (TransactionEvent, 'payload_blob'),
+    (RefundItem, 'next_attempt_at'),
+]
+
+
+def add_missing_columns(sender, using='default', **kwargs):
+    """Add ADDED_COLUMNS that are missing from existing tables (idempotent)"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        tables = set(connection.introspection.table_names(cursor))
+        for model, field_name in ADDED_COLUMNS:
+            table = model._meta.db_table
+            if table not in tables:
+                continue
+            columns = {
+                column.name for column in
+                connection.introspection.get_table_description(cursor, table)
+            }
+            field = model._meta.get_field(field_name)
+            if field.column in columns:
+                continue
+            with connection.schema_editor() as schema_editor:
+                schema_editor.add_field(model, field)
+            logger.warning(f"Added column {table}.{field.column}")
@@ -1,10 +1,18 @@
 from .transaction_service import TransactionService
 from .idempotency_manager import IdempotencyManager
+from .export_service import SettlementExportService
+from .refund_service import RefundService
+from .velocity_guard import VelocityGuard
+from .order_summary_service import OrderSummaryService
 from .exceptions import PaymentException, DuplicateTransactionError, InvalidTransactionError
 
 __all__ = [
     'TransactionService',
     'IdempotencyManager',
+    'SettlementExportService',
+    'RefundService',
+    'VelocityGuard',
+    'OrderSummaryService',
     'PaymentException',
     'DuplicateTransactionError',
     'InvalidTransactionError',
@@ -28,3 +28,12 @@ class VerificationError(PaymentException):
     """Raised when payment verification fails"""
     pass
 
+
+
+class VelocityLimitExceeded(PaymentException):
+    """Raised when a client exceeds a payment initialization rate limit"""
+
+    def __init__(self, message: str, scope: str, retry_after: int):
+        super().__init__(message)
+        self.scope = scope
+        self.retry_after = retry_after
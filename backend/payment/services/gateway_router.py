@@ -0,0 +1,182 @@
+"""
+Gateway Router
+Adaptive gateway selection from shared latency and error statistics
+"""
+import logging
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from django.conf import settings
+from payment.models import GatewayType
+from payment.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayRouter:
+    """
+    Tracks per-gateway call latency and error rate in Redis (per-minute
+    buckets shared by all workers) and picks the healthiest gateway among
+    those a merchant has enabled.
+
+    Latency is kept as a histogram so p99 can be estimated without storing
+    individual samples.
+    """
+
+    # Histogram upper bounds in milliseconds; slower calls land in 'le_inf'
+    LATENCY_BOUNDS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+    # Local gateway error codes that indicate an unhealthy gateway rather
+    # than a rejected request
+    FAILURE_ERROR_CODES = {'TIMEOUT', 'REQUEST_ERROR', 'UNEXPECTED_FORMAT', 'RATE_LIMITED'}
+
+    def record(self, gateway_id: int, latency_ms: float, response: Dict[str, Any]) -> None:
+        """
+        Record the outcome of a gateway call.
+
+        Args:
+            gateway_id: Gateway type ID
+            latency_ms: Call duration in milliseconds
+            response: Gateway response dict
+        """
+        failed = (
+            response.get('status') == 'error'
+            and response.get('error_code') in self.FAILURE_ERROR_CODES
+        )
+        redis_client.record_gateway_call(
+            int(gateway_id),
+            {
+                'calls': 1,
+                'errors': int(failed),
+                self._bucket_field(latency_ms): 1,
+            },
+            time.time(),
+            (settings.GATEWAY_ROUTING_WINDOW_MINUTES + 1) * 60
+        )
+
+    def get_stats(self, gateway_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Rolling statistics per gateway.
+
+        Args:
+            gateway_ids: Gateway type IDs
+
+        Returns:
+            Dict of gateway ID -> {calls, errors, error_rate, p99_ms}
+        """
+        gateway_ids = [int(gateway_id) for gateway_id in gateway_ids]
+        raw = redis_client.get_gateway_stats(
+            gateway_ids,
+            settings.GATEWAY_ROUTING_WINDOW_MINUTES,
+            time.time()
+        ) or {}
+
+        stats = {}
+        for gateway_id in gateway_ids:
+            fields = raw.get(gateway_id, {})
+            calls = fields.get('calls', 0)
+            stats[gateway_id] = {
+                'calls': calls,
+                'errors': fields.get('errors', 0),
+                'error_rate': round(fields.get('errors', 0) / calls, 4) if calls else 0.0,
+                'p99_ms': self._percentile(fields, calls, 0.99),
+            }
+        return stats
+
+    def choose(
+        self,
+        requested: int,
+        allowed: Optional[List[int]],
+        currency: str
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Pick a gateway for a new payment.
+
+        The requested gateway is kept unless it is unhealthy or another
+        enabled gateway scores better by GATEWAY_ROUTING_SWITCH_MARGIN.
+        Gateways without enough samples in the window are only chosen
+        when the requested one is unhealthy.
+
+        Args:
+            requested: Gateway the client asked for
+            allowed: Gateways the merchant has enabled
+            currency: Payment currency
+
+        Returns:
+            Tuple of (chosen gateway ID, routing decision for Transaction.meta)
+        """
+        requested = int(requested)
+        candidates = [requested] + [int(g) for g in allowed or [] if int(g) != requested]
+        eligible = [g for g in candidates if self._supports_currency(g, currency)]
+        stats = self.get_stats(eligible)
+
+        healthy = [g for g in eligible if self._is_healthy(stats[g])]
+        scores = {g: self._score(stats[g]) for g in healthy}
+        measured = {g: score for g, score in scores.items() if score is not None}
+        best = min(measured, key=measured.get) if measured else None
+        chosen, reason = requested, 'requested'
+
+        if requested in stats and requested not in healthy:
+            fallback = best if best is not None else next(iter(healthy), None)
+            if fallback is not None:
+                chosen, reason = fallback, 'requested_unhealthy'
+            else:
+                reason = 'no_healthy_gateway'
+        elif (
+            best is not None and best != requested
+            and scores.get(requested) is not None
+            and measured[best] * (1 + settings.GATEWAY_ROUTING_SWITCH_MARGIN) < scores[requested]
+        ):
+            chosen, reason = best, 'better_score'
+
+        if chosen != requested:
+            logger.info(f"Gateway routed: requested={requested} chosen={chosen} reason={reason}")
+
+        return chosen, {
+            'requested_gateway': requested,
+            'chosen_gateway': chosen,
+            'reason': reason,
+            'eligible': eligible,
+            'stats': {str(gateway_id): gateway_stats for gateway_id, gateway_stats in stats.items()},
+        }
+
+    def _is_healthy(self, stats: Dict[str, Any]) -> bool:
+        if stats['calls'] < settings.GATEWAY_ROUTING_MIN_SAMPLES:
+            return True
+        return (
+            stats['error_rate'] <= settings.GATEWAY_ROUTING_MAX_ERROR_RATE
+            and stats['p99_ms'] <= settings.GATEWAY_ROUTING_MAX_P99_MS
+        )
+
+    @staticmethod
+    def _score(stats: Dict[str, Any]) -> Optional[float]:
+        """Lower is better; None when there are too few samples to judge"""
+        if stats['calls'] < settings.GATEWAY_ROUTING_MIN_SAMPLES:
+            return None
+        return stats['p99_ms'] * (1 + settings.GATEWAY_ROUTING_ERROR_PENALTY * stats['error_rate'])
+
+    @staticmethod
+    def _supports_currency(gateway_id: int, currency: str) -> bool:
+        try:
+            name = GatewayType(gateway_id).name
+        except ValueError:
+            return False
+        currencies = settings.PAYMENT_SETTINGS.get(name, {}).get('CURRENCIES')
+        return not currencies or currency in currencies
+
+    def _bucket_field(self, latency_ms: float) -> str:
+        for bound in self.LATENCY_BOUNDS_MS:
+            if latency_ms <= bound:
+                return f'le_{bound}'
+        return 'le_inf'
+
+    def _percentile(self, fields: Dict[str, int], calls: int, quantile: float) -> int:
+        """Upper bound of the histogram bucket containing the quantile"""
+        if not calls:
+            return 0
+        threshold = calls * quantile
+        seen = 0
+        for bound in self.LATENCY_BOUNDS_MS:
+            seen += fields.get(f'le_{bound}', 0)
+            if seen >= threshold:
+                return bound
+        return self.LATENCY_BOUNDS_MS[-1] * 2
@@ -0,0 +1,121 @@
+"""
+Order Payment Summary Service
+Per-order payment summaries cached in Redis
+"""
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from payment.models import Transaction, TransactionStatus
+from payment.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class OrderSummaryService:
+    """
+    Service for per-order payment summaries.
+
+    A summary is rebuilt from the order's transactions whenever one of them
+    gets a TransactionEvent and stored in Redis, so order pages read one
+    key instead of filtering transactions. Misses are computed with a
+    single query on the (order_id, user_id) index.
+    """
+
+    FIELDS = [
+        'transaction_uuid', 'order_id', 'user_id', 'amount', 'currency',
+        'ref_id', 'is_done', 'is_added_wallet', 'is_refund', 'created_at',
+    ]
+
+    def get_summary(self, order_id: str, user_id: str) -> Dict[str, Any]:
+        """
+        Get an order's payment summary.
+
+        Args:
+            order_id: Order identifier
+            user_id: Order owner UUID
+
+        Returns:
+            Summary dict
+        """
+        user_id = str(user_id)
+        cached = redis_client.get_order_summary(order_id, user_id)
+        if cached is not None:
+            return cached
+        return self.refresh(order_id, user_id)
+
+    def refresh(self, order_id: str, user_id: str) -> Dict[str, Any]:
+        """Recompute an order's summary and store it in Redis"""
+        return self.refresh_many([(order_id, user_id)])[(order_id, str(user_id))]
+
+    def refresh_later(self, orders: Iterable[Tuple[str, str]]) -> None:
+        """Refresh summaries once the current database transaction commits"""
+        orders = {(order_id, str(user_id)) for order_id, user_id in orders}
+        if orders:
+            db_transaction.on_commit(lambda: self._safe_refresh(orders))
+
+    def _safe_refresh(self, orders):
+        try:
+            self.refresh_many(orders)
+        except Exception as e:
+            logger.error(f"Failed to refresh order summaries: {e}", exc_info=True)
+
+    def refresh_many(self, orders: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Recompute summaries of several orders with one query.
+
+        Args:
+            orders: (order_id, user_id) pairs
+
+        Returns:
+            Dict of (order_id, user_id) -> summary
+        """
+        orders = {(order_id, str(user_id)) for order_id, user_id in orders}
+        if not orders:
+            return {}
+
+        condition = Q()
+        for order_id, user_id in orders:
+            condition |= Q(order_id=order_id, user_id=user_id)
+
+        rows = {key: [] for key in orders}
+        for row in Transaction.objects.filter(condition).order_by('created_at').values(*self.FIELDS):
+            rows[(row['order_id'], str(row['user_id']))].append(row)
+
+        summaries = {key: self._summarize(key, transactions) for key, transactions in rows.items()}
+        redis_client.set_order_summaries(summaries, settings.ORDER_SUMMARY_CACHE_TTL)
+        return summaries
+
+    @staticmethod
+    def _summarize(key: Tuple[str, str], transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        order_id, user_id = key
+        latest = transactions[-1] if transactions else None
+        paid = [t for t in transactions if t['is_done'] and not t['is_refund']]
+        refunded = [t for t in transactions if t['is_refund']]
+        paid_transaction: Optional[Dict[str, Any]] = paid[-1] if paid else None
+
+        return {
+            'order_id': order_id,
+            'user_id': user_id,
+            'attempts': len(transactions),
+            'latest_status': OrderSummaryService._status(latest) if latest else None,
+            'latest_payment_id': str(latest['transaction_uuid']) if latest else None,
+            'currency': latest['currency'] if latest else None,
+            'is_paid': bool(paid),
+            'paid_amount': sum(t['amount'] for t in paid),
+            'refunded_amount': sum(t['amount'] for t in refunded),
+            'paid_payment_id': str(paid_transaction['transaction_uuid']) if paid_transaction else None,
+            'ref_id': paid_transaction['ref_id'] if paid_transaction else None,
+        }
+
+    @staticmethod
+    def _status(row: Dict[str, Any]) -> str:
+        """Mirror Transaction.status for a values() row"""
+        if row['is_refund']:
+            return TransactionStatus.REFUNDED.value
+        if row['is_done']:
+            if row['is_added_wallet']:
+                return TransactionStatus.COMPLETED_AND_ADDED.value
+            return TransactionStatus.COMPLETED.value
+        return TransactionStatus.PENDING.value
@@ -0,0 +1,244 @@
+"""
+Reconciliation Service
+Re-verifies pending transactions whose gateway callback never arrived
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from payment.models import Transaction, TransactionEvent, GatewayType
+from payment.utils.redis_client import redis_client
+from payment.verification import ZarinpalVerifier
+from .exceptions import VerificationError
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliationService:
+    """
+    Walks pending Zarinpal transactions in keyset-paginated batches and
+    re-verifies them through the gateway with bounded concurrency.
+
+    Gateway calls run on a thread pool; results are applied on the calling
+    thread in completion order through ZarinpalVerifier.apply_verification_result,
+    the same path used by callback verification. A checkpoint is stored in
+    Redis after every batch so an interrupted run resumes where it stopped.
+    """
+
+    CHECKPOINT_NAME = 'reconciliation'
+    EVENT_SOURCE = 'reconciliation'
+
+    # new_status of the event ZarinpalVerifier records for a failed verification
+    FAILED_STATUS = 'failed'
+
+    # Gateway error codes produced locally for transport problems; these
+    # transactions are left untouched and retried on the next sweep.
+    TRANSIENT_ERROR_CODES = {'TIMEOUT', 'REQUEST_ERROR', 'UNEXPECTED_FORMAT'}
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        min_age: Optional[timedelta] = None,
+        max_age: Optional[timedelta] = None
+    ):
+        self.batch_size = batch_size or settings.RECONCILIATION_BATCH_SIZE
+        self.concurrency = concurrency or settings.RECONCILIATION_CONCURRENCY
+        self.min_age = min_age or timedelta(minutes=settings.RECONCILIATION_MIN_AGE_MINUTES)
+        self.max_age = max_age or timedelta(hours=settings.RECONCILIATION_MAX_AGE_HOURS)
+        self.verifier = ZarinpalVerifier()
+
+    def get_pending_queryset(self, now=None):
+        """
+        Pending Zarinpal transactions inside the reconciliation window.
+
+        Transactions the sweep already verified as failed are skipped: the
+        gateway failure is permanent, so asking again on every run only adds
+        gateway calls and duplicate failure events.
+        """
+        now = now or timezone.now()
+        verified_failed = TransactionEvent.objects.filter(
+            transaction=OuterRef('pk'),
+            new_status=self.FAILED_STATUS,
+            event_source=self.EVENT_SOURCE,
+        )
+        return Transaction.objects.filter(
+            gateway_id=GatewayType.ZARINPAL,
+            is_done=False,
+            is_refund=False,
+            authority_code__isnull=False,
+            created_at__lt=now - self.min_age,
+            created_at__gte=now - self.max_age,
+        ).exclude(Exists(verified_failed)).order_by('created_at', 'transaction_uuid')
+
+    def run(self, max_batches: Optional[int] = None, reset: bool = False) -> Dict[str, Any]:
+        """
+        Run (or resume) a reconciliation sweep.
+
+        Args:
+            max_batches: Stop after this many batches (checkpoint is kept)
+            reset: Discard any saved checkpoint and start from the beginning
+
+        Returns:
+            Dict with counters, elapsed time and throughput
+        """
+        if reset:
+            redis_client.clear_checkpoint(self.CHECKPOINT_NAME)
+
+        checkpoint = redis_client.get_checkpoint(self.CHECKPOINT_NAME) or {}
+        stats = checkpoint.get('stats') or self._empty_stats()
+        cursor = checkpoint.get('cursor')
+        queryset = self.get_pending_queryset()
+
+        resumed_from = stats['processed']
+        started = time.monotonic()
+        batches = 0
+        finished = False
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while max_batches is None or batches < max_batches:
+                batch = self._next_batch(queryset, cursor)
+                if not batch:
+                    finished = True
+                    break
+
+                self._process_batch(executor, batch, stats)
+                batches += 1
+
+                last = batch[-1]
+                cursor = {
+                    'created_at': last.created_at.isoformat(),
+                    'transaction_uuid': str(last.transaction_uuid),
+                }
+                redis_client.set_checkpoint(
+                    self.CHECKPOINT_NAME,
+                    {'cursor': cursor, 'stats': stats}
+                )
+
+                elapsed = time.monotonic() - started
+                logger.info(
+                    f"Reconciliation batch {batches}: processed={stats['processed']} "
+                    f"completed={stats['completed']} failed={stats['failed']} "
+                    f"transient={stats['transient']} "
+                    f"throughput={self._throughput(stats['processed'] - resumed_from, elapsed)}/s"
+                )
+
+        if finished:
+            redis_client.clear_checkpoint(self.CHECKPOINT_NAME)
+
+        elapsed = time.monotonic() - started
+        report = {
+            **stats,
+            'batches': batches,
+            'finished': finished,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': self._throughput(stats['processed'] - resumed_from, elapsed),
+        }
+        logger.info(f"Reconciliation run finished: {report}")
+        return report
+
+    def _next_batch(self, queryset, cursor: Optional[Dict[str, str]]) -> List[Transaction]:
+        """Fetch the next batch after the (created_at, transaction_uuid) cursor"""
+        if cursor:
+            created_at = parse_datetime(cursor['created_at'])
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) |
+                Q(created_at=created_at, transaction_uuid__gt=cursor['transaction_uuid'])
+            )
+        return list(queryset[:self.batch_size])
+
+    def _process_batch(self, executor, batch: List[Transaction], stats: Dict[str, int]):
+        """
+        Verify a batch concurrently and apply each result as soon as its
+        gateway call returns, so a transaction's lock is held only for its
+        own round trip and not until earlier submissions finish
+        """
+        futures = {
+            executor.submit(self._call_gateway, transaction): transaction
+            for transaction in batch
+        }
+        for future in as_completed(futures):
+            transaction = futures[future]
+            stats['processed'] += 1
+            lock_name = self.verifier.lock_name(transaction.transaction_uuid)
+            try:
+                token, verify_response = future.result()
+            except Exception as e:
+                logger.error(f"Reconciliation gateway call crashed for {transaction.transaction_uuid}: {e}")
+                stats['transient'] += 1
+                continue
+
+            # A callback is verifying this transaction right now
+            if token is None:
+                stats['transient'] += 1
+                continue
+
+            try:
+                # A callback may have completed it before we took the lock
+                transaction.refresh_from_db(fields=['is_done', 'ref_id'])
+                if transaction.is_done:
+                    stats['already_verified'] += 1
+                    continue
+
+                if (verify_response.get('status') == 'error'
+                        and verify_response.get('error_code') in self.TRANSIENT_ERROR_CODES):
+                    stats['transient'] += 1
+                    continue
+
+                try:
+                    result = self.verifier.apply_verification_result(
+                        transaction,
+                        verify_response,
+                        event_source=self.EVENT_SOURCE
+                    )
+                except VerificationError:
+                    stats['failed'] += 1
+                    continue
+            finally:
+                redis_client.release_lock(lock_name, token)
+
+            if result['status'] == 'already_verified':
+                stats['already_verified'] += 1
+            else:
+                stats['completed'] += 1
+
+    def _call_gateway(self, transaction: Transaction) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Call ZarinpalGateway.verify_payment (runs on a worker thread).
+
+        Takes the same per-transaction lock as ZarinpalVerifier.verify so a
+        concurrent callback and the sweep never both hit the gateway.
+        """
+        token = redis_client.acquire_lock(
+            self.verifier.lock_name(transaction.transaction_uuid),
+            settings.VERIFICATION_LOCK_TTL
+        )
+        if token is None:
+            return None, None
+        try:
+            return token, self.verifier.gateway.verify_payment({
+                'authority': transaction.authority_code,
+                'amount': transaction.amount
+            })
+        except Exception:
+            redis_client.release_lock(self.verifier.lock_name(transaction.transaction_uuid), token)
+            raise
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            'processed': 0,
+            'completed': 0,
+            'already_verified': 0,
+            'failed': 0,
+            'transient': 0,
+        }
+
+    @staticmethod
+    def _throughput(processed: int, elapsed: float) -> float:
+        return round(processed / elapsed, 2) if elapsed > 0 else 0.0
@@ -0,0 +1,399 @@
+"""
+Refund Service
+Batched gateway refunds with bounded concurrency, rate limiting and resume
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from payment.models import (
+    Transaction,
+    TransactionEvent,
+    TransactionStatus,
+    GatewayType,
+    RefundBatch,
+    RefundBatchStatus,
+    RefundItem,
+    RefundItemStatus,
+    WalletLedgerEntry,
+    WalletEntryType,
+)
+from payment.gateways import ZarinpalGateway, StripeGateway, PayPalGateway
+from payment.utils.redis_client import redis_client
+from .wallet_service import WalletService
+from .order_summary_service import OrderSummaryService
+
+logger = logging.getLogger(__name__)
+
+
+class _RateLimiter:
+    """Spaces calls evenly so all worker threads together stay under a rate"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RefundService:
+    """
+    Service for bulk refund campaigns.
+
+    A batch is created with one RefundItem per transaction. Processing claims
+    pending items in chunks (SKIP LOCKED, so several workers can share a
+    batch), calls the gateways on a thread pool behind a shared rate limiter,
+    and writes each chunk's outcome with bulk UPDATEs and one INSERT of
+    audit events. Item rows are the checkpoint: a crashed run is resumed by
+    processing the batch again.
+    """
+
+    EVENT_SOURCE = 'refund'
+
+    # Items in these states block a transaction from joining another batch
+    ACTIVE_ITEM_STATUSES = (
+        RefundItemStatus.PENDING,
+        RefundItemStatus.PROCESSING,
+        RefundItemStatus.SUCCEEDED,
+        RefundItemStatus.NEEDS_REVIEW,
+    )
+
+    # The gateway refused the call (429) or the connection was never made, so
+    # nothing was refunded; the item goes back to pending until
+    # REFUND_MAX_ATTEMPTS is reached.
+    RETRYABLE_ERROR_CODES = {'RATE_LIMITED', 'CONNECT_ERROR'}
+
+    # The request may have reached the gateway (read timeout, 5xx, reset
+    # connection, unreadable body, crash in the gateway client), so retrying
+    # risks paying twice; the item is parked for manual review.
+    AMBIGUOUS_ERROR_CODES = {'TIMEOUT', 'UNEXPECTED_FORMAT', 'REQUEST_ERROR'}
+
+    # A claimed item older than this was abandoned by a crashed worker
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None
+    ):
+        self.chunk_size = chunk_size or settings.REFUND_CHUNK_SIZE
+        self.concurrency = concurrency or settings.REFUND_CONCURRENCY
+        self.rate_limit = rate_limit if rate_limit is not None else settings.REFUND_RATE_LIMIT
+        self.max_attempts = settings.REFUND_MAX_ATTEMPTS
+        self.retry_backoff = timedelta(seconds=settings.REFUND_RETRY_BACKOFF_SECONDS)
+        self.gateways = {
+            GatewayType.ZARINPAL: ZarinpalGateway(),
+            GatewayType.STRIPE: StripeGateway(),
+            GatewayType.PAYPAL: PayPalGateway(),
+        }
+        self.wallet_service = WalletService()
+        self.order_summaries = OrderSummaryService()
+
+    def create_batch(
+        self,
+        transaction_uuids: Iterable[str],
+        reason: str = '',
+        requested_by: str = ''
+    ) -> Tuple[RefundBatch, List[str]]:
+        """
+        Create a refund batch for completed transactions.
+
+        Args:
+            transaction_uuids: Transactions to refund
+            reason: Reason recorded on the batch and sent to the gateway
+            requested_by: Username of the requester
+
+        Returns:
+            Tuple of (batch, rejected transaction UUIDs)
+        """
+        requested = list(dict.fromkeys(str(uuid) for uuid in transaction_uuids))
+
+        with db_transaction.atomic():
+            eligible = list(
+                Transaction.objects.filter(
+                    transaction_uuid__in=requested,
+                    is_done=True,
+                    is_refund=False,
+                ).exclude(
+                    refund_items__status__in=self.ACTIVE_ITEM_STATUSES
+                ).values_list('transaction_uuid', flat=True)
+            )
+
+            batch = RefundBatch.objects.create(
+                reason=reason,
+                requested_by=requested_by,
+                stats={'total': len(eligible)}
+            )
+            RefundItem.objects.bulk_create([
+                RefundItem(batch=batch, transaction_id=transaction_uuid)
+                for transaction_uuid in eligible
+            ])
+
+        eligible_set = {str(uuid) for uuid in eligible}
+        rejected = [uuid for uuid in requested if uuid not in eligible_set]
+        logger.info(
+            f"Refund batch created: {batch.batch_uuid}, "
+            f"items={len(eligible)}, rejected={len(rejected)}"
+        )
+        return batch, rejected
+
+    def process_batch(self, batch_uuid: str, max_chunks: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Process (or resume) a refund batch.
+
+        Args:
+            batch_uuid: Refund batch UUID
+            max_chunks: Stop after this many chunks (remaining items stay pending)
+
+        The run also stops after a chunk the gateway rate limited; retried
+        items wait until their next_attempt_at and are picked up by a later
+        run (resume_refund_batches).
+
+        Returns:
+            Dict with item counters, elapsed time and refunds per second
+        """
+        batch = RefundBatch.objects.get(batch_uuid=batch_uuid)
+        if batch.status == RefundBatchStatus.COMPLETED:
+            return batch.stats
+
+        RefundBatch.objects.filter(pk=batch.pk).update(status=RefundBatchStatus.PROCESSING)
+        self._release_abandoned_claims(batch)
+
+        limiter = _RateLimiter(self.rate_limit)
+        started = time.monotonic()
+        handled = 0
+        chunks = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while max_chunks is None or chunks < max_chunks:
+                items = self._claim_chunk(batch)
+                if not items:
+                    break
+
+                responses = list(executor.map(
+                    lambda item: self._call_gateway(item, batch.reason, limiter),
+                    items
+                ))
+                self._apply_results(items, responses)
+
+                handled += len(items)
+                chunks += 1
+                logger.info(
+                    f"Refund batch {batch.batch_uuid} chunk {chunks}: {len(items)} items, "
+                    f"throughput={self._throughput(handled, time.monotonic() - started)}/s"
+                )
+                if any(response.get('error_code') == 'RATE_LIMITED' for response in responses):
+                    # Leave the rest for resume_refund_batches instead of hammering the gateway
+                    logger.warning(f"Refund batch {batch.batch_uuid} rate limited by the gateway, pausing")
+                    break
+
+        elapsed = time.monotonic() - started
+        stats = self._batch_counts(batch)
+        finished = not (stats[RefundItemStatus.PENDING] or stats[RefundItemStatus.PROCESSING])
+        stats.update({
+            'total': sum(stats[choice] for choice in RefundItemStatus.values),
+            'last_run_items': handled,
+            'last_run_elapsed_seconds': round(elapsed, 3),
+            'refunds_per_second': self._throughput(handled, elapsed),
+        })
+
+        RefundBatch.objects.filter(pk=batch.pk).update(
+            stats=stats,
+            status=RefundBatchStatus.COMPLETED if finished else RefundBatchStatus.PROCESSING,
+            completed_at=timezone.now() if finished else None
+        )
+        logger.info(f"Refund batch {batch.batch_uuid} run finished: {stats}")
+        return stats
+
+    def get_batch_summary(self, batch: RefundBatch) -> Dict[str, Any]:
+        """Live item counts for a batch"""
+        return {
+            'batch_uuid': batch.batch_uuid,
+            'status': batch.status,
+            'reason': batch.reason,
+            'counts': self._batch_counts(batch),
+            'stats': batch.stats,
+            'created_at': batch.created_at,
+            'completed_at': batch.completed_at,
+        }
+
+    def _release_abandoned_claims(self, batch: RefundBatch):
+        """
+        Flag items a crashed worker claimed but never finished.
+
+        Whether their gateway call went through is unknown, so they are
+        parked for manual review instead of being refunded again.
+        """
+        abandoned = RefundItem.objects.filter(
+            batch=batch,
+            status=RefundItemStatus.PROCESSING,
+            claimed_at__lt=timezone.now() - self.CLAIM_TIMEOUT
+        ).update(status=RefundItemStatus.NEEDS_REVIEW, processed_at=timezone.now())
+        if abandoned:
+            logger.warning(f"Refund batch {batch.batch_uuid}: {abandoned} abandoned items need review")
+
+    def _claim_chunk(self, batch: RefundBatch) -> List[RefundItem]:
+        """Atomically move the next pending items that are due to processing"""
+        with db_transaction.atomic():
+            items = list(
+                RefundItem.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                    Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+                    batch=batch,
+                    status=RefundItemStatus.PENDING
+                ).select_related('transaction').order_by('id')[:self.chunk_size]
+            )
+            if not items:
+                return items
+
+            now = timezone.now()
+            RefundItem.objects.filter(pk__in=[item.pk for item in items]).update(
+                status=RefundItemStatus.PROCESSING,
+                attempts=F('attempts') + 1,
+                claimed_at=now
+            )
+            for item in items:
+                item.attempts += 1
+        return items
+
+    def _call_gateway(self, item: RefundItem, reason: str, limiter: _RateLimiter) -> Dict[str, Any]:
+        """Call the transaction's gateway refund (runs on a worker thread)"""
+        transaction = item.transaction
+        gateway = self.gateways.get(transaction.gateway_id)
+        if not gateway:
+            return {
+                "status": "error",
+                "message": f"Gateway {transaction.gateway_id} not supported",
+                "error_code": "NOT_SUPPORTED"
+            }
+
+        limiter.wait()
+        try:
+            return gateway.refund_payment({
+                'authority': transaction.authority_code,
+                'ref_id': transaction.ref_id,
+                'amount': transaction.amount,
+                'currency': transaction.currency,
+                'reason': reason,
+            })
+        except Exception as e:
+            logger.error(f"Refund gateway call crashed for {transaction.transaction_uuid}: {e}", exc_info=True)
+            return {"status": "error", "message": str(e), "error_code": "REQUEST_ERROR"}
+
+    def _apply_results(self, items: List[RefundItem], responses: List[Dict[str, Any]]):
+        """Write a chunk's outcome with bulk statements"""
+        now = timezone.now()
+        succeeded = []
+        failed = []
+
+        for item, response in zip(items, responses):
+            item.gateway_response = response
+            item.processed_at = now
+            if response.get('status') == 'success':
+                item.status = RefundItemStatus.SUCCEEDED
+                succeeded.append(item)
+                continue
+
+            error_code = response.get('error_code')
+            if error_code in self.RETRYABLE_ERROR_CODES and item.attempts < self.max_attempts:
+                item.status = RefundItemStatus.PENDING
+                item.processed_at = None
+                item.next_attempt_at = now + self.retry_backoff * 2 ** (item.attempts - 1)
+            elif error_code in self.AMBIGUOUS_ERROR_CODES:
+                item.status = RefundItemStatus.NEEDS_REVIEW
+            else:
+                item.status = RefundItemStatus.FAILED
+                failed.append(item)
+
+        with db_transaction.atomic():
+            RefundItem.objects.bulk_update(items, ['status', 'gateway_response', 'processed_at', 'next_attempt_at'])
+
+            refunded = list(
+                Transaction.objects.select_for_update().filter(
+                    pk__in=[item.transaction_id for item in succeeded],
+                    is_refund=False
+                ).only(
+                    'transaction_uuid', 'order_id', 'user_id', 'amount', 'currency',
+                    'is_done', 'is_added_wallet', 'is_refund'
+                )
+            )
+            Transaction.objects.filter(
+                pk__in=[transaction.pk for transaction in refunded]
+            ).update(is_refund=True, updated_at=now)
+
+            # Take back what was already credited to the wallet
+            self.wallet_service.append_entries([
+                WalletLedgerEntry(
+                    user_id=transaction.user_id,
+                    currency=transaction.currency,
+                    amount=-transaction.amount,
+                    entry_type=WalletEntryType.REFUND,
+                    transaction=transaction,
+                    description='Payment refunded'
+                )
+                for transaction in refunded
+                if transaction.is_added_wallet
+            ])
+
+            events = [
+                TransactionEvent(
+                    transaction=transaction,
+                    old_status=transaction.status,
+                    new_status=TransactionStatus.REFUNDED,
+                    event_source=self.EVENT_SOURCE,
+                    payload={'action': 'refunded', 'amount': transaction.amount}
+                )
+                for transaction in refunded
+            ]
+            events.extend(
+                TransactionEvent(
+                    transaction=item.transaction,
+                    old_status=item.transaction.status,
+                    new_status=item.transaction.status,
+                    event_source=self.EVENT_SOURCE,
+                    payload={
+                        'action': 'refund_failed',
+                        'error_code': item.gateway_response.get('error_code'),
+                        'message': item.gateway_response.get('message'),
+                    }
+                )
+                for item in failed
+            )
+            TransactionEvent.objects.bulk_create(events)
+            self.order_summaries.refresh_later(
+                (transaction.order_id, transaction.user_id) for transaction in refunded
+            )
+
+            refunded_uuids = [str(transaction.transaction_uuid) for transaction in refunded]
+            db_transaction.on_commit(
+                lambda: redis_client.bulk_set_transaction_state(refunded_uuids, TransactionStatus.REFUNDED.value)
+            )
+
+    @staticmethod
+    def _batch_counts(batch: RefundBatch) -> Dict[str, int]:
+        counts = dict.fromkeys(RefundItemStatus.values, 0)
+        rows = RefundItem.objects.filter(batch=batch).values('status').annotate(
+            count=Count('id')
+        ).order_by()
+        for row in rows:
+            counts[row['status']] = row['count']
+        return counts
+
+    @staticmethod
+    def _throughput(processed: int, elapsed: float) -> float:
+        return round(processed / elapsed, 2) if elapsed > 0 else 0.0
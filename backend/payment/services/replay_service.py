@@ -0,0 +1,242 @@
+"""
+Event Replay Service
+Rebuilds Redis projections from the TransactionEvent log
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+from django.utils import timezone
+from payment.models import Transaction, TransactionEvent, TransactionStatus
+from payment.utils.redis_client import redis_client
+from payment.utils.process_pool import init_django_worker, call_in_worker
+from .order_summary_service import OrderSummaryService
+from .wallet_service import WalletService
+
+logger = logging.getLogger(__name__)
+
+# Event new_status -> transaction status; unknown values leave it unchanged
+EVENT_STATUSES = {
+    'created': TransactionStatus.PENDING.value,
+    'failed': TransactionStatus.FAILED.value,
+    TransactionStatus.PENDING.value: TransactionStatus.PENDING.value,
+    TransactionStatus.COMPLETED.value: TransactionStatus.COMPLETED.value,
+    TransactionStatus.COMPLETED_AND_ADDED.value: TransactionStatus.COMPLETED_AND_ADDED.value,
+    TransactionStatus.REFUNDED.value: TransactionStatus.REFUNDED.value,
+    TransactionStatus.CANCELLED.value: TransactionStatus.CANCELLED.value,
+}
+
+# Transaction status -> value stored under payment:state:*
+REDIS_STATES = {
+    TransactionStatus.PENDING.value: 'pending',
+    TransactionStatus.FAILED.value: 'failed',
+    TransactionStatus.COMPLETED.value: 'paid',
+    TransactionStatus.COMPLETED_AND_ADDED.value: 'paid',
+    TransactionStatus.REFUNDED.value: TransactionStatus.REFUNDED.value,
+    TransactionStatus.CANCELLED.value: TransactionStatus.CANCELLED.value,
+}
+
+TRANSACTION_FIELDS = [
+    'transaction_uuid', 'order_id', 'user_id', 'gateway_id', 'amount',
+    'currency', 'description', 'authority_code', 'ref_id',
+    'is_done', 'is_added_wallet', 'is_refund',
+]
+
+DRIFT_SAMPLE_SIZE = 20
+
+
+def replay_partition(transaction_uuids: List[str], rebuild_redis: bool = True) -> Dict[str, Any]:
+    """
+    Replay the events of a partition of transactions.
+
+    Runs in a worker process. Each transaction's events are folded in
+    (created_at, id) order; payload columns are never read.
+
+    Args:
+        transaction_uuids: Transactions in this partition
+        rebuild_redis: Write state and cache keys and the order payment
+            summaries of the partition's orders
+
+    Returns:
+        Dict with counters and drifted transaction UUIDs
+    """
+    rows = {
+        str(row['transaction_uuid']): row
+        for row in Transaction.objects.filter(
+            transaction_uuid__in=transaction_uuids
+        ).values(*TRANSACTION_FIELDS)
+    }
+    event_statuses = {}
+    events = TransactionEvent.objects.filter(
+        transaction_id__in=transaction_uuids
+    ).order_by('transaction_id', 'created_at', 'id').values_list('transaction_id', 'new_status')
+    event_count = 0
+    for transaction_uuid, new_status in events.iterator(chunk_size=5000):
+        event_count += 1
+        status = EVENT_STATUSES.get(new_status)
+        if status:
+            event_statuses[str(transaction_uuid)] = status
+
+    states = {}
+    cached = {}
+    drifted = []
+    for transaction_uuid, row in rows.items():
+        status = event_statuses.get(transaction_uuid, TransactionStatus.PENDING.value)
+        row_status = _row_status(row)
+        # A failed verification leaves the row pending, which is not drift
+        if status != row_status and not (
+            status == TransactionStatus.FAILED.value and row_status == TransactionStatus.PENDING.value
+        ):
+            drifted.append(transaction_uuid)
+
+        states[transaction_uuid] = REDIS_STATES[status]
+        if status == TransactionStatus.PENDING.value:
+            cached[transaction_uuid] = {
+                field: '' if row[field] is None else row[field]
+                for field in TRANSACTION_FIELDS
+            }
+
+    orders = {(row['order_id'], str(row['user_id'])) for row in rows.values()}
+    if rebuild_redis:
+        redis_client.rebuild_transaction_projections(states, cached)
+        # Summaries cover every transaction of the order, including ones in other partitions
+        OrderSummaryService().refresh_many(orders)
+
+    return {
+        'transactions': len(rows),
+        'events': event_count,
+        'orders': len(orders),
+        'drifted': drifted,
+    }
+
+
+def _row_status(row: Dict[str, Any]) -> str:
+    """Mirror Transaction.status for a values() row"""
+    if row['is_refund']:
+        return TransactionStatus.REFUNDED.value
+    if row['is_done']:
+        if row['is_added_wallet']:
+            return TransactionStatus.COMPLETED_AND_ADDED.value
+        return TransactionStatus.COMPLETED.value
+    return TransactionStatus.PENDING.value
+
+
+class EventReplayService:
+    """
+    Rebuilds payment projections from the event log.
+
+    Transactions are partitioned into chunks by primary key and replayed on
+    a pool of spawned processes, each with its own database and Redis
+    connections. Events of one transaction always land in one partition, so
+    per-transaction ordering holds without a global sort.
+
+    Projections rebuilt:
+        - Redis ``payment:state:*`` and ``payment:transaction:*`` keys
+        - Redis ``payment:order_summary:*`` order payment summaries
+        - Wallet balance snapshots (from the wallet ledger)
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workers = workers or settings.EVENT_REPLAY_WORKERS
+        self.chunk_size = chunk_size or settings.EVENT_REPLAY_CHUNK_SIZE
+
+    def run(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        rebuild_redis: bool = True,
+        rebuild_wallets: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Replay events of transactions created between two days.
+
+        Args:
+            start: First day (inclusive)
+            end: Last day (inclusive)
+            rebuild_redis: Rebuild state, cache and order summary keys
+            rebuild_wallets: Rebuild wallet balance snapshots
+
+        Returns:
+            Dict with counters, elapsed time and events per second
+        """
+        started = time.monotonic()
+        report = {'transactions': 0, 'events': 0, 'orders': 0, 'partitions': 0, 'drifted': 0}
+        drift_sample = []
+
+        def collect(result: Dict[str, Any]):
+            report['transactions'] += result['transactions']
+            report['events'] += result['events']
+            report['orders'] += result['orders']
+            report['partitions'] += 1
+            report['drifted'] += len(result['drifted'])
+            drift_sample.extend(result['drifted'][:DRIFT_SAMPLE_SIZE - len(drift_sample)])
+
+        partitions = self._iter_partitions(self._get_queryset(start, end))
+        if self.workers > 1:
+            self._run_pool(partitions, rebuild_redis, collect)
+        else:
+            for partition in partitions:
+                collect(replay_partition(partition, rebuild_redis))
+
+        if rebuild_wallets:
+            report['wallets'] = WalletService().rebuild_snapshots()
+
+        elapsed = time.monotonic() - started
+        report.update({
+            'drift_sample': drift_sample,
+            'elapsed_seconds': round(elapsed, 3),
+            'events_per_second': round(report['events'] / elapsed, 2) if elapsed > 0 else 0.0,
+        })
+        logger.info(f"Event replay finished: {report}")
+        return report
+
+    def _run_pool(self, partitions, rebuild_redis: bool, collect):
+        """Replay partitions on spawned worker processes, keeping a bounded backlog"""
+        context = multiprocessing.get_context('spawn')
+        max_in_flight = self.workers * 2
+        in_flight: List[Future] = []
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=init_django_worker
+        ) as pool:
+            for partition in partitions:
+                in_flight.append(pool.submit(
+                    call_in_worker,
+                    'payment.services.replay_service.replay_partition',
+                    partition,
+                    rebuild_redis
+                ))
+                if len(in_flight) >= max_in_flight:
+                    collect(in_flight.pop(0).result())
+            for future in in_flight:
+                collect(future.result())
+
+    @staticmethod
+    def _get_queryset(start: Optional[date], end: Optional[date]):
+        queryset = Transaction.objects.all()
+        if start:
+            queryset = queryset.filter(
+                created_at__gte=timezone.make_aware(datetime.combine(start, dt_time.min))
+            )
+        if end:
+            queryset = queryset.filter(
+                created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min))
+            )
+        return queryset
+
+    def _iter_partitions(self, queryset):
+        """Yield lists of transaction UUIDs, keyset-paginated by primary key"""
+        last = None
+        while True:
+            page = queryset.order_by('transaction_uuid')
+            if last is not None:
+                page = page.filter(transaction_uuid__gt=last)
+            uuids = [str(uuid) for uuid in page.values_list('transaction_uuid', flat=True)[:self.chunk_size]]
+            if not uuids:
+                return
+            last = uuids[-1]
+            yield uuids
@@ -4,8 +4,9 @@ Core business logic for payment transactions
 Preserves logic from app/transacion/handler.py and app/services/manager.py
 """
 import logging
+import time
 import uuid
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from django.db import transaction as db_transaction
 from django.conf import settings
 from payment.models import Transaction, TransactionEvent, GatewayType
@@ -13,6 +14,7 @@ from payment.gateways import ZarinpalGateway, StripeGateway, PayPalGateway
 from payment.utils.redis_client import redis_client
 from payment.utils.hashing import generate_idempotency_key
 from .idempotency_manager import IdempotencyManager
+from .gateway_router import GatewayRouter
 from .exceptions import PaymentException, InvalidTransactionError, GatewayError
 
 logger = logging.getLogger(__name__)
@@ -37,6 +39,7 @@ class TransactionService:
             GatewayType.STRIPE: StripeGateway(),
             GatewayType.PAYPAL: PayPalGateway(),
         }
+        self.router = GatewayRouter()
     
     def create_payment(
         self,
@@ -49,6 +52,7 @@ class TransactionService:
         callback_url: Optional[str] = None,
         idempotency_key: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        allowed_gateways: Optional[List[int]] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -65,6 +69,8 @@ class TransactionService:
             callback_url: Callback URL for gateway
             idempotency_key: Idempotency key (optional, auto-generated if not provided)
             metadata: Additional metadata
+            allowed_gateways: Gateways the merchant has enabled; when given and
+                GATEWAY_ROUTING_ENABLED is set, the gateway may be re-routed
             **kwargs: Additional gateway-specific parameters
             
         Returns:
@@ -92,12 +98,19 @@ class TransactionService:
         # Check idempotency
         IdempotencyManager.validate_and_set_idempotency(idempotency_key)
         
+        # Adaptive routing among the merchant's enabled gateways
+        routing = None
+        if settings.GATEWAY_ROUTING_ENABLED and allowed_gateways:
+            gateway_id, routing = self.router.choose(gateway_type, allowed_gateways, currency)
+            gateway_type = GatewayType(gateway_id)
+        
         # Get gateway
         gateway = self.gateways.get(gateway_type)
         if not gateway:
             raise InvalidTransactionError(f"Gateway {gateway_type} not configured")
         
         # Create payment with gateway
+        started = time.monotonic()
         gateway_response = gateway.create_payment(
             amount=amount,
             currency=currency,
@@ -106,6 +119,7 @@ class TransactionService:
             metadata=metadata or {},
             **kwargs
         )
+        self.router.record(gateway_type, (time.monotonic() - started) * 1000, gateway_response)
         
         if gateway_response.get('status') != 'success':
             raise GatewayError(
@@ -133,7 +147,7 @@ class TransactionService:
                     description=description,
                     authority_code=authority_code,
                     idempotency_key=idempotency_key,
-                    meta=metadata or {},
+                    meta={**(metadata or {}), 'routing': routing} if routing else (metadata or {}),
                     is_done=False,
                     is_added_wallet=False,
                     is_refund=False
@@ -182,7 +196,8 @@ class TransactionService:
                 return {
                     'payment_id': str(transaction_obj.transaction_uuid),
                     'redirect_url': payment_link,
-                    'authority_code': authority_code
+                    'authority_code': authority_code,
+                    'gateway': int(gateway_id)
                 }
                 
         except Exception as e:
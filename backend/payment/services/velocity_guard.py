@@ -0,0 +1,76 @@
+"""
+Velocity Guard
+Sliding-window rate limits for payment initialization
+"""
+import logging
+import math
+import time
+from typing import Optional
+from django.conf import settings
+from payment.utils.redis_client import redis_client
+from .exceptions import VelocityLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class VelocityGuard:
+    """
+    Per-user, per-IP and per-order request limits checked before any
+    gateway call or database query.
+
+    All counters are updated in a single Redis pipeline. If Redis is
+    unavailable the guard fails open so payments keep working.
+    """
+
+    def check(self, user_id: str, ip_address: Optional[str], order_id: str) -> None:
+        """
+        Count a payment initialization attempt and enforce limits.
+
+        Args:
+            user_id: User UUID
+            ip_address: Client IP address (skipped if unknown)
+            order_id: Order identifier
+
+        Raises:
+            VelocityLimitExceeded: If any limit is exceeded
+        """
+        if not settings.VELOCITY_CHECKS_ENABLED:
+            return
+
+        checks = [
+            ('user', user_id, settings.VELOCITY_USER_LIMIT, settings.VELOCITY_USER_WINDOW),
+            ('order', order_id, settings.VELOCITY_ORDER_LIMIT, settings.VELOCITY_ORDER_WINDOW),
+        ]
+        if ip_address:
+            checks.append(('ip', ip_address, settings.VELOCITY_IP_LIMIT, settings.VELOCITY_IP_WINDOW))
+
+        now = time.time()
+        counts = redis_client.hit_sliding_windows(
+            [(f"{scope}:{identifier}", window) for scope, identifier, _, window in checks],
+            now
+        )
+        if counts is None:
+            return
+
+        for (scope, identifier, limit, window), count in zip(checks, counts):
+            if count > limit:
+                # The current bucket rolls over at the next window boundary
+                retry_after = max(1, math.ceil(window - now % window))
+                logger.warning(
+                    f"Velocity limit exceeded: scope={scope} id={identifier} "
+                    f"count={count:.1f} limit={limit}/{window}s"
+                )
+                raise VelocityLimitExceeded(
+                    f"Too many payment requests for this {scope}",
+                    scope=scope,
+                    retry_after=retry_after
+                )
+
+    @staticmethod
+    def get_client_ip(request) -> Optional[str]:
+        """Client IP, honouring X-Forwarded-For only when configured"""
+        if settings.VELOCITY_TRUST_FORWARDED_FOR:
+            forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+            if forwarded_for:
+                return forwarded_for.split(',')[0].strip()
+        return request.META.get('REMOTE_ADDR')
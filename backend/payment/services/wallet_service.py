@@ -0,0 +1,277 @@
+"""
+Wallet Service
+Append-only wallet ledger with snapshot-backed, cached balances
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from payment.models import (
+    Transaction,
+    TransactionEvent,
+    TransactionStatus,
+    WalletLedgerEntry,
+    WalletBalanceSnapshot,
+    WalletEntryType,
+)
+from payment.utils.redis_client import redis_client
+from .order_summary_service import OrderSummaryService
+
+logger = logging.getLogger(__name__)
+
+
+class WalletService:
+    """
+    Service for wallet ledger writes and balance reads.
+
+    Balances are never stored on a mutable row that every payment has to
+    lock. A read is the wallet's snapshot plus the entries written after
+    it, cached in Redis and invalidated whenever the ledger is appended to.
+    """
+
+    SNAPSHOT_LOCK = 'wallet_snapshot'
+    SNAPSHOT_LOCK_TTL = 600
+
+    def append_entries(self, entries: List[WalletLedgerEntry]) -> List[WalletLedgerEntry]:
+        """
+        Append ledger entries in a single INSERT.
+
+        Entries tied to a transaction are idempotent: re-crediting the same
+        transaction is silently ignored by the unique constraint.
+
+        Args:
+            entries: Unsaved WalletLedgerEntry instances
+
+        Returns:
+            The entries passed in
+        """
+        if not entries:
+            return entries
+        WalletLedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        wallets = {(str(entry.user_id), entry.currency) for entry in entries}
+        db_transaction.on_commit(lambda: redis_client.invalidate_wallet_balances(wallets))
+        return entries
+
+    def get_balance(self, user_id: str, currency: str = 'IRR') -> int:
+        """
+        Get a wallet balance.
+
+        Args:
+            user_id: Wallet owner UUID
+            currency: Currency code
+
+        Returns:
+            int: Balance in smallest currency unit
+        """
+        user_id = str(user_id)
+        cached, version = redis_client.get_wallet_balance(user_id, currency)
+        if cached is not None:
+            return cached
+
+        balance = self.compute_balance(user_id, currency)
+        # Skipped if an append committed while computing (version changed)
+        if version is not None:
+            redis_client.set_wallet_balance(
+                user_id, currency, balance, settings.WALLET_BALANCE_CACHE_TTL, version
+            )
+        return balance
+
+    def compute_balance(self, user_id: str, currency: str = 'IRR') -> int:
+        """Snapshot balance plus the tail of entries written after it"""
+        snapshot = WalletBalanceSnapshot.objects.filter(
+            user_id=user_id,
+            currency=currency
+        ).values('balance', 'last_entry_id').first()
+        base = snapshot['balance'] if snapshot else 0
+        last_entry_id = snapshot['last_entry_id'] if snapshot else 0
+
+        tail = WalletLedgerEntry.objects.filter(
+            user_id=user_id,
+            currency=currency,
+            id__gt=last_entry_id
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        return base + tail
+
+    def credit_completed_transactions(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Credit completed, uncredited transactions to their owners' wallets.
+
+        Each batch is locked with SKIP LOCKED so concurrent workers split the
+        backlog, then written with one ledger INSERT, one UPDATE of
+        is_added_wallet and one INSERT of audit events.
+
+        Args:
+            batch_size: Transactions per batch
+
+        Returns:
+            Dict with credited transaction and batch counts
+        """
+        batch_size = batch_size or settings.WALLET_CREDIT_BATCH_SIZE
+        credited = 0
+        batches = 0
+
+        while True:
+            with db_transaction.atomic():
+                batch = list(
+                    Transaction.objects.select_for_update(skip_locked=True).filter(
+                        is_done=True,
+                        is_added_wallet=False,
+                        is_refund=False,
+                    ).order_by('created_at').only(
+                        'transaction_uuid', 'order_id', 'user_id', 'amount', 'currency',
+                        'is_done', 'is_added_wallet', 'is_refund'
+                    )[:batch_size]
+                )
+                if not batch:
+                    break
+
+                self.append_entries([
+                    WalletLedgerEntry(
+                        user_id=transaction.user_id,
+                        currency=transaction.currency,
+                        amount=transaction.amount,
+                        entry_type=WalletEntryType.CREDIT,
+                        transaction=transaction,
+                        description='Payment credited to wallet'
+                    )
+                    for transaction in batch
+                ])
+
+                Transaction.objects.filter(
+                    pk__in=[transaction.pk for transaction in batch]
+                ).update(is_added_wallet=True, updated_at=timezone.now())
+
+                TransactionEvent.objects.bulk_create([
+                    TransactionEvent(
+                        transaction=transaction,
+                        old_status=TransactionStatus.COMPLETED,
+                        new_status=TransactionStatus.COMPLETED_AND_ADDED,
+                        event_source='wallet',
+                        payload={'action': 'wallet_credited', 'amount': transaction.amount}
+                    )
+                    for transaction in batch
+                ])
+                OrderSummaryService().refresh_later(
+                    (transaction.order_id, transaction.user_id) for transaction in batch
+                )
+
+            credited += len(batch)
+            batches += 1
+            logger.info(f"Wallet credit batch {batches}: {len(batch)} transactions")
+
+        return {'credited': credited, 'batches': batches}
+
+    def take_snapshots(self) -> Dict[str, int]:
+        """
+        Fold settled ledger entries into wallet snapshots.
+
+        Only entries older than WALLET_SNAPSHOT_LAG_SECONDS are folded so
+        that ids allocated by still-open transactions are not skipped.
+
+        Returns:
+            Dict with the number of wallets updated and the new watermark
+        """
+        token = redis_client.acquire_lock(self.SNAPSHOT_LOCK, self.SNAPSHOT_LOCK_TTL)
+        if token is None:
+            logger.warning("Wallet snapshot already running, skipping")
+            return {'wallets': 0, 'watermark': None}
+        try:
+            return self._take_snapshots()
+        finally:
+            redis_client.release_lock(self.SNAPSHOT_LOCK, token)
+
+    def rebuild_snapshots(self) -> Dict[str, int]:
+        """
+        Recompute every wallet snapshot from the full ledger.
+
+        Used to repair drifted snapshots; cached balances of all rebuilt
+        wallets are dropped.
+
+        Returns:
+            Dict with the number of wallets rebuilt and the new watermark
+        """
+        token = redis_client.acquire_lock(self.SNAPSHOT_LOCK, self.SNAPSHOT_LOCK_TTL)
+        if token is None:
+            logger.warning("Wallet snapshot already running, skipping rebuild")
+            return {'wallets': 0, 'watermark': None}
+        try:
+            settled_before = timezone.now() - timedelta(seconds=settings.WALLET_SNAPSHOT_LAG_SECONDS)
+            upper = WalletLedgerEntry.objects.filter(
+                created_at__lt=settled_before
+            ).aggregate(upper=Max('id'))['upper'] or 0
+
+            totals = WalletLedgerEntry.objects.filter(
+                id__lte=upper
+            ).values('user_id', 'currency').annotate(balance=Sum('amount')).order_by()
+
+            now = timezone.now()
+            snapshots = [
+                WalletBalanceSnapshot(
+                    user_id=row['user_id'],
+                    currency=row['currency'],
+                    balance=row['balance'],
+                    last_entry_id=upper,
+                    updated_at=now
+                )
+                for row in totals
+            ]
+            with db_transaction.atomic():
+                WalletBalanceSnapshot.objects.all().delete()
+                WalletBalanceSnapshot.objects.bulk_create(snapshots)
+
+            redis_client.invalidate_wallet_balances(
+                (str(snapshot.user_id), snapshot.currency) for snapshot in snapshots
+            )
+            logger.info(f"Wallet snapshots rebuilt: {len(snapshots)} wallets up to entry {upper}")
+            return {'wallets': len(snapshots), 'watermark': upper}
+        finally:
+            redis_client.release_lock(self.SNAPSHOT_LOCK, token)
+
+    def _take_snapshots(self) -> Dict[str, int]:
+        watermark = WalletBalanceSnapshot.objects.aggregate(
+            watermark=Max('last_entry_id')
+        )['watermark'] or 0
+        settled_before = timezone.now() - timedelta(seconds=settings.WALLET_SNAPSHOT_LAG_SECONDS)
+
+        upper = WalletLedgerEntry.objects.filter(
+            id__gt=watermark,
+            created_at__lt=settled_before
+        ).aggregate(upper=Max('id'))['upper']
+        if not upper:
+            return {'wallets': 0, 'watermark': watermark}
+
+        deltas = WalletLedgerEntry.objects.filter(
+            id__gt=watermark,
+            id__lte=upper
+        ).values('user_id', 'currency').annotate(delta=Sum('amount')).order_by()
+
+        with db_transaction.atomic():
+            existing = {
+                (snapshot.user_id, snapshot.currency): snapshot
+                for snapshot in WalletBalanceSnapshot.objects.select_for_update().filter(
+                    user_id__in={row['user_id'] for row in deltas}
+                )
+            }
+            snapshots = []
+            for row in deltas:
+                snapshot = existing.get((row['user_id'], row['currency']))
+                balance = (snapshot.balance if snapshot else 0) + row['delta']
+                snapshots.append(WalletBalanceSnapshot(
+                    user_id=row['user_id'],
+                    currency=row['currency'],
+                    balance=balance,
+                    last_entry_id=upper,
+                    updated_at=timezone.now()
+                ))
+            WalletBalanceSnapshot.objects.bulk_create(
+                snapshots,
+                update_conflicts=True,
+                unique_fields=['user_id', 'currency'],
+                update_fields=['balance', 'last_entry_id', 'updated_at']
+            )
+
+        logger.info(f"Wallet snapshots updated: {len(snapshots)} wallets up to entry {upper}")
+        return {'wallets': len(snapshots), 'watermark': upper}
@@ -1,5 +1,20 @@
 """
 Django signals for payment app
 """
-# Placeholder for future signal handlers if needed
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from payment.models import TransactionEvent
 
+
+@receiver(post_save, sender=TransactionEvent)
+def refresh_order_summary(sender, instance, created, **kwargs):
+    """
+    Keep the order payment summary in step with the event log.
+    Bulk inserts skip signals and refresh summaries explicitly.
+    """
+    if not created:
+        return
+    from payment.services.order_summary_service import OrderSummaryService
+
+    transaction = instance.transaction
+    OrderSummaryService().refresh_later([(transaction.order_id, transaction.user_id)])
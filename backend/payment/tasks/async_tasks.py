@@ -84,3 +84,72 @@ def cleanup_expired_transactions():
     
     return {'cleaned': count}
 
+
+
+@shared_task
+def reconcile_pending_transactions(max_batches: int = None):
+    """
+    Periodic task to re-verify pending transactions whose callback never arrived.
+    Resumes from the last checkpoint if a previous run was interrupted.
+    Should be run every few minutes via Celery beat.
+    """
+    from payment.services.reconciliation_service import ReconciliationService
+    
+    return ReconciliationService().run(max_batches=max_batches)
+
+
+@shared_task
+def credit_completed_transactions():
+    """
+    Periodic task to credit completed transactions to user wallets.
+    Should be run every minute via Celery beat.
+    """
+    from payment.services.wallet_service import WalletService
+    
+    return WalletService().credit_completed_transactions()
+
+
+@shared_task
+def snapshot_wallet_balances():
+    """
+    Periodic task to fold settled ledger entries into balance snapshots.
+    Keeps balance reads to a snapshot plus a short tail of entries.
+    Should be run every few minutes via Celery beat.
+    """
+    from payment.services.wallet_service import WalletService
+    
+    return WalletService().take_snapshots()
+
+
+@shared_task(acks_late=True)
+def process_refund_batch(batch_uuid: str, max_chunks: int = None):
+    """
+    Task to refund a batch of transactions through their gateways.
+    Safe to re-run: only pending items are processed.
+    
+    Args:
+        batch_uuid: Refund batch UUID
+        max_chunks: Optional cap on chunks processed by this run
+    """
+    from payment.services.refund_service import RefundService
+    
+    return RefundService().process_batch(batch_uuid, max_chunks=max_chunks)
+
+
+@shared_task
+def resume_refund_batches():
+    """
+    Periodic task to re-enqueue refund batches left unfinished by a crash.
+    Should be run every few minutes via Celery beat.
+    """
+    from payment.models import RefundBatch, RefundBatchStatus
+    
+    batch_uuids = list(
+        RefundBatch.objects.exclude(
+            status=RefundBatchStatus.COMPLETED
+        ).values_list('batch_uuid', flat=True)
+    )
+    for batch_uuid in batch_uuids:
+        process_refund_batch.delay(str(batch_uuid))
+    
+    return {'resumed': len(batch_uuids)}
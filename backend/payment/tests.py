@@ -0,0 +1,305 @@
+import json
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+import redis
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payment.gateways import ZarinpalGateway
+from urllib3.exceptions import NewConnectionError
+
+from payment.models import GatewayType, RefundItem, RefundItemStatus, Transaction, TransactionEvent
+from payment.services.reconciliation_service import ReconciliationService
+from payment.services.refund_service import RefundService
+from payment.services.replay_service import EventReplayService
+from payment.tasks.async_tasks import verify_payment_async
+from payment.utils.redis_client import redis_client
+
+
+class UnavailableRedis:
+    """Redis connection that fails immediately; payment Redis helpers fail open"""
+
+    def __getattr__(self, name):
+        raise redis.ConnectionError('Redis is not available in tests')
+
+
+class TransactionExportTests(TestCase):
+    """Settlement export is reachable in both formats through export_format"""
+
+    url = '/api/v1/payments/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create(username='payment-admin', is_staff=True)
+        cls.transaction = Transaction.objects.create(
+            order_id='order-1',
+            user_id=uuid.uuid4(),
+            gateway_id=GatewayType.ZARINPAL,
+            amount=10000,
+            description='export',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, export_format):
+        response = self.client.get(self.url, {'export_format': export_format})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, row = body.splitlines()
+        self.assertTrue(header.startswith('transaction_uuid,'))
+        self.assertIn(str(self.transaction.transaction_uuid), row)
+
+    def test_jsonl_export(self):
+        response, body = self.export('jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], ['order-1'])
+
+
+class ReconciliationSweepTests(TestCase):
+    """A transaction the gateway reports as failed is verified only once"""
+
+    def setUp(self):
+        patcher = mock.patch.object(redis_client, 'redis_client', UnavailableRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transaction = Transaction.objects.create(
+            order_id='order-2',
+            user_id=uuid.uuid4(),
+            gateway_id=GatewayType.ZARINPAL,
+            amount=10000,
+            description='abandoned',
+            authority_code='A0000000000000000000000000000000001',
+        )
+        Transaction.objects.filter(pk=self.transaction.pk).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+
+    @mock.patch.object(ZarinpalGateway, 'verify_payment', return_value={
+        'status': 'error',
+        'message': 'Payment was not successful',
+        'error_code': -51,
+    })
+    def test_permanent_failure_is_not_reverified(self, verify_payment):
+        first = ReconciliationService(concurrency=1).run(reset=True)
+        second = ReconciliationService(concurrency=1).run(reset=True)
+
+        self.assertEqual((first['processed'], first['failed']), (1, 1))
+        self.assertEqual(second['processed'], 0)
+        self.assertEqual(verify_payment.call_count, 1)
+        self.assertEqual(
+            TransactionEvent.objects.filter(transaction=self.transaction, new_status='failed').count(),
+            1
+        )
+        self.transaction.refresh_from_db()
+        self.assertFalse(self.transaction.is_done)
+
+
+class WalletBalanceAccessTests(TestCase):
+    """Wallet balances are readable only by staff"""
+
+    def setUp(self):
+        patcher = mock.patch.object(redis_client, 'redis_client', UnavailableRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = f'/api/v1/wallets/{uuid.uuid4()}/balance/'
+        self.client = APIClient()
+
+    def test_anonymous_and_regular_users_are_denied(self):
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+
+        self.client.force_authenticate(get_user_model().objects.create(username='customer'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_staff_is_allowed(self):
+        self.client.force_authenticate(get_user_model().objects.create(username='staff', is_staff=True))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], 0)
+
+
+class ZarinpalCallbackTests(TestCase):
+    """Browser callbacks redirect at once and do not repeat side effects"""
+
+    url = '/api/v1/payments/zarinpal/callback/'
+    authority = 'A0000000000000000000000000000000002'
+
+    def setUp(self):
+        self.transaction = Transaction.objects.create(
+            order_id='order-3',
+            user_id=uuid.uuid4(),
+            gateway_id=GatewayType.ZARINPAL,
+            amount=10000,
+            description='callback',
+            authority_code=self.authority,
+        )
+
+    def test_cancelled_callback_is_logged_once(self):
+        for _ in range(3):
+            response = self.client.get(self.url, {'Authority': self.authority, 'Status': 'NOK'})
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('status=failed', response['Location'])
+        self.assertEqual(TransactionEvent.objects.filter(transaction=self.transaction).count(), 1)
+
+    @mock.patch.object(verify_payment_async, 'apply_async', side_effect=ConnectionError('broker down'))
+    def test_broker_failure_still_redirects(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.url, {'Authority': self.authority, 'Status': 'OK'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('status=processing', response['Location'])
+        apply_async.assert_called_once()
+
+
+class OrderPaymentSummaryAccessTests(TestCase):
+    """Order payment summaries are readable only by staff"""
+
+    def setUp(self):
+        patcher = mock.patch.object(redis_client, 'redis_client', UnavailableRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = '/api/v1/orders/order-4/payments/summary/'
+        self.query = {'user_id': uuid.uuid4()}
+        self.client = APIClient()
+
+    def test_anonymous_and_regular_users_are_denied(self):
+        self.assertIn(self.client.get(self.url, self.query).status_code, (401, 403))
+
+        self.client.force_authenticate(get_user_model().objects.create(username='payer'))
+        self.assertEqual(self.client.get(self.url, self.query).status_code, 403)
+
+    def test_staff_is_allowed(self):
+        self.client.force_authenticate(get_user_model().objects.create(username='staff', is_staff=True))
+        response = self.client.get(self.url, self.query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['attempts'], 0)
+
+
+class ZarinpalRefundErrorTests(TestCase):
+    """Only failures that prove the refund request was never sent are retryable"""
+
+    def refund_error(self, **post):
+        with mock.patch('payment.gateways.zarinpal_gateway.requests.post', **post):
+            response = ZarinpalGateway().refund_payment({'authority': 'A1', 'amount': 10000})
+        self.assertEqual(response['status'], 'error')
+        return response['error_code']
+
+    def http_response(self, status_code, body=b'{}'):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = body
+        return response
+
+    def test_connect_failures_are_retryable(self):
+        refused = requests.ConnectionError(mock.Mock(reason=NewConnectionError(None, 'refused')))
+        for error in (requests.ConnectTimeout(), refused):
+            self.assertIn(self.refund_error(side_effect=error), RefundService.RETRYABLE_ERROR_CODES)
+        self.assertIn(
+            self.refund_error(return_value=self.http_response(429)), RefundService.RETRYABLE_ERROR_CODES
+        )
+
+    def test_failures_after_sending_are_ambiguous(self):
+        errors = [
+            {'side_effect': requests.ReadTimeout()},
+            {'side_effect': requests.ConnectionError('Connection reset by peer')},
+            {'return_value': self.http_response(502)},
+            {'return_value': self.http_response(200, b'<html>')},
+            {'return_value': self.http_response(200, b'{"unexpected": true}')},
+        ]
+        for post in errors:
+            self.assertIn(self.refund_error(**post), RefundService.AMBIGUOUS_ERROR_CODES, post)
+
+
+class RefundBatchTests(TestCase):
+    """Refund items whose gateway outcome is unknown are never sent again"""
+
+    def setUp(self):
+        patcher = mock.patch.object(redis_client, 'redis_client', UnavailableRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transaction = Transaction.objects.create(
+            order_id='order-5',
+            user_id=uuid.uuid4(),
+            gateway_id=GatewayType.ZARINPAL,
+            amount=10000,
+            description='refund',
+            authority_code='A0000000000000000000000000000000005',
+            is_done=True,
+        )
+        self.service = RefundService(concurrency=1, rate_limit=0)
+
+    def run_batch(self, **refund):
+        batch, _ = self.service.create_batch([self.transaction.transaction_uuid])
+        with mock.patch.object(ZarinpalGateway, 'refund_payment', **refund) as refund_payment:
+            self.service.process_batch(batch.batch_uuid)
+        return RefundItem.objects.get(batch=batch), refund_payment
+
+    def test_ambiguous_error_needs_review_and_blocks_new_batches(self):
+        item, refund_payment = self.run_batch(return_value={
+            'status': 'error', 'message': '502 Server Error', 'error_code': 'REQUEST_ERROR',
+        })
+        self.assertEqual(item.status, RefundItemStatus.NEEDS_REVIEW)
+        self.assertEqual(refund_payment.call_count, 1)
+
+        _, rejected = self.service.create_batch([self.transaction.transaction_uuid])
+        self.assertEqual(rejected, [str(self.transaction.transaction_uuid)])
+
+    def test_gateway_client_crash_needs_review(self):
+        item, refund_payment = self.run_batch(side_effect=ValueError('bad payload'))
+        self.assertEqual(item.status, RefundItemStatus.NEEDS_REVIEW)
+        self.assertEqual(refund_payment.call_count, 1)
+
+    def test_refusal_fails_without_retry(self):
+        item, refund_payment = self.run_batch(return_value={
+            'status': 'error', 'message': 'Refund not allowed', 'error_code': -9,
+        })
+        self.assertEqual(item.status, RefundItemStatus.FAILED)
+        self.assertEqual(refund_payment.call_count, 1)
+
+    def test_rate_limited_item_waits_for_backoff(self):
+        item, refund_payment = self.run_batch(return_value={
+            'status': 'error', 'message': 'Rate limited by gateway', 'error_code': 'RATE_LIMITED',
+        })
+        self.assertEqual((item.status, item.attempts, refund_payment.call_count), (RefundItemStatus.PENDING, 1, 1))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+
+        success = {'status': 'success', 'data': {}, 'message': 'Refund registered'}
+        with mock.patch.object(ZarinpalGateway, 'refund_payment', return_value=success) as refund_payment:
+            self.service.process_batch(item.batch_id)
+            self.assertEqual(refund_payment.call_count, 0)
+
+            RefundItem.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+            self.service.process_batch(item.batch_id)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts, refund_payment.call_count), (RefundItemStatus.SUCCEEDED, 2, 1))
+
+
+class EventReplayTests(TestCase):
+    """Replay rebuilds the order payment summaries of the replayed transactions"""
+
+    def test_replay_refreshes_order_summaries(self):
+        user_id = uuid.uuid4()
+        for amount, is_done in ((10000, False), (20000, True)):
+            Transaction.objects.create(
+                order_id='order-6', user_id=user_id, gateway_id=GatewayType.ZARINPAL,
+                amount=amount, description='replay', is_done=is_done,
+            )
+        with mock.patch.object(redis_client, 'rebuild_transaction_projections'), \
+                mock.patch.object(redis_client, 'set_order_summaries') as set_order_summaries:
+            report = EventReplayService(workers=1).run(rebuild_wallets=False)
+
+        self.assertEqual(report['orders'], 1)
+        summaries, _ = set_order_summaries.call_args.args
+        self.assertEqual(list(summaries), [('order-6', str(user_id))])
+        self.assertEqual(summaries[('order-6', str(user_id))]['attempts'], 2)
+
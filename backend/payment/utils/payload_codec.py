@@ -0,0 +1,85 @@
+"""
+Compact storage encoding for TransactionEvent payloads
+"""
+import json
+import zlib
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def compact_payload(value: Any) -> Any:
+    """Recursively drop None values and empty containers"""
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = compact_payload(item)
+            if item is None or item == {} or item == []:
+                continue
+            compacted[key] = item
+        return compacted
+    if isinstance(value, (list, tuple)):
+        return [compact_payload(item) for item in value]
+    return value
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(
+        value,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+
+def encode_payload(value: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """
+    Encode a payload for storage.
+
+    Payloads are compacted first. Payloads larger than
+    EVENT_PAYLOAD_MAX_BYTES keep only their top-level scalar fields; those
+    larger than EVENT_PAYLOAD_COMPRESS_THRESHOLD are zlib-compressed into
+    the blob column, leaving only ``action`` in the JSON column.
+
+    Args:
+        value: Payload dict
+
+    Returns:
+        Tuple of (JSON column value, compressed blob or None)
+    """
+    value = compact_payload(value or {})
+    raw = _dumps(value)
+
+    if len(raw) > settings.EVENT_PAYLOAD_MAX_BYTES:
+        value = {
+            key: item for key, item in value.items()
+            if not isinstance(item, (dict, list))
+        }
+        value['truncated_bytes'] = len(raw)
+        raw = _dumps(value)
+
+    if len(raw) < settings.EVENT_PAYLOAD_COMPRESS_THRESHOLD:
+        return value, None
+
+    blob = zlib.compress(raw, settings.EVENT_PAYLOAD_COMPRESSION_LEVEL)
+    if len(blob) >= len(raw):
+        return value, None
+
+    stub = {'action': value['action']} if 'action' in value else {}
+    return stub, blob
+
+
+def decode_payload(json_value: Optional[Dict[str, Any]], blob: Optional[bytes]) -> Dict[str, Any]:
+    """
+    Decode a stored payload.
+
+    Args:
+        json_value: JSON column value
+        blob: Compressed blob column value
+
+    Returns:
+        Payload dict
+    """
+    if blob is None:
+        return json_value if json_value is not None else {}
+    return json.loads(zlib.decompress(bytes(blob)).decode('utf-8'))
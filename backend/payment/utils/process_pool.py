@@ -0,0 +1,21 @@
+"""
+Helpers for running Django code on spawned worker processes
+"""
+from importlib import import_module
+
+
+def init_django_worker():
+    """Process pool initializer: set up Django in a fresh interpreter"""
+    import django
+    django.setup()
+
+
+def call_in_worker(func_path: str, *args, **kwargs):
+    """
+    Call a function by dotted path inside a worker process.
+
+    Workers are spawned before Django is set up, so anything that imports
+    models must be referenced by path rather than pickled directly.
+    """
+    module_path, name = func_path.rsplit('.', 1)
+    return getattr(import_module(module_path), name)(*args, **kwargs)
@@ -3,13 +3,30 @@ Redis Client Utility for Payment State Management
 """
 import json
 import logging
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from django.core.cache import cache
 import redis
 
 logger = logging.getLogger(__name__)
 
+# Delete a lock only if it is still held by the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Cache a wallet balance only if no invalidation happened since it was read
+SET_IF_VERSION_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '0') == ARGV[1] then
+    return redis.call('setex', KEYS[1], ARGV[2], ARGV[3])
+end
+return 0
+"""
+
 
 class RedisClient:
     """
@@ -116,6 +133,35 @@ class RedisClient:
             logger.error(f"Failed to set transaction state {transaction_uuid}: {e}")
             return False
     
+    def bulk_set_transaction_state(self, transaction_uuids, state: str, ttl: int = None) -> bool:
+        """
+        Set the state of many transactions and drop their cached data
+        in a single pipeline round trip.
+
+        Args:
+            transaction_uuids: Iterable of transaction UUIDs
+            state: State value
+            ttl: Time to live in seconds (default: transaction_ttl)
+
+        Returns:
+            bool: True if set successfully
+        """
+        transaction_uuids = list(transaction_uuids)
+        if not transaction_uuids:
+            return True
+        try:
+            ttl = ttl or self.transaction_ttl
+            pipe = self.redis_client.pipeline(transaction=False)
+            for transaction_uuid in transaction_uuids:
+                pipe.setex(f"payment:state:{transaction_uuid}", ttl, state)
+                pipe.delete(f"payment:transaction:{transaction_uuid}")
+            pipe.execute()
+            logger.debug(f"Transaction state set for {len(transaction_uuids)} transactions -> {state}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to bulk set transaction state: {e}")
+            return False
+
     def get_transaction_state(self, transaction_uuid: str) -> Optional[str]:
         """
         Get transaction state from Redis.
@@ -175,6 +221,405 @@ class RedisClient:
             logger.error(f"Failed to set idempotency key: {e}")
             return False
     
+    def hit_sliding_windows(self, counters, now: float) -> Optional[List[float]]:
+        """
+        Count a hit on several sliding-window counters in one round trip.
+
+        Each counter keeps two fixed buckets (current and previous window);
+        the sliding count is the current bucket plus the previous one
+        weighted by how much of it still overlaps the window.
+
+        Args:
+            counters: Iterable of (name, window_seconds) pairs
+            now: Current UNIX time
+
+        Returns:
+            Optional[List[float]]: Sliding counts including this hit, in the
+            order given, or None if Redis is unavailable
+        """
+        counters = list(counters)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            weights = []
+            for name, window in counters:
+                bucket = int(now // window)
+                current_key = f"payment:velocity:{name}:{bucket}"
+                pipe.incr(current_key)
+                pipe.expire(current_key, window * 2)
+                pipe.get(f"payment:velocity:{name}:{bucket - 1}")
+                weights.append(1 - (now % window) / window)
+            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to update velocity counters: {e}")
+            return None
+
+        counts = []
+        for index, weight in enumerate(weights):
+            current, _, previous = results[index * 3:index * 3 + 3]
+            counts.append(int(current) + int(previous or 0) * weight)
+        return counts
+
+    def acquire_lock(self, name: str, ttl: int) -> Optional[str]:
+        """
+        Try to acquire a short-lease lock.
+        
+        Fails open: if Redis is unreachable a token is still returned so
+        callers keep working without mutual exclusion.
+        
+        Args:
+            name: Lock name
+            ttl: Lease in seconds
+            
+        Returns:
+            Optional[str]: Lock token if acquired, None if held by someone else
+        """
+        token = uuid.uuid4().hex
+        try:
+            lock_key = f"payment:lock:{name}"
+            if self.redis_client.set(lock_key, token, nx=True, ex=ttl):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Failed to acquire lock {name}: {e}")
+            return token
+    
+    def release_lock(self, name: str, token: str) -> bool:
+        """
+        Release a lock if it is still held by the given token.
+        
+        Args:
+            name: Lock name
+            token: Token returned by acquire_lock
+            
+        Returns:
+            bool: True if the lock was released
+        """
+        try:
+            lock_key = f"payment:lock:{name}"
+            return bool(self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token))
+        except Exception as e:
+            logger.error(f"Failed to release lock {name}: {e}")
+            return False
+    
+    def is_locked(self, name: str) -> bool:
+        """
+        Check whether a lock is currently held.
+        
+        Args:
+            name: Lock name
+            
+        Returns:
+            bool: True if the lock exists
+        """
+        try:
+            return bool(self.redis_client.exists(f"payment:lock:{name}"))
+        except Exception as e:
+            logger.error(f"Failed to check lock {name}: {e}")
+            return False
+    
+    def set_verification_result(self, transaction_uuid: str, result: Dict[str, Any], ttl: int) -> bool:
+        """
+        Publish a verification outcome for concurrent callers to reuse.
+        
+        Args:
+            transaction_uuid: Transaction UUID
+            result: JSON-serializable verification outcome
+            ttl: Time to live in seconds
+            
+        Returns:
+            bool: True if set successfully
+        """
+        try:
+            result_key = f"payment:verify_result:{transaction_uuid}"
+            self.redis_client.setex(result_key, ttl, json.dumps(result))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set verification result {transaction_uuid}: {e}")
+            return False
+    
+    def get_verification_result(self, transaction_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a published verification outcome.
+        
+        Args:
+            transaction_uuid: Transaction UUID
+            
+        Returns:
+            Optional[Dict]: Verification outcome or None
+        """
+        try:
+            result = self.redis_client.get(f"payment:verify_result:{transaction_uuid}")
+            return json.loads(result) if result else None
+        except Exception as e:
+            logger.error(f"Failed to get verification result {transaction_uuid}: {e}")
+            return None
+    
+    def get_wallet_balance(self, user_id: str, currency: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Get a cached wallet balance and the wallet's cache version.
+        
+        The version is passed back to set_wallet_balance so a balance
+        computed before an invalidation is never cached after it.
+        
+        Args:
+            user_id: Wallet owner UUID
+            currency: Currency code
+            
+        Returns:
+            Tuple of (cached balance or None, version or None if Redis failed)
+        """
+        try:
+            balance, version = self.redis_client.mget(
+                f"payment:wallet:balance:{user_id}:{currency}",
+                f"payment:wallet:version:{user_id}:{currency}"
+            )
+            return (int(balance) if balance is not None else None), (version or '0')
+        except Exception as e:
+            logger.error(f"Failed to get cached wallet balance {user_id}: {e}")
+            return None, None
+    
+    def set_wallet_balance(self, user_id: str, currency: str, balance: int, ttl: int, version: str) -> bool:
+        """
+        Cache a wallet balance unless the wallet was invalidated after it was read.
+        
+        Args:
+            user_id: Wallet owner UUID
+            currency: Currency code
+            balance: Balance value
+            ttl: Time to live in seconds
+            version: Version returned by get_wallet_balance before computing
+            
+        Returns:
+            bool: True if cached
+        """
+        try:
+            return bool(self.redis_client.eval(
+                SET_IF_VERSION_SCRIPT,
+                2,
+                f"payment:wallet:balance:{user_id}:{currency}",
+                f"payment:wallet:version:{user_id}:{currency}",
+                version,
+                ttl,
+                balance
+            ))
+        except Exception as e:
+            logger.error(f"Failed to cache wallet balance {user_id}: {e}")
+            return False
+    
+    def invalidate_wallet_balances(self, wallets) -> bool:
+        """
+        Drop cached balances for the given wallets and bump their versions.
+        
+        Args:
+            wallets: Iterable of (user_id, currency) pairs
+            
+        Returns:
+            bool: True if removed successfully
+        """
+        wallets = list(wallets)
+        if not wallets:
+            return True
+        try:
+            pipe = self.redis_client.pipeline()
+            for user_id, currency in wallets:
+                pipe.incr(f"payment:wallet:version:{user_id}:{currency}")
+            pipe.delete(*[f"payment:wallet:balance:{user_id}:{currency}" for user_id, currency in wallets])
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to invalidate wallet balances: {e}")
+            return False
+    
+    def get_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a background job checkpoint.
+        
+        Args:
+            name: Job name
+            
+        Returns:
+            Optional[Dict]: Checkpoint data or None
+        """
+        try:
+            checkpoint = self.redis_client.get(f"payment:checkpoint:{name}")
+            return json.loads(checkpoint) if checkpoint else None
+        except Exception as e:
+            logger.error(f"Failed to get checkpoint {name}: {e}")
+            return None
+    
+    def set_checkpoint(self, name: str, data: Dict[str, Any], ttl: int = None) -> bool:
+        """
+        Save a background job checkpoint.
+        
+        Args:
+            name: Job name
+            data: JSON-serializable checkpoint data
+            ttl: Time to live in seconds (default: no expiry)
+            
+        Returns:
+            bool: True if saved successfully
+        """
+        try:
+            checkpoint_key = f"payment:checkpoint:{name}"
+            if ttl:
+                self.redis_client.setex(checkpoint_key, ttl, json.dumps(data))
+            else:
+                self.redis_client.set(checkpoint_key, json.dumps(data))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set checkpoint {name}: {e}")
+            return False
+    
+    def clear_checkpoint(self, name: str) -> bool:
+        """
+        Remove a background job checkpoint.
+        
+        Args:
+            name: Job name
+            
+        Returns:
+            bool: True if removed successfully
+        """
+        try:
+            self.redis_client.delete(f"payment:checkpoint:{name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to clear checkpoint {name}: {e}")
+            return False
+
+    def get_order_summary(self, order_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached order payment summary.
+
+        Args:
+            order_id: Order identifier
+            user_id: Order owner UUID
+
+        Returns:
+            Optional[Dict]: Summary or None on miss
+        """
+        try:
+            value = self.redis_client.get(f"payment:order_summary:{order_id}:{user_id}")
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.error(f"Failed to get order summary {order_id}: {e}")
+            return None
+
+    def set_order_summaries(self, summaries: Dict[Any, Dict[str, Any]], ttl: int) -> bool:
+        """
+        Cache order payment summaries in one pipeline.
+
+        Args:
+            summaries: (order_id, user_id) -> summary
+            ttl: Time to live in seconds
+
+        Returns:
+            bool: True if cached successfully
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for (order_id, user_id), summary in summaries.items():
+                pipe.setex(f"payment:order_summary:{order_id}:{user_id}", ttl, json.dumps(summary))
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to cache order summaries: {e}")
+            return False
+
+    def record_gateway_call(self, gateway_id: int, fields: Dict[str, int], now: float, ttl: int) -> bool:
+        """
+        Add a gateway call to the per-minute statistics bucket.
+
+        Args:
+            gateway_id: Gateway type ID
+            fields: Hash fields to increment (e.g. calls, errors, latency buckets)
+            now: Current UNIX time
+            ttl: Bucket lifetime in seconds
+
+        Returns:
+            bool: True if recorded successfully
+        """
+        try:
+            stats_key = f"payment:gateway_stats:{gateway_id}:{int(now // 60)}"
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, amount in fields.items():
+                pipe.hincrby(stats_key, field, amount)
+            pipe.expire(stats_key, ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to record gateway call for {gateway_id}: {e}")
+            return False
+
+    def get_gateway_stats(self, gateway_ids, minutes: int, now: float) -> Optional[Dict[int, Dict[str, int]]]:
+        """
+        Sum the per-minute statistics buckets of several gateways.
+
+        Args:
+            gateway_ids: Gateway type IDs
+            minutes: Number of most recent minute buckets
+            now: Current UNIX time
+
+        Returns:
+            Optional[Dict]: Gateway ID -> summed fields, or None if Redis is unavailable
+        """
+        gateway_ids = list(gateway_ids)
+        current = int(now // 60)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for gateway_id in gateway_ids:
+                for minute in range(current - minutes + 1, current + 1):
+                    pipe.hgetall(f"payment:gateway_stats:{gateway_id}:{minute}")
+            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to get gateway stats: {e}")
+            return None
+
+        stats = {}
+        for index, gateway_id in enumerate(gateway_ids):
+            totals = {}
+            for bucket in results[index * minutes:(index + 1) * minutes]:
+                for field, value in bucket.items():
+                    totals[field] = totals.get(field, 0) + int(value)
+            stats[gateway_id] = totals
+        return stats
+
+    def rebuild_transaction_projections(
+        self,
+        states: Dict[str, str],
+        cached: Dict[str, Dict[str, Any]]
+    ) -> bool:
+        """
+        Overwrite transaction state keys and cached data in one pipeline.
+
+        Transactions in ``states`` but not in ``cached`` have their cached
+        data dropped.
+
+        Args:
+            states: Transaction UUID -> state value
+            cached: Transaction UUID -> transaction data to cache
+
+        Returns:
+            bool: True if written successfully
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for transaction_uuid, state in states.items():
+                pipe.setex(f"payment:state:{transaction_uuid}", self.transaction_ttl, state)
+                cache_key = f"payment:transaction:{transaction_uuid}"
+                pipe.delete(cache_key)
+                if transaction_uuid in cached:
+                    pipe.hset(cache_key, mapping={
+                        k: str(v) if not isinstance(v, str) else v
+                        for k, v in cached[transaction_uuid].items()
+                    })
+                    pipe.expire(cache_key, self.transaction_ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to rebuild transaction projections: {e}")
+            return False
+
     def ping(self) -> bool:
         """Test Redis connection"""
         try:
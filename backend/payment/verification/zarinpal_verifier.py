@@ -3,7 +3,9 @@ Zarinpal Verification Handler
 Preserves logic from app/verification/hamdler.py and app/verification/zarinpal_verifier.py
 """
 import logging
+import time
 from typing import Dict, Any
+from django.conf import settings
 from django.db import transaction as db_transaction
 from payment.models import Transaction, TransactionEvent
 from payment.gateways import ZarinpalGateway
@@ -18,14 +20,82 @@ logger = logging.getLogger(__name__)
 class ZarinpalVerifier(BaseVerifier):
     """Zarinpal payment verification handler"""
     
+    # Interval between checks while waiting for a concurrent verification
+    WAIT_INTERVAL = 0.05
+    
+    # Failures are shared only briefly so a later callback can retry
+    ERROR_RESULT_TTL = 5
+    
     def __init__(self):
         self.gateway = ZarinpalGateway()
     
+    @staticmethod
+    def lock_name(transaction_uuid: str) -> str:
+        """Name of the per-transaction verification lock"""
+        return f"verify:{transaction_uuid}"
+    
     def verify(
         self,
         transaction_uuid: str,
         callback_data: Dict[str, Any],
         idempotency_key: str = None
+    ) -> Dict[str, Any]:
+        """
+        Verify Zarinpal payment transaction (single-flight).
+        
+        Concurrent callbacks for the same transaction share one gateway
+        round trip: the first caller takes a short-lease Redis lock and
+        publishes its outcome, later callers wait for and reuse it.
+        """
+        transaction_uuid = str(transaction_uuid)
+        lock_name = self.lock_name(transaction_uuid)
+        deadline = time.monotonic() + settings.VERIFICATION_LOCK_TTL
+        
+        while True:
+            shared = redis_client.get_verification_result(transaction_uuid)
+            if shared:
+                return self._reuse_result(shared)
+            
+            token = redis_client.acquire_lock(lock_name, settings.VERIFICATION_LOCK_TTL)
+            if token:
+                break
+            
+            if time.monotonic() >= deadline:
+                raise VerificationError(f"Verification already in progress: {transaction_uuid}")
+            time.sleep(self.WAIT_INTERVAL)
+        
+        # Publish the outcome before releasing the lock so waiters never
+        # see a free lock without a result and start a second round trip.
+        try:
+            result = self._verify(transaction_uuid, callback_data, idempotency_key=idempotency_key)
+            redis_client.set_verification_result(
+                transaction_uuid,
+                result,
+                settings.VERIFICATION_RESULT_TTL
+            )
+            return result
+        except VerificationError as e:
+            redis_client.set_verification_result(
+                transaction_uuid,
+                {'error': str(e)},
+                self.ERROR_RESULT_TTL
+            )
+            raise
+        finally:
+            redis_client.release_lock(lock_name, token)
+    
+    @staticmethod
+    def _reuse_result(shared: Dict[str, Any]) -> Dict[str, Any]:
+        """Return (or re-raise) an outcome published by a concurrent caller"""
+        if 'error' in shared:
+            raise VerificationError(shared['error'])
+        return shared
+    
+    def _verify(
+        self,
+        transaction_uuid: str,
+        callback_data: Dict[str, Any],
+        idempotency_key: str = None
     ) -> Dict[str, Any]:
         """
         Verify Zarinpal payment transaction.
@@ -63,76 +133,123 @@ class ZarinpalVerifier(BaseVerifier):
                 'amount': transaction.amount
             })
             
-            old_status = transaction.status
+            return self.apply_verification_result(
+                transaction,
+                verify_response,
+                idempotency_key=idempotency_key
+            )
+                
+        except Exception as e:
+            logger.error(f"Verification error: {e}", exc_info=True)
+            raise
+    
+    def apply_verification_result(
+        self,
+        transaction: Transaction,
+        verify_response: Dict[str, Any],
+        idempotency_key: str = None,
+        event_source: str = 'payment_verification'
+    ) -> Dict[str, Any]:
+        """
+        Apply a gateway verification response to a transaction.
+        Shared by callback verification and background reconciliation.
+        
+        Args:
+            transaction: Transaction being verified
+            verify_response: Response from ZarinpalGateway.verify_payment
+            idempotency_key: Optional idempotency key to set on success
+            event_source: Source recorded on the TransactionEvent
             
-            # Process verification response
-            if verify_response.get('status') == 'success' and verify_response.get('pay'):
-                ref_id = verify_response.get('RefID')
+        Returns:
+            Dict containing verification result
+            
+        Raises:
+            VerificationError: If the gateway reports the payment as failed
+        """
+        transaction_uuid = str(transaction.transaction_uuid)
+        old_status = transaction.status
+        
+        # Process verification response
+        if verify_response.get('status') == 'success' and verify_response.get('pay'):
+            ref_id = verify_response.get('RefID')
+            
+            # Update transaction
+            with db_transaction.atomic():
+                transaction.mark_as_completed(ref_id=ref_id)
+                
+                # Remove from cache
+                redis_client.remove_transaction_cache(transaction_uuid)
                 
-                # Update transaction
+                # Set state
+                redis_client.set_transaction_state(transaction_uuid, 'paid')
+                
+                # Set idempotency if provided
+                if idempotency_key:
+                    IdempotencyManager.set_idempotency_key(idempotency_key)
+                
+                # Log event
+                TransactionEvent.objects.create(
+                    transaction=transaction,
+                    old_status=old_status,
+                    new_status=transaction.status,
+                    event_source=event_source,
+                    payload={
+                        'action': 'payment_verified',
+                        'ref_id': ref_id,
+                        'gateway_response': verify_response
+                    }
+                )
+            
+            logger.info(f"Payment verified successfully: {transaction_uuid}, RefID: {ref_id}")
+            
+            return {
+                'status': 'success',
+                'payment_id': transaction_uuid,
+                'ref_id': ref_id,
+                'tracking_code': ref_id,
+                'message': 'Payment verified successfully'
+            }
+        
+        elif verify_response.get('status') == 'already_verified':
+            # Code 101: the gateway already settled this payment, so a
+            # pending row here means our own update was lost.
+            if not transaction.is_done:
                 with db_transaction.atomic():
-                    transaction.mark_as_completed(ref_id=ref_id)
-                    
-                    # Remove from cache
+                    transaction.mark_as_completed()
                     redis_client.remove_transaction_cache(transaction_uuid)
-                    
-                    # Set state
                     redis_client.set_transaction_state(transaction_uuid, 'paid')
-                    
-                    # Set idempotency if provided
-                    if idempotency_key:
-                        IdempotencyManager.set_idempotency_key(idempotency_key)
-                    
-                    # Log event
                     TransactionEvent.objects.create(
                         transaction=transaction,
                         old_status=old_status,
                         new_status=transaction.status,
-                        event_source='payment_verification',
+                        event_source=event_source,
                         payload={
-                            'action': 'payment_verified',
-                            'ref_id': ref_id,
+                            'action': 'payment_already_verified',
                             'gateway_response': verify_response
                         }
                     )
-                
-                logger.info(f"Payment verified successfully: {transaction_uuid}, RefID: {ref_id}")
-                
-                return {
-                    'status': 'success',
-                    'payment_id': transaction_uuid,
-                    'ref_id': ref_id,
-                    'tracking_code': ref_id,
-                    'message': 'Payment verified successfully'
-                }
+            return {
+                'status': 'already_verified',
+                'payment_id': transaction_uuid,
+                'ref_id': transaction.ref_id,
+                'message': verify_response.get('message', 'Payment already verified')
+            }
+        
+        else:
+            # Verification failed
+            error_message = verify_response.get('message', 'Payment verification failed')
+            logger.error(f"Payment verification failed: {transaction_uuid}, {error_message}")
             
-            elif verify_response.get('status') == 'already_verified':
-                return {
-                    'status': 'already_verified',
-                    'payment_id': transaction_uuid,
-                    'message': verify_response.get('message', 'Payment already verified')
+            # Log event
+            TransactionEvent.objects.create(
+                transaction=transaction,
+                old_status=old_status,
+                new_status='failed',
+                event_source=event_source,
+                payload={
+                    'action': 'verification_failed',
+                    'gateway_response': verify_response
                 }
+            )
             
-            else:
-                # Verification failed
-                error_message = verify_response.get('message', 'Payment verification failed')
-                logger.error(f"Payment verification failed: {transaction_uuid}, {error_message}")
-                
-                # Log event
-                TransactionEvent.objects.create(
-                    transaction=transaction,
-                    old_status=old_status,
-                    new_status='failed',
-                    event_source='payment_verification',
-                    payload={
-                        'action': 'verification_failed',
-                        'gateway_response': verify_response
-                    }
-                )
-                
-                raise VerificationError(error_message)
-                
-        except Exception as e:
-            logger.error(f"Verification error: {e}", exc_info=True)
-            raise
-
+            raise VerificationError(error_message)
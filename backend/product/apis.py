@@ -46,6 +46,7 @@ from .serializers import (
     RequirementsProductsOutputSerializer
 
 )
+from .utls import requirements_products_prefetches
 
 
 
@@ -286,9 +287,9 @@ class RequirementsProductsViewSet(BaseCRUDViewSet):
     output_serializer_class = RequirementsProductsOutputSerializer
     
     queryset = RequirementsProducts.objects.select_related(
-        'product'
+        'product__category'
     ).prefetch_related(
-        'requirements', 'product_timeline', 'operators'
+        *requirements_products_prefetches()
     ).filter(is_active=True)
     
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
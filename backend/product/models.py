@@ -81,6 +81,9 @@ class ProductionLine(models.Model):
 
     @property
     def active_tasks_count(self):
+        # در صورت annotate شدن با utls.annotate_active_tasks کوئری جداگانه زده نمی‌شود
+        if hasattr(self, 'processing_tasks_count'):
+            return self.processing_tasks_count
         return self.production_tasks.filter(status='processing').count()
 
     @property
@@ -241,7 +241,7 @@ class RequirementsProductsInputSerializer(serializers.ModelSerializer):
     )
     operator_ids = serializers.PrimaryKeyRelatedField(
         queryset=Operator.objects.all(),
-        source='operators',
+        source='orpertors',
         write_only=True,
         many=True
     )
@@ -271,7 +271,7 @@ class RequirementsProductsOutputSerializer(serializers.ModelSerializer):
     product_timeline = ProductionLineOutputSerializer(many=True, read_only=True)
     product_timeline_ids = serializers.SerializerMethodField(read_only=True)
     
-    operators = OperatorOutputSerializer(many=True, read_only=True)
+    operators = OperatorOutputSerializer(source='orpertors', many=True, read_only=True)
     operator_ids = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -286,11 +286,12 @@ class RequirementsProductsOutputSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    # .all() از کش prefetch استفاده می‌کند؛ values_list همیشه کوئری جدید می‌زند
     def get_requirements_ids(self, obj):
-        return list(obj.requirements.values_list('id', flat=True))
+        return [requirement.id for requirement in obj.requirements.all()]
 
     def get_product_timeline_ids(self, obj):
-        return list(obj.product_timeline.values_list('id', flat=True))
+        return [line.id for line in obj.product_timeline.all()]
 
     def get_operator_ids(self, obj):
-        return list(obj.operators.values_list('id', flat=True))
\ No newline at end of file
+        return [operator.id for operator in obj.orpertors.all()]
\ No newline at end of file
@@ -0,0 +1,27 @@
+from django.db.models import Count, Prefetch, Q
+
+from .models import ProductionLine
+
+
+def annotate_active_tasks(queryset=None):
+    """
+    شمارش تسک‌های در حال تولید هر خط تولید به‌صورت annotation
+    (برای active_tasks_count و has_free_capacity بدون کوئری به ازای هر خط)
+    """
+    if queryset is None:
+        queryset = ProductionLine.objects.all()
+    return queryset.annotate(
+        processing_tasks_count=Count('production_tasks', filter=Q(production_tasks__status='processing'))
+    )
+
+
+def requirements_products_prefetches(prefix=''):
+    """
+    prefetch های لازم برای RequirementsProductsOutputSerializer
+    prefix مسیر رسیدن به RequirementsProducts است (مثلا 'requirements_product__')
+    """
+    return [
+        f'{prefix}requirements',
+        Prefetch(f'{prefix}product_timeline', queryset=annotate_active_tasks()),
+        f'{prefix}orpertors',
+    ]
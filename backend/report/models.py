@@ -158,14 +158,9 @@ class WorkStation(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.station_code:
-            # تولید کد ایستگاه
-            prefix = "WS"
-            dept_code = self.department[:3].upper() if self.department else "GEN"
-            timestamp = timezone.now().strftime("%y%m")
-            count = WorkStation.objects.filter(
-                department=self.department
-            ).count() + 1
-            self.station_code = f"{prefix}-{dept_code}-{timestamp}-{count:03d}"
+            # تولید کد ایستگاه از شمارنده مشترک (بدون count و بدون تکرار)
+            from QC.codes import workstation_codes
+            workstation_codes.assign([self], 'station_code')
         super().save(*args, **kwargs)
     
     @property
@@ -466,14 +461,9 @@ class WorkStationReport(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.report_code:
-            # تولید کد گزارش
-            ws_code = self.workstation.station_code[:5] if self.workstation else "GEN"
-            timestamp = timezone.now().strftime("%y%m%d%H%M")
-            count = WorkStationReport.objects.filter(
-                workstation=self.workstation,
-                report_date__date=timezone.now().date()
-            ).count() + 1
-            self.report_code = f"WSR-{ws_code}-{timestamp}-{count:03d}"
+            # تولید کد گزارش از شمارنده مشترک (بدون count و بدون تکرار)
+            from QC.codes import workstation_report_codes
+            workstation_report_codes.assign([self], 'report_code')
         
         # اگر وضعیت به تأیید شده تغییر کرد
         if self.status == 'approved' and not self.approval_date: